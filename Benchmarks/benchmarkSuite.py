@@ -0,0 +1,275 @@
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import resource
+import tempfile
+import contextlib
+import multiprocessing
+from datetime import date, datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# Import the modules under test from the other folders
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../DataAnalysis')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../DatabaseSetup')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../Trading')))
+import historicalDatabase
+from historicalDatabase import create_database, populate_database
+from tradingCalendar import session_dates_between
+from priceCache import build_price_cache, load_price_cache, slice_price_cache
+from stockAnalysis import calculate_stock_analysis
+from validateDatabase import validate_database
+from tradeSimulator import simulate_trading, load_simulation_series, SIMULATION_ENGINES
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+BARS_PER_SESSION = 390  # 9:30 AM to 3:59 PM
+DEFAULT_SYMBOLS = 3
+DEFAULT_YEARS = 1
+DEFAULT_START_DATE = '2023-01-03'
+DEFAULT_TOLERANCE = 0.3  # Fraction a metric may get worse than the baseline before the run fails
+WARMUP_SESSIONS = 5  # Sessions of each fixture used as history before the simulation starts
+# Trades only near the bands: at 0.5% the threshold (about $0.50) is wider than the fixture's bands and nearly every bar trades
+SIMULATION_THRESHOLD = 0.05
+SIMULATION_CASH = 5000
+
+def get_fixture_config(symbols=DEFAULT_SYMBOLS, years=DEFAULT_YEARS, start_date=DEFAULT_START_DATE):
+    """
+    Describe a fixture: its symbol names and the date range its sessions are generated for.
+    """
+    first_day = datetime.strptime(start_date, '%Y-%m-%d').date()
+    last_day = date(first_day.year + years, first_day.month, first_day.day) - timedelta(days=1)
+    return {
+        'symbols': [f"BENCH{index}" for index in range(symbols)],
+        'start_date': start_date,
+        'end_date': last_day.strftime('%Y-%m-%d'),
+        'bars_per_session': BARS_PER_SESSION
+    }
+
+def generate_minute_bars(symbol_index, sessions):
+    """
+    Synthetic minute bars of one symbol: a seeded random walk over 390 bars per session.
+    :return: Dictionary of session date -> list of Polygon-style aggregates ({'t': milliseconds, 'c': close, 'v': volume}).
+    """
+    rng = np.random.default_rng(symbol_index)
+    count = len(sessions) * BARS_PER_SESSION
+    prices = np.maximum(np.round(100 + symbol_index * 10 + np.cumsum(rng.normal(0, 0.08, count)), 2), 1.0)
+    volumes = rng.integers(100, 10000, count)
+
+    bars = {}
+    for index, session in enumerate(sessions):
+        session_open = datetime(session.year, session.month, session.day, 9, 30).timestamp()  # Local wall clock, as the API is read
+        offset = index * BARS_PER_SESSION
+        bars[session] = [{'t': int((session_open + minute * 60) * 1000), 'c': price, 'v': volume}
+                         for minute, price, volume in zip(range(BARS_PER_SESSION),
+                                                          prices[offset:offset + BARS_PER_SESSION].tolist(),
+                                                          volumes[offset:offset + BARS_PER_SESSION].tolist())]
+    return bars
+
+def get_machine_info():
+    """
+    Describe the machine a report was recorded on, since throughputs are only comparable on similar hardware.
+    """
+    cpu = platform.processor()
+    if os.path.exists('/proc/cpuinfo'):
+        with open('/proc/cpuinfo') as f:
+            cpu = next((line.split(':', 1)[1].strip() for line in f if line.startswith('model name')), cpu)
+    return {
+        'platform': platform.platform(),
+        'cpu': cpu or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__
+    }
+
+def get_peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Linux reports KiB
+
+def benchmark_populate(fixture_dir, config):
+    """
+    Build the fixture databases through populate_database, with the Polygon request replaced by the synthetic bars,
+    so the parsing, batching and insert path is what gets timed.
+    """
+    sessions = session_dates_between(config['start_date'], config['end_date'])
+    bars = {symbol: generate_minute_bars(index, sessions) for index, symbol in enumerate(config['symbols'])}
+    historicalDatabase.fetch_historical_data = lambda symbol, day, api_key: bars[symbol][day.date()]
+
+    rows = 0
+    elapsed = 0.0
+    for symbol in config['symbols']:
+        db_path = os.path.join(fixture_dir, f"{symbol}.db")
+        create_database(db_path)
+        start_time = time.perf_counter()
+        summary = populate_database(db_path, symbol, config['start_date'], config['end_date'], api_keys=['offline'],
+                                    calls_per_minute=10 ** 9, progress_callback=lambda done, total: None)
+        elapsed += time.perf_counter() - start_time
+        rows += summary['rows_inserted']
+    return {'rows': rows, 'seconds': elapsed, 'rows_per_sec': rows / elapsed}
+
+def benchmark_price_cache(fixture_dir, config):
+    rows = 0
+    start_time = time.perf_counter()
+    for symbol in config['symbols']:
+        db_path = os.path.join(fixture_dir, f"{symbol}.db")
+        rows += build_price_cache(db_path, symbol, os.path.join(fixture_dir, 'cache', symbol))['rows']
+    elapsed = time.perf_counter() - start_time
+    return {'rows': rows, 'seconds': elapsed, 'rows_per_sec': rows / elapsed}
+
+def load_fixture_columns(fixture_dir, symbol):
+    return load_price_cache(os.path.join(fixture_dir, f"{symbol}.db"), symbol, os.path.join(fixture_dir, 'cache', symbol))
+
+def benchmark_simulation(fixture_dir, config, engine):
+    """
+    Time simulate_trading over every fixture symbol from preloaded series, after a few warm-up sessions of history.
+    """
+    sessions = session_dates_between(config['start_date'], config['end_date'])
+    history_end = sessions[WARMUP_SESSIONS - 1].strftime('%Y-%m-%d')
+    simulate_start = sessions[WARMUP_SESSIONS].strftime('%Y-%m-%d')
+
+    price_series = {}
+    bars = 0
+    for symbol in config['symbols']:
+        columns = load_fixture_columns(fixture_dir, symbol)
+        series = load_simulation_series(columns, simulate_start, config['end_date'])
+        series['history'] = slice_price_cache(columns, config['start_date'], history_end)['price']
+        price_series[symbol] = series
+        bars += len(series['prices'])
+
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        summary = simulate_trading(config['symbols'], config['start_date'], history_end, '1m', simulate_start, config['end_date'],
+                                   SIMULATION_THRESHOLD, SIMULATION_CASH, engine, price_series=price_series,
+                                   trades_file=os.path.join(fixture_dir, f"trades_{engine}.db"),
+                                   equity_file=os.path.join(fixture_dir, f"equity_{engine}.db"))
+    elapsed = time.perf_counter() - start_time
+    return {'bars': bars, 'trades': summary['total_trades'], 'seconds': elapsed, 'bars_per_sec': bars / elapsed}
+
+def benchmark_stock_analysis(fixture_dir, config):
+    bars = 0
+    start_time = time.perf_counter()
+    for symbol in config['symbols']:
+        columns = load_fixture_columns(fixture_dir, symbol)
+        calculate_stock_analysis(columns)
+        bars += len(columns['price'])
+    elapsed = time.perf_counter() - start_time
+    return {'bars': bars, 'seconds': elapsed, 'bars_per_sec': bars / elapsed}
+
+def benchmark_validate(fixture_dir, config):
+    rows = 0
+    start_time = time.perf_counter()
+    for symbol in config['symbols']:
+        with contextlib.redirect_stdout(io.StringIO()):
+            validate_database(os.path.join(fixture_dir, f"{symbol}.db"))  # An absolute path is used as is
+    elapsed = time.perf_counter() - start_time
+    rows = len(config['symbols']) * len(session_dates_between(config['start_date'], config['end_date'])) * BARS_PER_SESSION
+    return {'rows': rows, 'seconds': elapsed, 'rows_per_sec': rows / elapsed}
+
+def run_benchmark(name, fixture_dir, config):
+    """
+    Run one benchmark; called in a fresh process so its peak RSS is its own.
+    """
+    if name == 'populate_database':
+        result = benchmark_populate(fixture_dir, config)
+    elif name == 'price_cache':
+        result = benchmark_price_cache(fixture_dir, config)
+    elif name.startswith('simulate_trading_'):
+        result = benchmark_simulation(fixture_dir, config, name[len('simulate_trading_'):])
+    elif name == 'stock_analysis':
+        result = benchmark_stock_analysis(fixture_dir, config)
+    elif name == 'validate_database':
+        result = benchmark_validate(fixture_dir, config)
+    else:
+        raise ValueError(f"Unknown benchmark: {name}")
+    result['peak_rss_mb'] = get_peak_rss_mb()
+    return result
+
+def get_benchmark_names():
+    # populate_database builds the fixtures and price_cache their caches, so both run first
+    return ['populate_database', 'price_cache'] + [f"simulate_trading_{engine}" for engine in SIMULATION_ENGINES] + ['stock_analysis', 'validate_database']
+
+def run_suite(config, names=None):
+    """
+    Generate the fixtures in a temporary directory and run each benchmark in its own spawned process.
+    :return: Dictionary with the fixture config, the machine and each benchmark's metrics.
+    """
+    fixture_dir = tempfile.mkdtemp(prefix='benchmark_')
+    results = {}
+    try:
+        for name in names or get_benchmark_names():
+            with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+                results[name] = executor.submit(run_benchmark, name, fixture_dir, config).result()
+            print(f"{name}: " + ", ".join(f"{metric} {value:,.2f}" if isinstance(value, float) else f"{metric} {value:,}"
+                                          for metric, value in results[name].items()))
+    finally:
+        shutil.rmtree(fixture_dir, ignore_errors=True)
+    return {'config': config, 'machine': get_machine_info(), 'results': results}
+
+def find_regressions(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compare a report with the baseline: throughputs (*_per_sec) may not drop and peak RSS may not grow by more than the tolerance.
+    :return: List of messages, one per regressed metric.
+    """
+    regressions = []
+    for name, metrics in report['results'].items():
+        baseline_metrics = baseline['results'].get(name, {})
+        for metric, value in metrics.items():
+            expected = baseline_metrics.get(metric)
+            if expected is None:
+                continue
+            if metric.endswith('_per_sec') and value < expected * (1 - tolerance):
+                regressions.append(f"{name} {metric}: {value:,.0f} vs baseline {expected:,.0f}")
+            elif metric == 'peak_rss_mb' and value > expected * (1 + tolerance):
+                regressions.append(f"{name} {metric}: {value:,.1f} vs baseline {expected:,.1f}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the hot paths on synthetic minute-bar databases and compare them with a baseline.")
+    parser.add_argument('--symbols', type=int, default=DEFAULT_SYMBOLS, help="Number of synthetic symbols")
+    parser.add_argument('--years', type=int, default=DEFAULT_YEARS, help="Years of sessions per symbol")
+    parser.add_argument('--benchmarks', help="Comma-separated subset of: " + ", ".join(get_benchmark_names()))
+    parser.add_argument('--output', help="Write the JSON report to this file")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="Baseline JSON to compare against")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE, help="Allowed fractional regression")
+    parser.add_argument('--update-baseline', action='store_true', help="Save this run as the new baseline")
+    args = parser.parse_args()
+
+    config = get_fixture_config(args.symbols, args.years)
+    names = args.benchmarks.split(',') if args.benchmarks else None
+    if names and 'populate_database' not in names:
+        names = ['populate_database', 'price_cache'] + [name for name in names if name not in ('populate_database', 'price_cache')]
+    report = run_suite(config, names)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+    if args.update_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved at: {args.baseline}")
+        sys.exit(0)
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare with. Run with --update-baseline to save one.")
+        sys.exit(0)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline['config'] != config:
+        print("Baseline was recorded with a different fixture size; skipping the comparison.")
+        sys.exit(0)
+    if baseline.get('machine') != report['machine']:
+        print(f"Note: the baseline was recorded on another machine ({baseline.get('machine', 'unknown')}); throughputs may differ for that reason alone.")
+
+    regressions = find_regressions(report, baseline, args.tolerance)
+    if regressions:
+        print(f"Performance regressions beyond {args.tolerance:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+        sys.exit(1)
+    print(f"No regressions beyond {args.tolerance:.0%} against the baseline.")
@@ -0,0 +1,203 @@
+import os
+import io
+import sys
+import time
+import types
+import argparse
+import contextlib
+import multiprocessing
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+TRADING_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../Trading'))
+DEFAULT_SYMBOLS = 5
+DEFAULT_INVOCATIONS = 20
+# Simulated round trips of the mocked services, in milliseconds
+DEFAULT_LATENCIES = {'client_init': 80, 'alpaca': 40, 'yfinance': 60, 'dynamodb': 10}
+FETCH_MODES = ('sequential', 'batched')
+
+class FakeSeries:
+    """
+    The few pandas Series features alpacaTrading reads: empty, dropna(), iloc[-1] and index[-1].
+    """
+
+    def __init__(self, index, values):
+        self.index = index
+        self.iloc = values
+        self.empty = len(values) == 0
+
+    def dropna(self):
+        return self
+
+class FakeFrame:
+    def __init__(self, columns, index=None):
+        self.columns = columns
+        self.index = index
+        self.empty = not columns
+
+    def __getitem__(self, key):
+        return self.columns[key]
+
+def install_fake_clients(latencies):
+    """
+    Register stand-ins for boto3, alpaca_trade_api and yfinance that sleep for the configured latency on every
+    client construction and request, so the benchmark times the invocation's round trips without a network.
+    """
+    def wait(name):
+        time.sleep(latencies[name] / 1000)
+
+    rng = np.random.default_rng(0)
+
+    def bars(symbol):
+        minutes = [datetime(2024, 6, 3, 9, 30) + timedelta(minutes=minute) for minute in range(390)]
+        return FakeSeries(minutes, (100 + np.cumsum(rng.normal(0, 0.1, 390))).tolist())
+
+    class BatchWriter:
+        def __init__(self, table):
+            self.table = table
+            self.items = []
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, exc_type, exc_value, traceback):
+            for offset in range(0, len(self.items), 25):  # BatchWriteItem takes up to 25 items per request
+                self.table.request()
+            for item in self.items:
+                self.table.items[(item['symbol'], item['timestamp'])] = item
+
+        def put_item(self, Item):
+            self.items.append(dict(Item))
+
+    class Table:
+        def __init__(self):
+            self.items = {}
+            self.requests = 0
+
+        def request(self):
+            wait('dynamodb')
+            self.requests += 1
+
+        def put_item(self, Item):
+            self.request()
+            self.items[(Item['symbol'], Item['timestamp'])] = dict(Item)
+
+        def get_item(self, Key):
+            self.request()
+            item = self.items.get((Key['symbol'], Key['timestamp']))
+            return {'Item': item} if item else {}
+
+        def query(self, KeyConditionExpression, ScanIndexForward, Limit):
+            self.request()
+            items = sorted((item for (symbol, _), item in self.items.items() if symbol == KeyConditionExpression),
+                           key=lambda item: item['timestamp'], reverse=True)
+            return {'Items': items[:Limit]}
+
+        def batch_writer(self):
+            return BatchWriter(self)
+
+    class Resource:
+        def Table(self, name):
+            return sys.modules['boto3'].table
+
+    def resource(name):
+        wait('client_init')
+        return Resource()
+
+    class Key:
+        def __init__(self, name):
+            self.name = name
+
+        def eq(self, value):
+            return value
+
+    class REST:
+        def __init__(self, *args, **kwargs):
+            wait('client_init')
+
+        def get_account(self):
+            wait('alpaca')
+            return types.SimpleNamespace(cash='100000')
+
+    class Ticker:
+        def __init__(self, symbol):
+            self.symbol = symbol
+
+        def history(self, period, interval):
+            wait('yfinance')
+            series = bars(self.symbol)
+            return FakeFrame({'Close': series}, series.index)
+
+    def download(symbols, **kwargs):
+        wait('yfinance')  # The per-ticker requests of a threaded download overlap into about one round trip
+        return FakeFrame({symbol: FakeFrame({'Close': bars(symbol)}) for symbol in symbols})
+
+    boto3 = types.ModuleType('boto3')
+    boto3.resource = resource
+    boto3.table = Table()
+    boto3.dynamodb = types.ModuleType('boto3.dynamodb')
+    boto3.dynamodb.conditions = types.ModuleType('boto3.dynamodb.conditions')
+    boto3.dynamodb.conditions.Key = Key
+    alpaca_trade_api = types.ModuleType('alpaca_trade_api')
+    alpaca_trade_api.REST = REST
+    yfinance = types.ModuleType('yfinance')
+    yfinance.Ticker = Ticker
+    yfinance.download = download
+    sys.modules.update({'boto3': boto3, 'boto3.dynamodb': boto3.dynamodb, 'boto3.dynamodb.conditions': boto3.dynamodb.conditions,
+                        'alpaca_trade_api': alpaca_trade_api, 'yfinance': yfinance})
+
+def benchmark_lambda(mode, symbols, invocations, latencies):
+    """
+    Import alpacaTrading and invoke its handler repeatedly in this (fresh) process, like a Lambda container
+    serving a cold invocation and then warm ones.
+    :param mode: 'batched' for the batched fetch, 'sequential' to fetch one symbol after another as before.
+    :return: Dictionary with the import time, the cold and warm invocation latencies in milliseconds and the
+             DynamoDB requests of a warm invocation.
+    """
+    install_fake_clients(latencies)
+    sys.path.append(TRADING_DIR)
+    start_time = time.perf_counter()
+    import alpacaTrading
+    import_ms = (time.perf_counter() - start_time) * 1000
+
+    if mode == 'sequential':
+        alpacaTrading.fetch_latest_prices = lambda symbols, interval='1m': {
+            symbol: alpacaTrading.fetch_latest_price(symbol, interval) for symbol in symbols}
+
+    event = {'symbols': symbols}
+    table = sys.modules['boto3'].table
+    latencies_ms = []
+    requests = []
+    for _ in range(invocations):
+        requests_before = table.requests
+        start_time = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            alpacaTrading.lambda_handler(event, None)
+        latencies_ms.append((time.perf_counter() - start_time) * 1000)
+        requests.append(table.requests - requests_before)
+
+    warm = np.array(latencies_ms[1:]) if invocations > 1 else np.array(latencies_ms)
+    return {'import_ms': import_ms, 'cold_ms': latencies_ms[0], 'warm_mean_ms': float(warm.mean()),
+            'warm_p95_ms': float(np.percentile(warm, 95)), 'warm_dynamodb_requests': requests[-1]}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time alpacaTrading's Lambda handler against mocked Alpaca, DynamoDB and yfinance clients.")
+    parser.add_argument('--symbols', type=int, default=DEFAULT_SYMBOLS, help="Number of symbols traded per invocation")
+    parser.add_argument('--invocations', type=int, default=DEFAULT_INVOCATIONS, help="Invocations per container, the first one cold")
+    for name, latency in DEFAULT_LATENCIES.items():
+        parser.add_argument(f"--{name.replace('_', '-')}-ms", type=float, default=latency, help=f"Simulated {name} latency")
+    args = parser.parse_args()
+
+    symbols = [f"SYM{index}" for index in range(args.symbols)]
+    latencies = {name: getattr(args, f"{name}_ms") for name in DEFAULT_LATENCIES}
+    results = {}
+    for mode in FETCH_MODES:
+        # A fresh process per mode, so each starts cold like a new Lambda container
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+            results[mode] = executor.submit(benchmark_lambda, mode, symbols, args.invocations, latencies).result()
+        print(f"{mode}: " + ", ".join(f"{metric} {value:,.1f}" if isinstance(value, float) else f"{metric} {value:,}"
+                                      for metric, value in results[mode].items()))
+
+    speedup = results['sequential']['warm_mean_ms'] / results['batched']['warm_mean_ms']
+    print(f"Batched fetch: {speedup:.2f}x faster per warm invocation for {args.symbols} symbols.")
@@ -0,0 +1,174 @@
+import os
+import sys
+import json
+import time
+import pickle
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../DatabaseSetup')))
+from priceCache import CACHE_DIR, get_source_fingerprint
+
+# Results of the analysis functions, keyed on what they were computed from, in one SQLite file next to the price caches
+ANALYSIS_CACHE_FILE = os.path.join(CACHE_DIR, 'analysis.db')
+ANALYSIS_CACHE_VERSION = 1  # Bump when the metrics change, so results of the old code are never returned
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MEMORY_BYTES = 32 * 1024 * 1024  # Pickled size of the results also kept in memory
+
+_cache_lock = threading.Lock()
+_default_cache = None
+
+def make_analysis_key(kind, symbol, start_date, end_date, interval, pieces, parameters=None):
+    """
+    Key of one analysis result: what was computed, for which symbol and range, with which parameters, and from
+    which databases in which state. A database's fingerprint (size and modification time of the file and its
+    write-ahead log) changes whenever rows are written, so results computed before an append are never hit again.
+    :param pieces: Databases and days supplying the range, as planned by dataCatalog.plan_range.
+    :return: Hex digest of the key.
+    """
+    sources = [[os.path.basename(db_path), days[0], days[-1], len(days), get_source_fingerprint(db_path)] for db_path, days in pieces]
+    key = {
+        'version': ANALYSIS_CACHE_VERSION,
+        'kind': kind,
+        'symbol': symbol,
+        'start_date': start_date,
+        'end_date': end_date,
+        'interval': interval,
+        'parameters': parameters or {},
+        'sources': sources
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+class AnalysisCache:
+    """
+    Persistent least-recently-used cache of analysis results, with a size cap on the stored results.
+    Results are pickled into an SQLite table with the time they were last used; once the stored results exceed
+    `max_bytes` the least recently used ones are deleted. The most recent results are also kept in memory, up to
+    `memory_bytes` of their pickled size, so a repeated call in the same process does not touch the file at all;
+    a result larger than that is only kept on disk.
+    """
+
+    def __init__(self, cache_file=None, max_bytes=DEFAULT_MAX_BYTES, memory_bytes=DEFAULT_MEMORY_BYTES):
+        self.cache_file = cache_file or ANALYSIS_CACHE_FILE
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.memory = OrderedDict()  # Key -> (result, pickled size)
+        self.memory_size = 0
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.cache_file), exist_ok=True)
+
+        conn = self.connect()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS analysis_cache (
+                cache_key TEXT PRIMARY KEY,
+                result BLOB,
+                size INTEGER,
+                last_used REAL
+            ) WITHOUT ROWID
+        ''')
+        conn.execute("CREATE INDEX IF NOT EXISTS analysis_cache_last_used ON analysis_cache (last_used)")
+        conn.commit()
+        conn.close()
+
+    def connect(self):
+        # Several processes (the screener's workers) may share the file; wait for a writer rather than failing
+        return sqlite3.connect(self.cache_file, timeout=30)
+
+    def remember(self, key, result, size):
+        if key in self.memory:
+            self.memory_size -= self.memory.pop(key)[1]
+        if size > self.memory_bytes:
+            return
+        self.memory[key] = (result, size)
+        self.memory_size += size
+        while self.memory_size > self.memory_bytes:
+            self.memory_size -= self.memory.popitem(last=False)[1][1]
+
+    def get(self, key):
+        """
+        :return: Tuple of (found, result).
+        """
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return True, self.memory[key][0]
+
+            try:
+                conn = self.connect()
+                try:
+                    row = conn.execute("SELECT result FROM analysis_cache WHERE cache_key = ?", (key,)).fetchone()
+                    if row is None:
+                        return False, None
+                    with conn:
+                        conn.execute("UPDATE analysis_cache SET last_used = ? WHERE cache_key = ?", (time.time(), key))
+                finally:
+                    conn.close()
+                result = pickle.loads(row[0])
+            except (sqlite3.Error, pickle.UnpicklingError) as e:
+                print(f"Ignoring the analysis cache: {e}")
+                return False, None
+
+            self.remember(key, result, len(row[0]))
+            return True, result
+
+    def put(self, key, result):
+        """
+        Store a result, then evict the least recently used results beyond the size cap.
+        """
+        with self.lock:
+            data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+            self.remember(key, result, len(data))
+            try:
+                conn = self.connect()
+                try:
+                    with conn:
+                        conn.execute("INSERT OR REPLACE INTO analysis_cache (cache_key, result, size, last_used) VALUES (?, ?, ?, ?)",
+                                     (key, data, len(data), time.time()))
+                        self.evict(conn)
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                print(f"Failed to store an analysis result in the cache: {e}")
+
+    def evict(self, conn):
+        total_size = conn.execute("SELECT COALESCE(SUM(size), 0) FROM analysis_cache").fetchone()[0]
+        if total_size <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in conn.execute("SELECT cache_key, size FROM analysis_cache ORDER BY last_used"):
+            if total_size <= self.max_bytes:
+                break
+            evicted.append((key,))
+            total_size -= size
+        conn.executemany("DELETE FROM analysis_cache WHERE cache_key = ?", evicted)
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached result for the key, or compute, store and return it.
+        """
+        found, result = self.get(key)
+        if found:
+            return result
+        result = compute()
+        self.put(key, result)
+        return result
+
+    def clear(self):
+        with self.lock:
+            self.memory.clear()
+            self.memory_size = 0
+            conn = self.connect()
+            with conn:
+                conn.execute("DELETE FROM analysis_cache")
+            conn.close()
+
+def get_analysis_cache():
+    """
+    The process-wide cache in data/cache/analysis.db, opened on first use.
+    """
+    global _default_cache
+    with _cache_lock:
+        if _default_cache is None:
+            _default_cache = AnalysisCache()
+        return _default_cache
@@ -0,0 +1,171 @@
+import statistics
+import sys
+import time
+import numpy as np
+
+from stockMetrics import (calculate_bollinger_bands, calculate_atr, calculate_cv, calculate_rsi, calculate_moving_averages,
+                          calculate_volatility_index, calculate_stock_metrics, calculate_indicator_series)
+from stockAnalysis import calculate_buy_index, calculate_stock_analysis_series
+
+# Element-by-element implementations the vectorized metrics replaced, kept as the reference for the parity checks
+
+def reference_bollinger_bands(prices, window_size=20, num_std_dev=2):
+    if len(prices) < window_size:
+        return None, None, None
+
+    moving_average = statistics.mean(prices[-window_size:])
+    std_dev = statistics.stdev(prices[-window_size:])
+    return moving_average - (num_std_dev * std_dev), moving_average, moving_average + (num_std_dev * std_dev)
+
+def reference_atr(prices, window_size=14):
+    tr = [max(prices[i] - prices[i-1], abs(prices[i] - prices[i-1]), abs(prices[i-1] - prices[i])) for i in range(1, len(prices))]
+    return np.mean(tr[-window_size:])
+
+def reference_rsi(prices, window_size=14):
+    deltas = np.diff(prices)
+    seed = deltas[:window_size + 1]
+    up = seed[seed >= 0].sum() / window_size
+    down = -seed[seed < 0].sum() / window_size
+    rs = up / down
+    rsi = np.zeros_like(prices)
+    rsi[:window_size] = 100. - 100. / (1. + rs)
+
+    for i in range(window_size, len(prices)):
+        delta = deltas[i - 1]
+        upval = delta if delta > 0 else 0.
+        downval = -delta if delta <= 0 else 0.
+        up = (up * (window_size - 1) + upval) / window_size
+        down = (down * (window_size - 1) + downval) / window_size
+        rs = up / down
+        rsi[i] = 100. - 100. / (1. + rs)
+
+    return rsi[-1]
+
+def reference_volatility_index(prices, volumes):
+    if len(prices) == 0 or len(volumes) == 0:
+        return None
+
+    lower_band, moving_average, upper_band = reference_bollinger_bands(prices)
+    if lower_band is None:
+        return None
+
+    median_price = statistics.median(prices)
+    return (0.3 * statistics.stdev(prices) / median_price +
+            0.2 * reference_atr(prices) / median_price +
+            0.2 * (upper_band - lower_band) / median_price +
+            0.3 * float(np.mean(volumes)) / 1_000_000) * 100
+
+def random_walk(rng, length, start=100.0):
+    return np.round(start + np.cumsum(rng.normal(0, 0.2, length)), 2).clip(0.01)
+
+def matches(expected, actual, rtol=1e-9, atol=1e-9):
+    if expected is None or actual is None:
+        return expected is None and actual is None
+    return bool(np.allclose(expected, actual, rtol=rtol, atol=atol, equal_nan=True))
+
+def run_parity_checks(seed=7):
+    """
+    Compare the vectorized metrics with the reference implementations on random walks of several lengths,
+    flat and monotonic series and series shorter than the windows.
+    :return: Number of mismatches.
+    """
+    rng = np.random.default_rng(seed)
+    series = [random_walk(rng, length) for length in (2, 15, 16, 20, 21, 250, 5_000, 100_000)]
+    series += [np.full(50, 42.0), np.linspace(10, 20, 50), np.linspace(20, 10, 50), np.array([5.0, 5.5, 5.25])]
+
+    failures = 0
+    for prices in series:
+        volumes = rng.integers(100, 50_000, len(prices))
+        with np.errstate(divide='ignore', invalid='ignore'):  # Flat and monotonic series divide by a zero loss
+            checks = {
+                'bollinger_bands': (reference_bollinger_bands(prices), calculate_bollinger_bands(prices)),
+                'bollinger_bands (list input)': (reference_bollinger_bands(prices), calculate_bollinger_bands(prices.tolist())),
+                'atr': (reference_atr(prices), calculate_atr(prices)),
+                'rsi': (reference_rsi(prices), calculate_rsi(prices)),
+                'rsi (window 5)': (reference_rsi(prices, 5), calculate_rsi(prices, 5)),
+                'volatility_index': (reference_volatility_index(prices, volumes), calculate_volatility_index(prices, volumes)),
+            }
+        for name, (expected, actual) in checks.items():
+            if isinstance(expected, tuple):
+                equal = all(matches(e, a) for e, a in zip(expected, actual))
+            else:
+                equal = matches(expected, actual)
+            if not equal:
+                failures += 1
+                print(f"Mismatch in {name} for {len(prices)} prices: expected {expected}, got {actual}")
+
+    return failures
+
+def run_series_checks(seed=11, length=400):
+    """
+    Compare every entry of the indicator series with the scalar metrics computed on the same prefix,
+    for the default windows and for other ones.
+    :return: Number of mismatches.
+    """
+    rng = np.random.default_rng(seed)
+    prices = random_walk(rng, length)
+    prices[150:170] = prices[149]  # A flat stretch: no gains or losses in the window
+    volumes = rng.integers(100, 50_000, length)
+
+    failures = 0
+    for windows in ({}, {'bollinger_window': 5, 'num_std_dev': 1.5, 'atr_window': 3, 'rsi_window': 7, 'moving_average_window': 9}):
+        bollinger_window = windows.get('bollinger_window', 20)
+        series = calculate_stock_analysis_series({'price': prices, 'volume': volumes}, **windows)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            for i in range(length):
+                prefix = prices[:i + 1]
+                bands = calculate_bollinger_bands(prefix, bollinger_window, windows.get('num_std_dev', 2))
+                expected = {
+                    'lower_band': bands[0],
+                    'moving_average': bands[1],
+                    'upper_band': bands[2],
+                    'atr': calculate_atr(prefix, windows.get('atr_window', 14)) if i > 0 else np.nan,
+                    'cv': calculate_cv(prefix),
+                    'rsi': calculate_rsi(prefix, windows.get('rsi_window', 14)),
+                    'moving_average_value': calculate_moving_averages(prefix, windows.get('moving_average_window', 20))
+                }
+                if not windows:
+                    volatility_index = calculate_volatility_index(prefix, volumes[:i + 1])
+                    expected['volatility_index'] = volatility_index
+                    expected['buy_index'] = calculate_buy_index(volatility_index, calculate_stock_metrics(prefix, volumes[:i + 1]), prefix[-1]) if volatility_index is not None else None
+                for name, value in expected.items():
+                    if not matches(np.nan if value is None else value, series[name][i], rtol=1e-7, atol=1e-9):
+                        failures += 1
+                        print(f"Series mismatch in {name} at bar {i} with windows {windows or 'default'}: expected {value}, got {series[name][i]}")
+
+    cv_series = calculate_indicator_series(prices, cv_window=30)['cv']
+    expected_cv = [calculate_cv(prices[i - 29:i + 1]) for i in range(29, length)]
+    if not matches(expected_cv, cv_series[29:], rtol=1e-7) or not np.isnan(cv_series[:29]).all():
+        failures += 1
+        print("Series mismatch in the windowed cv")
+
+    return failures
+
+def time_metrics(length=500_000, seed=7):
+    rng = np.random.default_rng(seed)
+    prices = random_walk(rng, length)
+    volumes = rng.integers(100, 50_000, length)
+
+    start = time.perf_counter()
+    reference_rsi(prices)
+    reference_volatility_index(prices, volumes)
+    reference_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    calculate_stock_metrics(prices, volumes)
+    calculate_volatility_index(prices, volumes)
+    vectorized_seconds = time.perf_counter() - start
+
+    print(f"{length:,} prices: reference RSI and volatility index {reference_seconds:.3f}s, vectorized metrics {vectorized_seconds:.3f}s")
+
+    start = time.perf_counter()
+    calculate_stock_analysis_series({'price': prices, 'volume': volumes})
+    print(f"{length:,} prices: indicator and buy index series for every bar {time.perf_counter() - start:.3f}s")
+
+if __name__ == "__main__":
+    failures = run_parity_checks() + run_series_checks()
+    if failures:
+        print(f"{failures} metric checks did not match the reference implementations")
+        sys.exit(1)
+    print("All metrics match the reference implementations")
+    time_metrics()
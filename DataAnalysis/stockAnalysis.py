@@ -1,18 +1,16 @@
 import os
 import sqlite3
-import subprocess
 import sys
-import time
-from stockMetrics import calculate_volatility_index, calculate_stock_metrics
+import numpy as np
+from stockMetrics import calculate_volatility_index, calculate_stock_metrics, calculate_indicator_series
+from analysisCache import get_analysis_cache, make_analysis_key
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../DatabaseSetup')))
+from dataCatalog import plan_range, load_planned_range
+from databaseProvisioner import provision_and_wait
 
 def database_exists(db_path):
     return os.path.exists(db_path)
 
-def create_database(symbol, start_date, end_date, interval):
-    script_path = os.path.join(os.path.dirname(__file__), '../DatabaseSetup/setupDatabase.py')
-    command = [sys.executable, script_path, symbol, "yes", start_date, interval, end_date]
-    subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-
 def get_db_path(symbol, start_date, end_date=None, interval='1h'):
     if end_date:
         db_filename = f"{symbol}_{start_date.replace('-', '.')}_{end_date.replace('-', '.')}_{interval.replace(' ', '').replace(':', '').replace('-', '')}.db"
@@ -29,16 +27,12 @@ def check_db_populated(db_path):
     conn.close()
     return count > 0
 
-def calculate_stock_analysis(db_path):
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-    c.execute("SELECT stock_price, volume FROM stock_prices")
-    data = c.fetchall()
-    prices = [row[0] for row in data]
-    volumes = [row[1] for row in data]
-    conn.close()
+def calculate_stock_analysis(columns):
+    # Price columns as returned by load_price_range: views of the databases' memory-mapped caches
+    prices = columns['price']
+    volumes = columns['volume']
 
-    if prices:
+    if len(prices) > 0:
         volatility_index = calculate_volatility_index(prices, volumes)
         metrics = calculate_stock_metrics(prices, volumes)
         return volatility_index, metrics
@@ -65,6 +59,55 @@ def calculate_buy_index(volatility_index, metrics, current_price):
 
     return buy_index
 
+def calculate_buy_index_series(volatility_index, metrics, current_prices):
+    """
+    calculate_buy_index for every bar at once, from the arrays of calculate_indicator_series; NaN where it would be None.
+    """
+    normalized_rsi = np.clip(100 - metrics['rsi'], 0, 100)
+    normalized_moving_average = np.clip(100 - np.abs(metrics['moving_average_value'] - current_prices) / current_prices * 100, 0, 100)
+
+    volatility_weight = 0.6
+    rsi_weight = 0.2
+    moving_average_weight = 0.2
+
+    return (volatility_weight * volatility_index +
+            rsi_weight * normalized_rsi +
+            moving_average_weight * normalized_moving_average) / 100
+
+def calculate_stock_analysis_series(columns, bollinger_window=20, num_std_dev=2, atr_window=14, rsi_window=14,
+                                    moving_average_window=20, cv_window=None):
+    """
+    Indicators, volatility index and buy index after every bar of the price columns (as returned by load_price_range).
+    The buy index of each bar uses that bar's price as the current price.
+    :return: Dictionary of arrays aligned with the prices, as calculate_indicator_series plus 'buy_index'.
+    """
+    prices = np.asarray(columns['price'], dtype=np.float64)
+    series = calculate_indicator_series(prices, columns['volume'], bollinger_window, num_std_dev, atr_window, rsi_window,
+                                        moving_average_window, cv_window)
+    series['buy_index'] = calculate_buy_index_series(series['volatility_index'], series, prices)
+    return series
+
+def load_stock_analysis(symbol, start_date, end_date, interval, data_dir=None, cache=None):
+    """
+    calculate_stock_analysis of a symbol's date range, served from the analysis cache while the databases
+    supplying the range are unchanged.
+    :return: Tuple of (volatility_index, metrics), (None, None) if no database covers the range.
+    """
+    pieces, _ = plan_range(symbol, start_date, end_date, interval, data_dir)
+    key = make_analysis_key('stock_analysis', symbol, start_date, end_date, interval, pieces)
+    return (cache or get_analysis_cache()).get_or_compute(key, lambda: calculate_stock_analysis(load_planned_range(symbol, pieces)))
+
+def load_stock_analysis_series(symbol, start_date, end_date, interval, bollinger_window=20, num_std_dev=2, atr_window=14,
+                               rsi_window=14, moving_average_window=20, cv_window=None, data_dir=None, cache=None):
+    """
+    calculate_stock_analysis_series of a symbol's date range, cached like load_stock_analysis and keyed on the windows too.
+    """
+    pieces, _ = plan_range(symbol, start_date, end_date, interval, data_dir)
+    windows = {'bollinger_window': bollinger_window, 'num_std_dev': num_std_dev, 'atr_window': atr_window, 'rsi_window': rsi_window,
+               'moving_average_window': moving_average_window, 'cv_window': cv_window}
+    key = make_analysis_key('stock_analysis_series', symbol, start_date, end_date, interval, pieces, windows)
+    return (cache or get_analysis_cache()).get_or_compute(key, lambda: calculate_stock_analysis_series(load_planned_range(symbol, pieces), **windows))
+
 if __name__ == "__main__":
     if len(sys.argv) != 5:
         print("Usage: python stockAnalysis.py <symbol> <start_date> <end_date> <interval>")
@@ -75,16 +118,11 @@ if __name__ == "__main__":
     end_date = sys.argv[3].strip()
     interval = sys.argv[4].strip()
 
-    db_path = get_db_path(symbol, start_date, end_date, interval)
-
-    if not database_exists(db_path):
-        print("Database does not exist. Creating database...")
-        create_database(symbol, start_date, end_date, interval)
-
-        while not (database_exists(db_path) and check_db_populated(db_path)):
-            time.sleep(0.1)
+    # Any database in data/ covering the range is reused; only uncovered trading days are fetched
+    if not provision_and_wait([symbol], start_date, end_date, interval):
+        sys.exit(1)
 
-    volatility_index, metrics = calculate_stock_analysis(db_path)
+    volatility_index, metrics = load_stock_analysis(symbol, start_date, end_date, interval)
     if volatility_index is not None and metrics is not None:
         current_price = metrics['moving_average_value']  # Assuming the current price is the latest moving average
         buy_index = calculate_buy_index(volatility_index, metrics, current_price)
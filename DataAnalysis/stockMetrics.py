@@ -1,74 +1,78 @@
-import statistics
+import heapq
 import numpy as np
 
-def calculate_bollinger_bands(prices, window_size=20, num_std_dev=2):
+# The compute_* functions work on float64 NumPy arrays with array operations only; the calculate_* functions keep
+# their original signatures, accept any sequence of prices and convert it once before calling them
+
+def as_price_array(values):
+    return np.asarray(values, dtype=np.float64)
+
+def compute_bollinger_bands(prices, window_size=20, num_std_dev=2):
     if len(prices) < window_size:
         return None, None, None
 
-    moving_average = statistics.mean(prices[-window_size:])
-    std_dev = statistics.stdev(prices[-window_size:])
+    window = prices[-window_size:]
+    moving_average = window.mean()
+    std_dev = window.std(ddof=1)  # Sample standard deviation, like statistics.stdev
     upper_band = moving_average + (num_std_dev * std_dev)
     lower_band = moving_average - (num_std_dev * std_dev)
 
     return lower_band, moving_average, upper_band
 
-def calculate_atr(prices, window_size=14):
-    tr = [max(prices[i] - prices[i-1], abs(prices[i] - prices[i-1]), abs(prices[i-1] - prices[i])) for i in range(1, len(prices))]
-    return np.mean(tr[-window_size:])
+def compute_atr(prices, window_size=14):
+    # The true range of a close-only series is the absolute change from the previous close
+    true_range = np.abs(np.diff(prices))
+    return np.mean(true_range[-window_size:])
 
-def calculate_cv(prices):
+def compute_cv(prices):
     mean_price = np.mean(prices)
     std_dev = np.std(prices)
     return (std_dev / mean_price) * 100
 
-def calculate_rsi(prices, window_size=14):
+def wilder_smoothing(initial, values, window_size):
+    """
+    Final value of Wilder's recursive average, average = (average * (window_size - 1) + value) / window_size,
+    started from `initial` and fed `values` in order, computed as one weighted sum instead of a loop.
+    """
+    decay = (window_size - 1) / window_size
+    weights = decay ** np.arange(len(values) - 1, -1, -1, dtype=np.float64)  # Oldest values weigh least; far ones underflow to 0
+    return initial * decay ** len(values) + np.dot(weights, values) / window_size
+
+def compute_rsi(prices, window_size=14):
     deltas = np.diff(prices)
     seed = deltas[:window_size + 1]
     up = seed[seed >= 0].sum() / window_size
     down = -seed[seed < 0].sum() / window_size
-    rs = up / down
-    rsi = np.zeros_like(prices)
-    rsi[:window_size] = 100. - 100. / (1. + rs)
 
-    for i in range(window_size, len(prices)):
-        delta = deltas[i - 1]  # because the diff is 1 shorter
+    # Wilder smoothing of the gains and losses after the seed, starting from the delta of bar `window_size`
+    changes = deltas[window_size - 1:]
+    if len(prices) > window_size and len(changes):
+        up = wilder_smoothing(up, np.maximum(changes, 0.0), window_size)
+        down = wilder_smoothing(down, np.maximum(-changes, 0.0), window_size)
 
-        if delta > 0:
-            upval = delta
-            downval = 0.
-        else:
-            upval = 0.
-            downval = -delta
-
-        up = (up * (window_size - 1) + upval) / window_size
-        down = (down * (window_size - 1) + downval) / window_size
-
-        rs = up / down
-        rsi[i] = 100. - 100. / (1. + rs)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rs = np.float64(up) / down
+    return 100. - 100. / (1. + rs)
 
-    return rsi[-1]
-
-def calculate_moving_averages(prices, window_size=20):
+def compute_moving_average(prices, window_size=20):
     if len(prices) < window_size:
         return None
     return np.mean(prices[-window_size:])
 
-def calculate_volatility_index(prices, volumes):
-    if not prices or not volumes:
+def compute_volatility_index(prices, volumes):
+    if len(prices) == 0 or len(volumes) == 0:
         return None
 
-    lower_band, moving_average, upper_band = calculate_bollinger_bands(prices)
-    atr = calculate_atr(prices)
-    cv = calculate_cv(prices)
-
+    lower_band, moving_average, upper_band = compute_bollinger_bands(prices)
     if lower_band is None or moving_average is None or upper_band is None:
         return None
 
     # Normalize the metrics
-    std_dev = statistics.stdev(prices)
+    atr = compute_atr(prices)
+    std_dev = prices.std(ddof=1)
     bollinger_band_width = upper_band - lower_band
-    average_volume = statistics.mean(volumes)
-    median_price = statistics.median(prices)
+    average_volume = float(np.mean(volumes))
+    median_price = np.median(prices)
 
     normalized_std_dev = std_dev / median_price
     normalized_atr = atr / median_price
@@ -89,19 +93,206 @@ def calculate_volatility_index(prices, volumes):
 
     return volatility_index
 
-def calculate_stock_metrics(prices, volumes):
-    lower_band, moving_average, upper_band = calculate_bollinger_bands(prices)
-    atr = calculate_atr(prices)
-    cv = calculate_cv(prices)
-    rsi = calculate_rsi(prices)
-    moving_average_value = calculate_moving_averages(prices)
+def compute_stock_metrics(prices, volumes):
+    lower_band, moving_average, upper_band = compute_bollinger_bands(prices)
 
     return {
         'lower_band': lower_band,
         'moving_average': moving_average,
         'upper_band': upper_band,
+        'atr': compute_atr(prices),
+        'cv': compute_cv(prices),
+        'rsi': compute_rsi(prices),
+        'moving_average_value': compute_moving_average(prices)
+    }
+
+def decay_scan(increments, decay):
+    """
+    Every value of the recursion x[i] = decay * x[i - 1] + increments[i], with x[-1] = 0, for 0 <= decay < 1.
+    Each doubling step adds the contributions from twice as far back; it stops once the weight of anything
+    older is below float64 precision, so the number of passes depends on the decay, not on the length.
+    """
+    result = np.array(increments, dtype=np.float64)
+    shift = 1
+    factor = decay
+    while shift < len(result) and factor > np.finfo(np.float64).eps * (1 - decay) / 16:
+        result[shift:] += factor * result[:-shift]
+        factor *= factor
+        shift *= 2
+    return result
+
+def rolling_moments(values, window_size, segment_length=1024):
+    """
+    Mean and sample variance of every full window of `values`; entry i covers values[i - window_size + 1:i + 1]
+    and is NaN until the first window is full.
+    The windows are summed from cumulative sums taken per segment of `segment_length` windows, relative to a price
+    of the segment, so the sums stay small and precise however long the series is.
+    """
+    count = len(values) - window_size + 1
+    mean = np.full(len(values), np.nan)
+    variance = np.full(len(values), np.nan)
+    if count <= 0:
+        return mean, variance
+
+    segment_length = max(segment_length, 4 * window_size)
+    num_segments = -(-count // segment_length)
+    positions = np.arange(num_segments)[:, None] * segment_length + np.arange(segment_length + window_size - 1)
+    segment_values = values[np.minimum(positions, len(values) - 1)]
+    reference = segment_values[:, window_size - 1:window_size]
+    deviations = segment_values - reference
+
+    sums = np.zeros((num_segments, segment_length + window_size))
+    sums_squares = np.zeros((num_segments, segment_length + window_size))
+    np.cumsum(deviations, axis=1, out=sums[:, 1:])
+    np.cumsum(deviations * deviations, axis=1, out=sums_squares[:, 1:])
+    window_sums = sums[:, window_size:] - sums[:, :-window_size]
+    window_sums_squares = sums_squares[:, window_size:] - sums_squares[:, :-window_size]
+
+    with np.errstate(divide='ignore', invalid='ignore'):  # A one-price window has no sample variance
+        mean[window_size - 1:] = (reference + window_sums / window_size).ravel()[:count]
+        variance[window_size - 1:] = np.maximum((window_sums_squares - window_sums * window_sums / window_size) / (window_size - 1), 0.0).ravel()[:count]
+    return mean, variance
+
+def expanding_moments(values):
+    """
+    Mean, population variance and sample variance of every prefix of `values` (entry i covers values[:i + 1]).
+    """
+    if len(values) == 0:
+        return values, values, values
+    counts = np.arange(1, len(values) + 1, dtype=np.float64)
+    deviations = values - values[0]  # Relative to the first value to keep the sums small
+    sums = np.cumsum(deviations)
+    squared_deviations = np.maximum(np.cumsum(deviations * deviations) - sums * sums / counts, 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):  # A single value has no sample variance
+        return values[0] + sums / counts, squared_deviations / counts, squared_deviations / (counts - 1)
+
+def expanding_median(values):
+    """
+    Median of every prefix of `values`, kept with two heaps (the lower half negated) as the prices arrive.
+    """
+    medians = np.empty(len(values))
+    lower = []
+    upper = []
+    for i, value in enumerate(values.tolist()):
+        if not lower or value <= -lower[0]:
+            heapq.heappush(lower, -value)
+        else:
+            heapq.heappush(upper, value)
+        if len(lower) > len(upper) + 1:
+            heapq.heappush(upper, -heapq.heappop(lower))
+        elif len(upper) > len(lower):
+            heapq.heappush(lower, -heapq.heappop(upper))
+        medians[i] = -lower[0] if len(lower) > len(upper) else (-lower[0] + upper[0]) / 2
+    return medians
+
+def compute_rsi_series(prices, window_size=14):
+    """
+    RSI after every price, equal to compute_rsi of each prefix of the series, including its seed of the first
+    window_size + 1 changes and the Wilder smoothing from the change of bar `window_size` on.
+    """
+    count = len(prices)
+    deltas = np.diff(prices)
+    gains = np.maximum(deltas, 0.0)
+    losses = np.maximum(-deltas, 0.0)
+    cumulative_gains = np.concatenate(([0.0], np.cumsum(gains)))
+    cumulative_losses = np.concatenate(([0.0], np.cumsum(losses)))
+
+    # Prefixes up to window_size prices have only their seed
+    seeded = min(count, window_size)
+    up = np.empty(count)
+    down = np.empty(count)
+    up[:seeded] = cumulative_gains[:seeded] / window_size
+    down[:seeded] = cumulative_losses[:seeded] / window_size
+
+    decay = (window_size - 1) / window_size
+    if count > window_size:
+        # window_size + 1 prices: a seed of every change, smoothed once with the last one
+        up[window_size] = (cumulative_gains[window_size] / window_size * (window_size - 1) + gains[window_size - 1]) / window_size
+        down[window_size] = (cumulative_losses[window_size] / window_size * (window_size - 1) + losses[window_size - 1]) / window_size
+    if count > window_size + 1:
+        # Longer prefixes share the seed of the first window_size + 1 changes and smooth from the change of bar window_size
+        first = window_size + 1
+        up_increments = gains[first - 1:] / window_size
+        down_increments = losses[first - 1:] / window_size
+        up_increments[0] = ((cumulative_gains[first] / window_size * (window_size - 1) + gains[window_size - 1]) / window_size * (window_size - 1) + gains[window_size]) / window_size
+        down_increments[0] = ((cumulative_losses[first] / window_size * (window_size - 1) + losses[window_size - 1]) / window_size * (window_size - 1) + losses[window_size]) / window_size
+        up[first:] = decay_scan(up_increments, decay)
+        down[first:] = decay_scan(down_increments, decay)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return 100. - 100. / (1. + up / down)
+
+def compute_indicator_series(prices, volumes=None, bollinger_window=20, num_std_dev=2, atr_window=14, rsi_window=14,
+                             moving_average_window=20, cv_window=None):
+    """
+    Every indicator of compute_stock_metrics after every price, in one pass over the series.
+    Entry i of each array equals the metric computed on prices[:i + 1] (and volumes[:i + 1]), NaN where the
+    metric would be None, so no caller has to recompute the metrics on growing prefixes.
+    :param cv_window: Window of the coefficient of variation; None uses all prices so far, like compute_cv.
+    :return: Dictionary of arrays aligned with the prices: 'lower_band', 'moving_average', 'upper_band', 'atr',
+             'cv', 'rsi', 'moving_average_value' and, if volumes are given, 'volatility_index'.
+    """
+    count = len(prices)
+    moving_average, variance = rolling_moments(prices, bollinger_window)
+    std_dev = np.sqrt(variance)
+
+    # ATR: mean of up to atr_window of the absolute changes before each price; the first price has none
+    true_range = np.concatenate((np.zeros(atr_window), np.abs(np.diff(prices))))
+    true_range_sums = rolling_moments(true_range, atr_window)[0][atr_window:] * atr_window if count else true_range[:0]
+    atr = np.full(count, np.nan)
+    atr[1:] = true_range_sums / np.minimum(np.arange(1, count), atr_window)
+
+    expanding_mean, expanding_variance, expanding_sample_variance = expanding_moments(prices)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if cv_window is None:
+            cv = np.sqrt(expanding_variance) / expanding_mean * 100
+        else:
+            cv_mean, cv_variance = rolling_moments(prices, cv_window)
+            cv = np.sqrt(cv_variance * (cv_window - 1) / cv_window) / cv_mean * 100
+
+    series = {
+        'lower_band': moving_average - num_std_dev * std_dev,
+        'moving_average': moving_average,
+        'upper_band': moving_average + num_std_dev * std_dev,
         'atr': atr,
         'cv': cv,
-        'rsi': rsi,
-        'moving_average_value': moving_average_value
-    }
\ No newline at end of file
+        'rsi': compute_rsi_series(prices, rsi_window),
+        'moving_average_value': moving_average if moving_average_window == bollinger_window else rolling_moments(prices, moving_average_window)[0]
+    }
+
+    if volumes is not None:
+        median_price = expanding_median(prices)
+        average_volume = np.cumsum(volumes, dtype=np.float64) / np.arange(1, count + 1)
+        bollinger_band_width = series['upper_band'] - series['lower_band']
+        # Same weights as compute_volatility_index: 0.3 std dev, 0.2 ATR, 0.2 band width, 0.3 volume
+        series['volatility_index'] = (0.3 * np.sqrt(expanding_sample_variance) / median_price +
+                                      0.2 * atr / median_price +
+                                      0.2 * bollinger_band_width / median_price +
+                                      0.3 * average_volume / 1_000_000) * 100
+    return series
+
+def calculate_bollinger_bands(prices, window_size=20, num_std_dev=2):
+    return compute_bollinger_bands(as_price_array(prices), window_size, num_std_dev)
+
+def calculate_atr(prices, window_size=14):
+    return compute_atr(as_price_array(prices), window_size)
+
+def calculate_cv(prices):
+    return compute_cv(as_price_array(prices))
+
+def calculate_rsi(prices, window_size=14):
+    return compute_rsi(as_price_array(prices), window_size)
+
+def calculate_moving_averages(prices, window_size=20):
+    return compute_moving_average(as_price_array(prices), window_size)
+
+def calculate_volatility_index(prices, volumes):
+    return compute_volatility_index(as_price_array(prices), np.asarray(volumes))
+
+def calculate_stock_metrics(prices, volumes):
+    return compute_stock_metrics(as_price_array(prices), np.asarray(volumes))
+
+def calculate_indicator_series(prices, volumes=None, bollinger_window=20, num_std_dev=2, atr_window=14, rsi_window=14,
+                               moving_average_window=20, cv_window=None):
+    return compute_indicator_series(as_price_array(prices), None if volumes is None else np.asarray(volumes), bollinger_window,
+                                    num_std_dev, atr_window, rsi_window, moving_average_window, cv_window)
@@ -0,0 +1,149 @@
+import os
+import csv
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from stockAnalysis import calculate_stock_analysis, calculate_buy_index
+from analysisCache import get_analysis_cache, make_analysis_key
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../DatabaseSetup')))
+from dataCatalog import load_catalog, plan_range, load_planned_range
+from priceCache import is_cache_current, build_price_cache
+from tradingCalendar import sessions_between
+
+SCREENER_COLUMNS = ('rank', 'symbol', 'bars', 'last_price', 'volatility_index', 'rsi', 'moving_average', 'buy_index', 'missing_days')
+SCREENER_CHUNK_SIZE = 8  # Symbols handed to a worker at a time
+
+def read_symbols(value):
+    """
+    Parse the screener's symbol argument: a comma-separated list, or the path of a file listing symbols
+    separated by commas, spaces or newlines.
+    :return: List of unique upper-case symbols in the order given.
+    """
+    if os.path.isfile(value):
+        with open(value) as f:
+            value = f.read()
+    symbols = [symbol.strip().upper() for symbol in value.replace(',', ' ').split()]
+    return list(dict.fromkeys(symbol for symbol in symbols if symbol))
+
+def plan_screen(symbols, start_date, end_date, interval, data_dir=None):
+    """
+    Plan which existing databases supply each symbol, loading the catalog once for the whole universe.
+    Nothing is fetched: symbols without a database are reported, and days no database covers are counted.
+    :return: Tuple of (list of (symbol, pieces, missing trading days) for symbols with data, list of symbols without data).
+    """
+    catalog = load_catalog(data_dir)
+    trading_days = sessions_between(start_date, end_date)
+    plans = []
+    unavailable = []
+    for symbol in symbols:
+        pieces, uncovered = plan_range(symbol, start_date, end_date, interval, data_dir, catalog)
+        if not pieces:
+            unavailable.append(symbol)
+            continue
+        plans.append((symbol, pieces, len(np.intersect1d(uncovered, trading_days))))
+    return plans, unavailable
+
+def analyze_symbol(plan):
+    """
+    Compute the volatility index, metrics and buy index of one symbol in a worker process.
+    :param plan: Tuple of (symbol, pieces, missing trading days) from plan_screen.
+    :return: Row dictionary with the SCREENER_COLUMNS other than the rank and the missing days.
+    """
+    symbol, pieces, _ = plan
+    columns = load_planned_range(symbol, pieces)
+    volatility_index, metrics = calculate_stock_analysis(columns)
+    row = {'symbol': symbol, 'bars': len(columns['price']), 'last_price': None, 'volatility_index': volatility_index,
+           'rsi': None, 'moving_average': None, 'buy_index': None}
+    if len(columns['price']) > 0:
+        row['last_price'] = float(columns['price'][-1])
+    if volatility_index is not None and metrics is not None:
+        # Same current price as stockAnalysis.py, so the ranking matches its per-symbol buy index
+        current_price = metrics['moving_average_value']
+        row['rsi'] = float(metrics['rsi'])
+        row['moving_average'] = current_price
+        row['buy_index'] = calculate_buy_index(volatility_index, metrics, current_price)
+    return row
+
+def screen_symbols(symbols, start_date, end_date, interval, max_workers=None, data_dir=None, cache=None):
+    """
+    Rank symbols by buy index, computing each symbol's analysis across a process pool from the databases already built.
+    Rows of symbols whose databases are unchanged since an earlier screen come from the analysis cache, and only the
+    rest go to the pool. Stale price caches are rebuilt first, one task per database and symbol, so no two workers
+    write the same cache.
+    :return: Tuple of (rows sorted by buy index with their rank, symbols without data); symbols whose metrics could not
+             be computed are ranked last with a buy index of None.
+    """
+    cache = cache or get_analysis_cache()
+    plans, unavailable = plan_screen(symbols, start_date, end_date, interval, data_dir)
+
+    rows = []
+    pending = []
+    for plan in plans:
+        symbol, pieces, missing_days = plan
+        key = make_analysis_key('screener_row', symbol, start_date, end_date, interval, pieces)
+        found, row = cache.get(key)
+        if found:
+            rows.append({**row, 'missing_days': missing_days})
+        else:
+            pending.append((key, plan))
+
+    if pending:
+        sources = sorted({(db_path, symbol) for _, (symbol, pieces, _) in pending for db_path, _ in pieces})
+        stale = [(db_path, symbol) for db_path, symbol in sources if not is_cache_current(db_path, symbol)]
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            if stale:
+                print(f"Building the price cache of {len(stale)} symbols...")
+                list(executor.map(build_price_cache, *zip(*stale)))
+            computed = executor.map(analyze_symbol, [plan for _, plan in pending], chunksize=SCREENER_CHUNK_SIZE)
+            for (key, plan), row in zip(pending, computed):
+                cache.put(key, row)  # Stored from this process only, so the workers never contend for the cache file
+                rows.append({**row, 'missing_days': plan[2]})
+
+    rows.sort(key=lambda row: (row['buy_index'] is None, -(row['buy_index'] or 0), row['symbol']))
+    for rank, row in enumerate(rows, start=1):
+        row['rank'] = rank
+    return rows, unavailable
+
+def write_screen_csv(csv_file, rows):
+    with open(csv_file, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SCREENER_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+def format_value(value, spec):
+    return format(value, spec) if value is not None else '-'
+
+def print_screen(rows):
+    print(f"{'Rank':>5}  {'Symbol':<8} {'Bars':>9} {'Last Price':>11} {'Volatility':>11} {'RSI':>7} {'Moving Avg':>11} {'Buy Index':>10} {'Missing':>8}")
+    for row in rows:
+        print(f"{row['rank']:>5}  {row['symbol']:<8} {row['bars']:>9,} {format_value(row['last_price'], '>11.2f')} "
+              f"{format_value(row['volatility_index'], '>11.4f')} {format_value(row['rsi'], '>7.2f')} "
+              f"{format_value(row['moving_average'], '>11.2f')} {format_value(row['buy_index'], '>10.4f')} {row['missing_days']:>8}")
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (5, 6, 7):
+        print("Usage: python stockScreener.py <symbols|symbols_file> <start_date> <end_date> <interval> [max_workers] [output.csv]")
+        print("Example: python stockScreener.py AAPL,AMZN,NFLX 2024-06-17 2024-06-21 1m 8 ranking.csv")
+        sys.exit(1)
+
+    symbols = read_symbols(sys.argv[1])
+    start_date = sys.argv[2].strip()
+    end_date = sys.argv[3].strip()
+    interval = sys.argv[4].strip()
+    max_workers = int(sys.argv[5]) if len(sys.argv) >= 6 else None
+    csv_file = sys.argv[6] if len(sys.argv) == 7 else None
+
+    start_time = time.perf_counter()
+    rows, unavailable = screen_symbols(symbols, start_date, end_date, interval, max_workers)
+    if unavailable:
+        print(f"No database covers {start_date} to {end_date} ({interval}) for: {', '.join(unavailable)}")
+    if not rows:
+        print("No data available to screen.")
+        sys.exit(1)
+
+    print_screen(rows)
+    print(f"Screened {len(rows)} symbols in {time.perf_counter() - start_time:.2f} seconds.")
+    if csv_file:
+        write_screen_csv(csv_file, rows)
+        print(f"Ranking saved at: {csv_file}")
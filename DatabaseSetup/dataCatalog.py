@@ -0,0 +1,244 @@
+import os
+import sys
+import json
+import sqlite3
+import threading
+from datetime import datetime
+import numpy as np
+from priceSchema import ensure_current_schema, get_symbols, get_failed_days, from_timestamp
+from priceCache import load_price_cache, get_source_fingerprint, date_to_epoch_day, epoch_day_to_date
+from tradingCalendar import sessions_between
+
+# Index of every stock_prices database in data/: its symbols, interval and the days it covers
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data'))
+CATALOG_FILE = os.path.join(DATA_DIR, 'catalog.json')
+CATALOG_VERSION = 2
+HISTORICAL_INTERVAL = '1m'  # historicalDatabase.py always fetches minute bars
+
+_catalog_lock = threading.Lock()
+
+def normalize_interval(interval):
+    return interval.replace(' ', '').replace(':', '').replace('-', '')
+
+def parse_db_filename(db_name):
+    """
+    Read the symbol, date range and interval encoded in a database filename.
+    Handles SYMBOL_START_END_INTERVAL.db, SYMBOL_START_INTERVAL.db and SYMBOL_historical_data.db.
+    :return: Tuple of (symbol, start_date, end_date, interval) with None for parts the name does not give,
+             or None if the name does not follow any of these patterns.
+    """
+    parts = os.path.splitext(db_name)[0].split('_')
+    if parts[1:] == ['historical', 'data']:
+        return parts[0], None, None, HISTORICAL_INTERVAL
+    try:
+        dates = [datetime.strptime(part, '%Y.%m.%d').strftime('%Y-%m-%d') for part in parts[1:-1]]
+    except ValueError:
+        return None
+    if len(dates) == 2:
+        return parts[0], dates[0], dates[1], parts[-1]
+    if len(dates) == 1:
+        return parts[0], dates[0], dates[0], parts[-1]
+    return None
+
+def scan_database(db_path):
+    """
+    Build the catalog entry of one database.
+    The covered range is the one requested when the file was built (from its name), since days the market was
+    closed or the API had nothing for are covered too; files without a range in their name cover their data.
+    Days whose requests failed during the build are listed separately and do not count as covered.
+    :return: Entry dictionary, or None if the file holds no stock_prices table.
+    """
+    parsed = parse_db_filename(os.path.basename(db_path))
+    if parsed is None:
+        return None
+
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='stock_prices'")
+    has_table = c.fetchone() is not None
+    conn.close()
+    if not has_table:
+        return None
+
+    ensure_current_schema(db_path)
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    symbols = get_symbols(c)
+    c.execute("SELECT MIN(price_timestamp), MAX(price_timestamp) FROM stock_prices")
+    first_timestamp, last_timestamp = c.fetchone()
+    failed_days = get_failed_days(c)
+    conn.close()
+
+    first_day = from_timestamp(first_timestamp).strftime('%Y-%m-%d') if first_timestamp is not None else None
+    last_day = from_timestamp(last_timestamp).strftime('%Y-%m-%d') if last_timestamp is not None else None
+    symbol, start_date, end_date, interval = parsed
+    return {
+        'symbols': symbols or [symbol],
+        'interval': interval,
+        'start_date': start_date or first_day,
+        'end_date': end_date or last_day,
+        'first_data_day': first_day,
+        'last_data_day': last_day,
+        'failed_days': failed_days,
+        'source': get_source_fingerprint(db_path)
+    }
+
+def load_catalog(data_dir=None):
+    """
+    Load the catalog, rescanning only the databases that were added or changed since it was saved.
+    :return: Dictionary of database filename -> entry.
+    """
+    data_dir = data_dir or DATA_DIR
+    catalog_file = os.path.join(data_dir, os.path.basename(CATALOG_FILE))
+    with _catalog_lock:
+        catalog = {}
+        if os.path.exists(catalog_file):
+            with open(catalog_file) as f:
+                saved = json.load(f)
+            if saved.get('version') == CATALOG_VERSION:
+                catalog = saved['databases']
+
+        changed = False
+        db_names = {name for name in os.listdir(data_dir) if name.endswith('.db')} if os.path.isdir(data_dir) else set()
+        for db_name in list(catalog):
+            if db_name not in db_names:
+                del catalog[db_name]
+                changed = True
+        for db_name in sorted(db_names):
+            db_path = os.path.join(data_dir, db_name)
+            entry = catalog.get(db_name)
+            if entry is not None and entry['source'] == get_source_fingerprint(db_path):
+                continue
+            try:
+                entry = scan_database(db_path)
+            except sqlite3.Error as e:
+                print(f"Skipping {db_name} in the data catalog: {e}")
+                entry = None
+            if entry is None:
+                catalog.pop(db_name, None)
+            else:
+                catalog[db_name] = entry
+            changed = True
+
+        if changed:
+            temp_file = catalog_file + '.tmp'
+            with open(temp_file, 'w') as f:
+                json.dump({'version': CATALOG_VERSION, 'databases': catalog}, f, indent=1)
+            os.replace(temp_file, catalog_file)
+        return catalog
+
+def plan_range(symbol, start_date, end_date, interval, data_dir=None, catalog=None):
+    """
+    Work out which databases can answer a request and which trading days none of them cover.
+    Files covering the most of the range are used first, so a request is served by as few files as possible.
+    Days a file's build failed to fetch are left for another file, or reported as uncovered.
+    :param catalog: Catalog already returned by load_catalog, to plan many symbols without reloading it for each.
+    :return: Tuple of (list of (db_path, [epoch days it supplies]) in day order, [uncovered calendar epoch days]).
+    """
+    data_dir = data_dir or DATA_DIR
+    interval = normalize_interval(interval)
+    first_day, last_day = date_to_epoch_day(start_date), date_to_epoch_day(end_date)
+    remaining = set(range(first_day, last_day + 1))
+
+    candidates = []
+    for db_name, entry in (catalog if catalog is not None else load_catalog(data_dir)).items():
+        if symbol not in entry['symbols'] or entry['interval'] != interval or entry['start_date'] is None:
+            continue
+        covered_first = max(first_day, date_to_epoch_day(entry['start_date']))
+        covered_last = min(last_day, date_to_epoch_day(entry['end_date']))
+        if covered_first <= covered_last:
+            failed = {date_to_epoch_day(day) for day in entry.get('failed_days', [])}
+            candidates.append((covered_last - covered_first, db_name, covered_first, covered_last, failed))
+
+    pieces = []
+    for _, db_name, covered_first, covered_last, failed in sorted(candidates, key=lambda candidate: (-candidate[0], candidate[1])):
+        days = sorted(remaining.intersection(range(covered_first, covered_last + 1)).difference(failed))
+        if days:
+            pieces.append((os.path.join(data_dir, db_name), days))
+            remaining.difference_update(days)
+    pieces.sort(key=lambda piece: piece[1][0])
+    return pieces, sorted(remaining)
+
+def find_missing_ranges(symbol, start_date, end_date, interval, data_dir=None):
+    """
+    List the runs of trading days in a range that no database covers yet.
+    :return: List of (start_date, end_date) strings, one per run, trimmed to trading days.
+    """
+    _, uncovered = plan_range(symbol, start_date, end_date, interval, data_dir)
+    if not uncovered:
+        return []
+    trading_days = set(sessions_between(uncovered[0], uncovered[-1]).tolist())
+
+    # A run ends wherever a covered day interrupts the uncovered ones
+    ranges = []
+    run = []
+    for day in uncovered:
+        if run and day != run[-1] + 1:
+            ranges.append(run)
+            run = []
+        run.append(day)
+    ranges.append(run)
+
+    missing = []
+    for run in ranges:
+        run_trading_days = [day for day in run if day in trading_days]
+        if run_trading_days:
+            missing.append((epoch_day_to_date(run_trading_days[0]), epoch_day_to_date(run_trading_days[-1])))
+    return missing
+
+def day_runs(days):
+    """
+    Group sorted epoch days into (first, last) runs of consecutive days.
+    """
+    runs = []
+    for day in days:
+        if runs and day == runs[-1][1] + 1:
+            runs[-1][1] = day
+        else:
+            runs.append([day, day])
+    return runs
+
+def load_price_range(symbol, start_date, end_date, interval, data_dir=None):
+    """
+    Load a symbol's prices for a date range from whichever databases cover it.
+    A range inside a single database comes back as views of its memory-mapped cache; otherwise the pieces
+    of each database are copied into one series in time order.
+    :return: Dictionary of arrays 'timestamp', 'price' and 'volume', like load_price_cache.
+    """
+    pieces, _ = plan_range(symbol, start_date, end_date, interval, data_dir)
+    return load_planned_range(symbol, pieces)
+
+def load_planned_range(symbol, pieces):
+    """
+    Load a symbol's price columns from the databases and days plan_range planned for it.
+    A database can hold several symbols, so each one is read through its own cache of the database.
+    :return: Dictionary of arrays 'timestamp', 'price' and 'volume', like load_price_range.
+    """
+    slices = []
+    for db_path, days in pieces:
+        columns = load_price_cache(db_path, symbol)
+        for first, last in day_runs(days):
+            bounds = np.searchsorted(columns['timestamp'], (first * 1440, (last + 1) * 1440))
+            slices.append({name: values[bounds[0]:bounds[1]] for name, values in columns.items()})
+
+    if len(slices) == 1:
+        return slices[0]
+    if not slices:
+        return {'timestamp': np.empty(0, dtype=np.int64), 'price': np.empty(0, dtype=np.float64), 'volume': np.empty(0, dtype=np.int64)}
+    return {name: np.concatenate([piece[name] for piece in slices]) for name in slices[0]}
+
+if __name__ == "__main__":
+    # Print the catalog, or the coverage plan of one request
+    if len(sys.argv) == 5:
+        symbol, start_date, end_date, interval = sys.argv[1].upper(), sys.argv[2], sys.argv[3], sys.argv[4]
+        pieces, _ = plan_range(symbol, start_date, end_date, interval)
+        for db_path, days in pieces:
+            print(f"{os.path.basename(db_path)}: {epoch_day_to_date(days[0])} to {epoch_day_to_date(days[-1])}")
+        missing = find_missing_ranges(symbol, start_date, end_date, interval)
+        print(f"Missing trading days: {missing if missing else 'none'}")
+    elif len(sys.argv) == 1:
+        for db_name, entry in load_catalog().items():
+            print(f"{db_name}: {','.join(entry['symbols'])} {entry['interval']} {entry['start_date']} to {entry['end_date']}")
+    else:
+        print("Usage: python dataCatalog.py [<symbol> <start_date> <end_date> <interval>]")
+        sys.exit(1)
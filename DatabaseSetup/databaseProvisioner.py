@@ -0,0 +1,147 @@
+import os
+import sys
+import sqlite3
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from setupDatabase import create_database, generate_db_filename
+from historicalDatabase import populate_database
+from dataCatalog import find_missing_ranges, DATA_DIR
+
+# Symbols being provisioned right now; a later request for the same symbol waits for it and then fetches only what is still missing
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+def get_database_path(symbol, start_date, end_date=None, interval='1h'):
+    """
+    Path of a symbol's historical database, named the way setupDatabase.py names it.
+    """
+    return os.path.join(DATA_DIR, generate_db_filename(symbol, start_date, end_date, interval))
+
+def count_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    c.execute("SELECT COUNT(*) FROM stock_prices")
+    count = c.fetchone()[0]
+    conn.close()
+    return count
+
+def build_database(symbol, start_date, end_date, interval, progress_callback=None):
+    """
+    Create and populate one symbol's historical database in this process.
+    A database left empty by failed requests is removed so the next run tries again; one the API simply
+    had no data for is kept, so its range counts as covered and is not requested again. Days that failed in a
+    database that kept other rows are recorded in it, so the catalog reports them as missing.
+    :return: Path of the database.
+    :raises RuntimeError: If no data could be fetched because the requests failed.
+    """
+    db_path = get_database_path(symbol, start_date, end_date, interval)
+    create_database(db_path)
+    callback = (lambda done, total: progress_callback(symbol, done, total)) if progress_callback else None
+    summary = populate_database(db_path, symbol, start_date, end_date, interval, progress_callback=callback)
+
+    if count_rows(db_path) == 0 and (summary is None or summary['failed_days']):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(db_path + suffix):
+                os.remove(db_path + suffix)
+        failed = f", {len(summary['failed_days'])} days failed" if summary else ""
+        raise RuntimeError(f"No data fetched for {symbol} from {start_date} to {end_date}{failed}.")
+    return db_path
+
+def provision_symbol(symbol, start_date, end_date, interval, missing_ranges, previous=None, progress_callback=None):
+    """
+    Fetch the uncovered runs of trading days of one symbol, each into its own database named for the run.
+    :return: Paths of the databases built.
+    """
+    if previous is not None:
+        wait([previous])
+        missing_ranges = find_missing_ranges(symbol, start_date, end_date, interval)
+    return [build_database(symbol, run_start, run_end, interval, progress_callback) for run_start, run_end in missing_ranges]
+
+def provision_databases(symbols, start_date, end_date, interval, max_workers=None, progress_callback=None, on_complete=None):
+    """
+    Make sure the databases in data/ cover every symbol's date range, building what is missing for all
+    symbols at the same time, in threads of this process.
+    Days any existing database already covers are not fetched again: only the uncovered runs of trading days are.
+    Each build fetches through the shared per-key rate limits, so the symbols overlap instead of queueing.
+    :param progress_callback: Called with (symbol, days_done, total_days) as each build advances.
+    :param on_complete: Called with (symbol, future) when a symbol is done or failed.
+    :return: Dictionary of symbol -> Future resolving to the list of databases built for it.
+             Symbols that are already covered get an already completed future.
+    """
+    futures = {}
+    executor = None
+    for symbol in dict.fromkeys(symbols):  # Keep order, drop repeats
+        missing_ranges = find_missing_ranges(symbol, start_date, end_date, interval)
+        with _in_flight_lock:
+            previous = _in_flight.get((symbol, interval))
+            if missing_ranges or previous is not None:
+                if executor is None:
+                    executor = ThreadPoolExecutor(max_workers=max_workers or len(symbols), thread_name_prefix='provision')
+                future = executor.submit(provision_symbol, symbol, start_date, end_date, interval, missing_ranges, previous, progress_callback)
+                _in_flight[(symbol, interval)] = future
+                future.add_done_callback(lambda done, key=(symbol, interval): _forget(key, done))
+            else:  # Already covered
+                future = Future()
+                future.set_result([])
+
+        if on_complete is not None:
+            future.add_done_callback(lambda done, symbol=symbol: on_complete(symbol, done))
+        futures[symbol] = future
+
+    if executor is not None:
+        executor.shutdown(wait=False)  # Running builds finish; the pool's threads exit once they do
+    return futures
+
+def _forget(key, future):
+    with _in_flight_lock:
+        if _in_flight.get(key) is future:
+            del _in_flight[key]
+
+class ProvisioningProgress:
+    """
+    Progress callback that keeps one status line for all the symbols being built.
+    """
+
+    def __init__(self, symbols):
+        self.progress = {symbol: (0, 0) for symbol in symbols}
+        self.lock = threading.Lock()
+
+    def __call__(self, symbol, done, total):
+        with self.lock:
+            self.progress[symbol] = (done, total)
+            status = "  ".join(f"{name} {days}/{total_days}" if total_days else f"{name} ..."
+                               for name, (days, total_days) in self.progress.items())
+            sys.stdout.write(f"\rBuilding databases: {status}")
+            sys.stdout.flush()
+
+def provision_and_wait(symbols, start_date, end_date, interval, max_workers=None):
+    """
+    Build whatever is missing for several symbols in parallel and block until all of them are done, showing progress.
+    :return: List of the symbols whose date range is fully available.
+    """
+    missing = [symbol for symbol in dict.fromkeys(symbols) if find_missing_ranges(symbol, start_date, end_date, interval)]
+    if missing:
+        print(f"Fetching missing data for {', '.join(missing)} between {start_date} and {end_date}...")
+    futures = provision_databases(symbols, start_date, end_date, interval, max_workers, ProvisioningProgress(missing) if missing else None)
+    wait(futures.values())
+    if missing:
+        print()
+
+    available = []
+    for symbol, future in futures.items():
+        try:
+            future.result()
+            available.append(symbol)
+        except Exception as e:
+            print(f"Failed to create database for {symbol}: {e}")
+    return available
+
+if __name__ == "__main__":
+    if len(sys.argv) != 5:
+        print("Usage: python databaseProvisioner.py <symbols> <start_date> <end_date> <interval>")
+        print("Example: python databaseProvisioner.py AAPL,AMZN,NFLX 2023-01-01 2023-06-30 1m")
+        sys.exit(1)
+
+    symbols = [symbol.strip().upper() for symbol in sys.argv[1].split(",") if symbol.strip()]
+    available = provision_and_wait(symbols, sys.argv[2].strip(), sys.argv[3].strip(), sys.argv[4].strip())
+    print(f"Data available for: {', '.join(available) if available else 'none'}")
@@ -2,16 +2,22 @@ import requests
 import sqlite3
 import os
 import sys
+import queue
+import random
+import threading
 from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 import time
-import pytz
-import holidays
+from priceSchema import create_stock_prices_table, ensure_current_schema, to_timestamp, PriceRecord, record_failed_days
+from priceWriter import BulkPriceWriter, DEFAULT_BATCH_SIZE
+from tradingCalendar import session_dates_between
 
 # Load environment variables from paths.env file
 dotenv_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../paths.env'))
 load_dotenv(dotenv_path)
-POLYGON_API_KEYS = os.getenv('POLYGON_API_KEYS').split(',')
+POLYGON_API_KEYS = [key for key in os.getenv('POLYGON_API_KEYS', '').split(',') if key]
+POLYGON_CALLS_PER_MINUTE = int(os.getenv('POLYGON_CALLS_PER_MINUTE', '5'))  # Per key; 5 is the free plan's limit
 
 MARKET_OPEN_TIME = 9 * 60 + 30  # 9:30 AM in minutes
 MARKET_CLOSE_TIME = 16 * 60     # 4:00 PM in minutes
@@ -21,10 +27,10 @@ def create_database(db_path):
     Create the stock prices database if it doesn't exist.
     """
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    ensure_current_schema(db_path)  # An existing v1 database is upgraded rather than mixed with v2 rows
     conn = sqlite3.connect(db_path)
     c = conn.cursor()
-    c.execute('''CREATE TABLE IF NOT EXISTS stock_prices
-                 (stock_name TEXT, stock_price REAL, volume INTEGER, price_time TEXT, price_date TEXT)''')
+    create_stock_prices_table(c)
     conn.commit()
     conn.close()
 
@@ -53,28 +59,110 @@ def filter_market_hours(data):
             market_data.append(entry)
     return market_data
 
-def convert_to_12hr_format(time_str):
+class TokenBucket:
     """
-    Convert a time string to 12-hour format.
+    Rate limiter for one API key: allows `calls_per_minute` calls per minute on average, with bursts up to `capacity`.
+    A 429 response pauses the bucket for a jittered, exponentially growing delay.
+    Shared between the threads fetching with the same key.
     """
-    dt = datetime.strptime(time_str, '%H:%M:%S')
-    return dt.strftime('%I:%M:%S %p')
 
-def record_exists(c, symbol, price, volume, time, date):
+    def __init__(self, calls_per_minute, capacity=None):
+        self.rate = calls_per_minute / 60
+        self.capacity = capacity or calls_per_minute
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until a call is allowed, then take a token.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                wait = self.paused_until - now
+                if wait <= 0:
+                    if self.tokens >= 1:
+                        self.tokens -= 1
+                        return
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def backoff(self, attempt, base_delay=2.0, max_delay=120.0):
+        """
+        Pause the key after it was throttled, and drop any burst it had saved up.
+        :return: The delay in seconds.
+        """
+        delay = min(max_delay, base_delay * 2 ** attempt) * random.uniform(0.5, 1.5)
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + delay)
+            self.tokens = 0.0
+        return delay
+
+# One bucket per key for the whole process, so symbols populated at the same time share each key's limit
+_key_buckets = {}
+_key_buckets_lock = threading.Lock()
+
+def get_key_bucket(api_key, calls_per_minute=POLYGON_CALLS_PER_MINUTE):
+    with _key_buckets_lock:
+        if api_key not in _key_buckets:
+            _key_buckets[api_key] = TokenBucket(calls_per_minute)
+        return _key_buckets[api_key]
+
+def get_trading_days(start_date, end_date):
     """
-    Check if a record already exists in the database to prevent duplicates.
+    List the NYSE sessions between two dates, as datetimes at midnight.
     """
-    query = """SELECT 1 FROM stock_prices WHERE 
-               stock_name = ? AND stock_price = ? AND volume = ? AND price_time = ? AND price_date = ?"""
-    c.execute(query, (symbol, price, volume, time, date))
-    return c.fetchone() is not None
+    return [datetime.combine(day, datetime.min.time()) for day in session_dates_between(start_date, end_date)]
 
-def populate_database(db_path, symbol, start_date=None, end_date=None, interval='1m'):
+def fetch_worker(symbol, api_key, bucket, day_queue, result_queue, max_retries=6):
+    """
+    Fetch days from the shared queue with one API key until the queue is empty.
+    Every finished day goes to the result queue as (date, market_data, error).
+    """
+    while True:
+        try:
+            current_date = day_queue.get_nowait()
+        except queue.Empty:
+            return
+
+        for attempt in range(max_retries + 1):
+            bucket.acquire()
+            try:
+                data = fetch_historical_data(symbol, current_date, api_key)
+                result_queue.put((current_date, filter_market_hours(data), None))
+                break
+            except requests.exceptions.HTTPError as e:
+                # Throttled: this key waits while the other keys keep draining the queue
+                if e.response is not None and e.response.status_code == 429 and attempt < max_retries:
+                    bucket.backoff(attempt)
+                    continue
+                result_queue.put((current_date, None, e))
+                break
+            except Exception as e:  # Any other failure is reported so the writer never waits on a lost day
+                result_queue.put((current_date, None, e))
+                break
+
+def populate_database(db_path, symbol, start_date=None, end_date=None, interval='1m', api_keys=None, calls_per_minute=POLYGON_CALLS_PER_MINUTE, workers_per_key=1,
+                      batch_size=DEFAULT_BATCH_SIZE, progress_callback=None):
     """
     Populate the database with historical stock prices.
+    Days are fetched concurrently across all API keys, each key limited by its token bucket (shared with any
+    other populate running in the process), while this thread is the only one writing to the database.
+    :param api_keys: Keys to spread the requests over (defaults to POLYGON_API_KEYS).
+    :param calls_per_minute: Calls allowed per minute for each key by the Polygon plan.
+    :param workers_per_key: Threads per key; raise it on plans fast enough that request latency is the limit.
+    :param batch_size: Rows written per transaction.
+    :param progress_callback: Called with (days_done, total_days) after each day, in place of the progress output.
+    :return: Dictionary with 'rows_inserted', 'failed_days' and the writer's 'report', or None without API keys.
     """
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
+    api_keys = api_keys or POLYGON_API_KEYS
+    if not api_keys:
+        print("No Polygon API keys configured. Set POLYGON_API_KEYS in paths.env.")
+        return
 
     if not start_date:
         end_date = datetime.now()
@@ -83,74 +171,59 @@ def populate_database(db_path, symbol, start_date=None, end_date=None, interval=
         start_date = datetime.strptime(start_date, '%Y-%m-%d')
         end_date = datetime.strptime(end_date, '%Y-%m-%d') if end_date else datetime.now()
 
-    pst = pytz.timezone('America/Los_Angeles')
-    total_api_calls = 0
-    start_time = time.time()
-    key_index = 0  # Start with the first key
-    api_switch_printed = False  # Flag to track when the "Switching API key" message is printed
-
-    # Iterate through each day individually
-    current_date = start_date
-    while current_date <= end_date:
-        # Skip weekends and holidays
-        if current_date.weekday() >= 5 or current_date in holidays.US():
-            current_date += timedelta(days=1)
-            continue
+    # Only NYSE sessions are requested; weekends, holidays and other closures are skipped up front
+    trading_days = get_trading_days(start_date, end_date)
+    day_queue = queue.Queue()
+    for day in trading_days:
+        day_queue.put(day)
+    result_queue = queue.Queue()
+    buckets = [get_key_bucket(api_key, calls_per_minute) for api_key in api_keys]
 
-        try:
-            api_key = POLYGON_API_KEYS[key_index]
-            data = fetch_historical_data(symbol, current_date, api_key)
-            total_api_calls += 1
-
-            # Reset the switch flag after a successful API call
-            api_switch_printed = False
-
-            # Filter data to include only market hours
-            market_data = filter_market_hours(data)
-
-            # Log if no data was fetched for a trading day
-            if len(market_data) == 0:
-                print(f"No data fetched for {symbol} on {current_date.strftime('%Y-%m-%d')}. This could indicate a problem with the data or API.")
-
-            # Insert the data into the database, checking for duplicates first
-            for entry in market_data:
-                ts = entry['t'] // 1000
-                dt = datetime.fromtimestamp(ts)
-                price_time = convert_to_12hr_format(dt.strftime('%H:%M:%S'))
-                price_date = dt.strftime('%Y-%m-%d')
-
-                # Check if the entry already exists to prevent duplicates
-                if not record_exists(c, symbol, entry['c'], entry['v'], price_time, price_date):
-                    try:
-                        c.execute("INSERT INTO stock_prices (stock_name, stock_price, volume, price_time, price_date) VALUES (?, ?, ?, ?, ?)",
-                                  (symbol, entry['c'], entry['v'], price_time, price_date))
-                    except sqlite3.Error as e:
-                        print(f"Failed to insert data for {symbol} on {price_date}: {e}")
-
-            conn.commit()
-
-        except requests.exceptions.HTTPError as e:
-            if e.response.status_code == 429:  # Too Many Requests
-                if not api_switch_printed:
-                    print(f"\nRate limit exceeded. Switching API key... (Date: {current_date.strftime('%Y-%m-%d')})")
-                    api_switch_printed = True  # Set the flag to True to avoid repeated prints
-                key_index = (key_index + 1) % len(POLYGON_API_KEYS)
-                continue  # Retry the current date with the new API key
-            else:
-                print(f"HTTP Error for {current_date.strftime('%Y-%m-%d')}: {e}")
-        except requests.exceptions.RequestException as e:
-            print(f"Request failed for {current_date.strftime('%Y-%m-%d')}: {e}")
+    writer = BulkPriceWriter(db_path, batch_size)
+    start_time = time.time()
+    failed_days = []
 
-        # Log progress
-        progress = ((current_date - start_date).days / (end_date - start_date).days) * 100
-        elapsed_time = time.time() - start_time
-        print(f"\rProgress: {progress:.2f}% - Total API Calls: {total_api_calls} - Time Elapsed: {elapsed_time:.2f}s", end='')
+    with writer, ThreadPoolExecutor(max_workers=max(len(api_keys) * workers_per_key, 1)) as executor:
+        for worker in range(len(api_keys) * workers_per_key):
+            key_index = worker % len(api_keys)
+            executor.submit(fetch_worker, symbol, api_keys[key_index], buckets[key_index], day_queue, result_queue)
 
-        # Move to the next day
-        current_date += timedelta(days=1)
+        # Single writer: batch each day's rows as soon as any worker delivers them
+        for completed in range(1, len(trading_days) + 1):
+            current_date, market_data, error = result_queue.get()
 
-    conn.close()
-    print("\nDatabase population complete.")
+            if error is not None:
+                print(f"\nRequest failed for {current_date.strftime('%Y-%m-%d')}: {error}")
+                failed_days.append(current_date)
+            else:
+                # Log if no data was fetched for a trading day
+                if len(market_data) == 0:
+                    print(f"\nNo data fetched for {symbol} on {current_date.strftime('%Y-%m-%d')}. This could indicate a problem with the data or API.")
+
+                # Queue the rows for the next batch; rows already stored for the same minute are ignored
+                writer.add_many(PriceRecord(symbol, to_timestamp(datetime.fromtimestamp(entry['t'] // 1000)), entry['c'], entry['v'])
+                                for entry in market_data)
+
+            # Log progress
+            if progress_callback is not None:
+                progress_callback(completed, len(trading_days))
+                continue
+            progress = (completed / len(trading_days)) * 100
+            elapsed_time = time.time() - start_time
+            print(f"\rProgress: {progress:.2f}% - Days Fetched: {completed}/{len(trading_days)} - API Keys: {len(api_keys)} - Time Elapsed: {elapsed_time:.2f}s", end='')
+
+    # Kept in the database so the data catalog does not count the failed days as covered and they get fetched again
+    failed_dates = {day.strftime('%Y-%m-%d') for day in failed_days}
+    record_failed_days(db_path, [day.strftime('%Y-%m-%d') for day in trading_days if day.strftime('%Y-%m-%d') not in failed_dates],
+                       sorted(failed_dates))
+
+    summary = {'rows_inserted': writer.rows_inserted, 'failed_days': failed_days, 'report': writer.report()}
+    if progress_callback is None:
+        print(f"\n{summary['report']}", end='')
+        if failed_days:
+            print(f"\nFailed to fetch {len(failed_days)} days: {[day.strftime('%Y-%m-%d') for day in failed_days]}")
+        print("\nDatabase population complete.")
+    return summary
 
 if __name__ == "__main__":
     if len(sys.argv) != 2:
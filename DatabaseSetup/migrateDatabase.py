@@ -0,0 +1,50 @@
+import os
+import sys
+import time
+from priceSchema import migrate_database, SCHEMA_VERSION
+
+DATA_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data'))
+
+def find_databases(data_dir):
+    """
+    List every .db file under the data directory, including subdirectories.
+    """
+    db_paths = []
+    for root, _, files in os.walk(data_dir):
+        db_paths.extend(os.path.join(root, name) for name in files if name.endswith('.db'))
+    return sorted(db_paths)
+
+def migrate_all(db_paths):
+    """
+    Upgrade each database's stock_prices table to the current schema in place.
+    Databases without a stock_prices table (trade and equity logs) or already upgraded are left untouched.
+    """
+    for db_path in db_paths:
+        db_name = os.path.relpath(db_path, DATA_DIR)
+        start_time = time.time()
+        try:
+            result = migrate_database(db_path)
+        except Exception as e:
+            print(f"Failed to migrate {db_name}: {e}")
+            continue
+
+        if result is None:
+            print(f"Skipped {db_name}: already up to date or no stock_prices table.")
+            continue
+        rows_before, rows_after = result
+        print(f"Migrated {db_name} to schema v{SCHEMA_VERSION}: {rows_before:,} rows -> {rows_after:,} "
+              f"({rows_before - rows_after:,} duplicates dropped) in {time.time() - start_time:.2f}s")
+
+if __name__ == "__main__":
+    # Migrate the given database names, or every database under data/
+    if len(sys.argv) > 1:
+        db_paths = [os.path.join(DATA_DIR, db_name) for db_name in sys.argv[1:]]
+    else:
+        db_paths = find_databases(DATA_DIR)
+
+    missing = [db_path for db_path in db_paths if not os.path.exists(db_path)]
+    if missing:
+        print(f"Database file not found: {', '.join(missing)}")
+        sys.exit(1)
+
+    migrate_all(db_paths)
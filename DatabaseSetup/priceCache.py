@@ -0,0 +1,145 @@
+import os
+import sys
+import json
+import sqlite3
+from datetime import datetime, date
+import numpy as np
+from priceSchema import ensure_current_schema, get_symbols
+
+# Columnar copies of the stock_prices databases, one directory of .npy files per symbol of each database
+CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/cache'))
+CACHE_VERSION = 3
+CACHE_COLUMNS = {
+    'timestamp': np.int64,  # Minutes since 1970-01-01 00:00 in the wall-clock time the database stores
+    'price': np.float64,
+    'volume': np.int64
+}
+EPOCH = date(1970, 1, 1)
+
+def get_cache_dir(db_path, symbol):
+    """
+    Return the cache directory for a symbol's rows in a database file.
+    """
+    return os.path.join(CACHE_DIR, os.path.splitext(os.path.basename(db_path))[0], symbol)
+
+def date_to_epoch_day(date_str):
+    """
+    Convert a 'YYYY-MM-DD' string into days since 1970-01-01.
+    """
+    return (datetime.strptime(date_str, '%Y-%m-%d').date() - EPOCH).days
+
+def epoch_day_to_date(epoch_day):
+    """
+    Convert days since 1970-01-01 back into a 'YYYY-MM-DD' string.
+    """
+    return date.fromordinal(EPOCH.toordinal() + int(epoch_day)).strftime('%Y-%m-%d')
+
+def get_source_fingerprint(db_path):
+    """
+    Size and modification time of the database and its write-ahead log, which change whenever rows are written.
+    """
+    fingerprint = {}
+    for suffix in ('', '-wal'):
+        path = db_path + suffix
+        if os.path.exists(path):
+            stat = os.stat(path)
+            fingerprint[f"db{suffix}"] = [stat.st_size, stat.st_mtime_ns]
+    return fingerprint
+
+def read_manifest(cache_dir):
+    manifest_path = os.path.join(cache_dir, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as manifest_file:
+        return json.load(manifest_file)
+
+def is_cache_current(db_path, symbol, cache_dir=None):
+    """
+    Check whether the symbol's cache was built from the current contents of the database.
+    """
+    manifest = read_manifest(cache_dir or get_cache_dir(db_path, symbol))
+    return (manifest is not None
+            and manifest.get('version') == CACHE_VERSION
+            and manifest.get('symbol') == symbol
+            and manifest.get('source') == get_source_fingerprint(db_path))
+
+def build_price_cache(db_path, symbol, cache_dir=None):
+    """
+    Export a symbol's rows of a stock_prices database into columnar .npy files sorted by timestamp.
+    Files are written under temporary names and renamed into place, with the manifest last,
+    so a reader never maps a half-written cache.
+    :return: The manifest of the new cache.
+    """
+    cache_dir = cache_dir or get_cache_dir(db_path, symbol)
+    os.makedirs(cache_dir, exist_ok=True)
+    ensure_current_schema(db_path)
+    fingerprint = get_source_fingerprint(db_path)
+
+    # Walking the primary key returns the symbol's rows already in time order
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    c.execute("SELECT price_timestamp, stock_price, volume FROM stock_prices WHERE stock_name = ? ORDER BY price_timestamp", (symbol,))
+    rows = c.fetchall()
+    conn.close()
+
+    columns = {
+        'timestamp': np.array([row[0] for row in rows], dtype=np.int64) // 60,
+        'price': np.array([row[1] for row in rows], dtype=np.float64),
+        'volume': np.array([row[2] or 0 for row in rows], dtype=np.float64).astype(np.int64)
+    }
+
+    for name, values in columns.items():
+        temp_path = os.path.join(cache_dir, f"{name}.tmp.npy")
+        np.save(temp_path, values.astype(CACHE_COLUMNS[name]))
+        os.replace(temp_path, os.path.join(cache_dir, f"{name}.npy"))
+
+    manifest = {'version': CACHE_VERSION, 'symbol': symbol, 'source': fingerprint, 'rows': len(rows), 'built_at': datetime.now().isoformat()}
+    temp_manifest = os.path.join(cache_dir, 'manifest.tmp.json')
+    with open(temp_manifest, 'w') as manifest_file:
+        json.dump(manifest, manifest_file)
+    os.replace(temp_manifest, os.path.join(cache_dir, 'manifest.json'))
+    return manifest
+
+def load_price_cache(db_path, symbol, cache_dir=None):
+    """
+    Memory-map the columnar cache of a symbol's rows in a database, rebuilding it first if the database changed
+    since it was built.
+    :return: Dictionary of read-only arrays 'timestamp', 'price' and 'volume', sorted by timestamp.
+    """
+    cache_dir = cache_dir or get_cache_dir(db_path, symbol)
+    if not is_cache_current(db_path, symbol, cache_dir):
+        build_price_cache(db_path, symbol, cache_dir)
+
+    columns = {}
+    for name in CACHE_COLUMNS:
+        path = os.path.join(cache_dir, f"{name}.npy")
+        try:
+            columns[name] = np.load(path, mmap_mode='r')
+        except ValueError:
+            columns[name] = np.load(path)  # Empty columns cannot be memory-mapped
+    return columns
+
+def slice_price_cache(columns, start_date, end_date):
+    """
+    Return views of the cached columns for the trading days from start_date to end_date inclusive.
+    """
+    first, last = np.searchsorted(columns['timestamp'], (date_to_epoch_day(start_date) * 1440, (date_to_epoch_day(end_date) + 1) * 1440))
+    return {name: values[first:last] for name, values in columns.items()}
+
+if __name__ == "__main__":
+    # Build the cache for the given database names, or for every database in data/
+    data_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data'))
+    db_names = sys.argv[1:] or sorted(name for name in os.listdir(data_dir) if name.endswith('.db'))
+
+    for db_name in db_names:
+        db_path = os.path.join(data_dir, db_name)
+        ensure_current_schema(db_path)
+        conn = sqlite3.connect(db_path)
+        symbols = get_symbols(conn.cursor())
+        conn.close()
+        for symbol in symbols:
+            if is_cache_current(db_path, symbol):
+                print(f"Cache for {symbol} in {db_name} is up to date.")
+                continue
+            manifest = build_price_cache(db_path, symbol)
+            print(f"Cached {manifest['rows']:,} {symbol} rows from {db_name} at {get_cache_dir(db_path, symbol)}")
@@ -0,0 +1,301 @@
+import os
+import sys
+import time
+import queue
+import sqlite3
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+import pytz
+from priceSchema import PriceRecord, to_timestamp
+from priceWriter import BulkPriceWriter
+from setupDatabase import create_database, generate_db_filename
+from tradingCalendar import get_calendar, is_session
+
+EASTERN = pytz.timezone('US/Eastern')
+DEFAULT_FETCH_WORKERS = 8
+DEFAULT_BATCH_SIZE = 500         # Bars per write transaction
+DEFAULT_FLUSH_SECONDS = 5.0      # Longest a captured bar waits in memory before it is written
+DEFAULT_QUEUE_SIZE = 100_000
+INTERVAL_UNITS = {'m': 60, 'h': 3600}
+
+_STOP = object()  # Tells the writer thread to write what is left and exit
+
+def interval_seconds(interval):
+    """
+    Length of an interval such as '1m', '5m' or '1h' in seconds.
+    :raises ValueError: If the interval is not a number of minutes or hours.
+    """
+    interval = interval.strip().lower()
+    if len(interval) < 2 or interval[-1] not in INTERVAL_UNITS or not interval[:-1].isdigit() or int(interval[:-1]) == 0:
+        raise ValueError(f"Unsupported interval '{interval}', expected minutes or hours such as 1m, 5m or 1h")
+    return int(interval[:-1]) * INTERVAL_UNITS[interval[-1]]
+
+def fetch_current_quotes(symbols, executor):
+    """
+    Latest price and volume of each symbol from the market data API, requested concurrently.
+    :return: Dictionary of symbol -> (price, volume) for the symbols that returned a quote.
+    """
+    from APIFetching import get_current_price_and_volume  # Imported on first use: yfinance is only needed for live capture
+
+    quotes = {}
+    for symbol, (price, volume) in zip(symbols, executor.map(get_current_price_and_volume, symbols)):
+        if price is not None and volume is not None:
+            quotes[symbol] = (float(price), int(volume))
+    return quotes
+
+class PriceIngestionService:
+    """
+    Records live bars for a watchlist from one process.
+    A poller thread wakes on every interval boundary during market hours, fetches all the symbols' quotes in one
+    cycle and queues them as PriceRecords; a writer thread drains the queue into each symbol's stock_prices database
+    with BulkPriceWriter, committing every `batch_size` bars or `flush_seconds`, whichever comes first.
+    stop() lets the poller finish its cycle and the writer write everything queued before the databases are closed.
+    """
+
+    def __init__(self, symbols, db_path, interval='1m', fetch_quotes=None, fetch_workers=DEFAULT_FETCH_WORKERS,
+                 batch_size=DEFAULT_BATCH_SIZE, flush_seconds=DEFAULT_FLUSH_SECONDS, queue_size=DEFAULT_QUEUE_SIZE,
+                 market_hours_only=True, stop_at_close=False):
+        """
+        :param db_path: Database path for all symbols, or a callable returning the path of a symbol's database.
+        :param fetch_quotes: Optional callable taking the symbol list and returning {symbol: (price, volume)};
+                             defaults to the market data API.
+        :param market_hours_only: Poll only during NYSE sessions.
+        :param stop_at_close: Stop by itself once the current session has closed.
+        """
+        self.symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+        self.db_path_for = db_path if callable(db_path) else (lambda symbol: db_path)
+        self.interval = interval
+        self.interval_seconds = interval_seconds(interval)
+        self.fetch_executor = None
+        if fetch_quotes is None:
+            self.fetch_executor = ThreadPoolExecutor(max_workers=fetch_workers, thread_name_prefix='quote-fetch')
+            fetch_quotes = lambda symbols: fetch_current_quotes(symbols, self.fetch_executor)
+        self.fetch_quotes = fetch_quotes
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.market_hours_only = market_hours_only
+        self.stop_at_close = stop_at_close
+        self.bars = queue.Queue(maxsize=queue_size)
+        self.stop_event = threading.Event()
+        self.threads = []
+        self.writers = {}
+        self.lock = threading.Lock()
+        self.started_at = None
+        self.stats = {
+            'cycles': 0,
+            'missed_cycles': 0,
+            'bars_queued': 0,
+            'bars_written': 0,
+            'quotes_missing': 0,
+            'fetch_errors': 0,
+            'write_errors': 0,
+            'last_fetch_lag': None,
+            'max_fetch_lag': 0.0,
+            'last_write_lag': None,
+            'max_write_lag': 0.0
+        }
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self):
+        for db_path in dict.fromkeys(self.db_path_for(symbol) for symbol in self.symbols):
+            create_database(db_path)
+        self.started_at = time.time()
+        self.threads = [threading.Thread(target=self.poll, name='price-poller', daemon=True),
+                        threading.Thread(target=self.write, name='price-writer', daemon=True)]
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self, timeout=None):
+        """
+        Stop polling, write every queued bar and close the databases.
+        """
+        self.stop_event.set()
+        if self.threads:
+            self.threads[0].join(timeout)
+            self.bars.put(_STOP)
+            self.threads[1].join(timeout)
+            self.threads = []
+        if self.fetch_executor is not None:
+            self.fetch_executor.shutdown(wait=False)
+
+    def is_running(self):
+        return any(thread.is_alive() for thread in self.threads)
+
+    def wait(self, timeout=None):
+        """
+        Block until the service stops (stop_at_close, or stop() from another thread).
+        :return: True if it stopped.
+        """
+        return self.stop_event.wait(timeout)
+
+    def market_state(self, moment):
+        """
+        :return: 'open' during the session, 'closed' after the session's close, 'waiting' otherwise.
+        """
+        if not self.market_hours_only:
+            return 'open'
+        eastern = moment.astimezone(EASTERN)
+        if not is_session(eastern.date()):
+            return 'waiting'
+        open_minute, close_minute = get_calendar(eastern.date(), eastern.date()).session_bounds(eastern.date())
+        minute = eastern.hour * 60 + eastern.minute
+        if minute < open_minute:
+            return 'waiting'
+        return 'open' if minute <= close_minute else 'closed'
+
+    def poll(self):
+        # Cycles fall on interval boundaries, so every symbol's bar of a cycle carries the same timestamp
+        next_cycle = (int(time.time()) // self.interval_seconds + 1) * self.interval_seconds
+        while not self.stop_event.wait(max(next_cycle - time.time(), 0)):
+            cycle_time = next_cycle
+            next_cycle += self.interval_seconds
+            if time.time() >= next_cycle:
+                # Fell behind (a slow fetch or a suspended machine): skip to the next boundary instead of bursting
+                skipped = int((time.time() - cycle_time) // self.interval_seconds)
+                next_cycle = cycle_time + (skipped + 1) * self.interval_seconds
+                with self.lock:
+                    self.stats['missed_cycles'] += skipped
+
+            moment = datetime.fromtimestamp(cycle_time, pytz.utc)
+            state = self.market_state(moment)
+            if state == 'closed' and self.stop_at_close:
+                self.stop_event.set()
+                break
+            if state != 'open':
+                continue
+
+            try:
+                quotes = self.fetch_quotes(self.symbols)
+            except Exception as e:  # A failed cycle must not end the service; the next one tries again
+                print(f"Failed to fetch quotes: {e}")
+                with self.lock:
+                    self.stats['fetch_errors'] += 1
+                continue
+            captured_at = time.time()
+
+            # Stored in the market's wall-clock time like every other stock_prices row
+            timestamp = to_timestamp(moment.astimezone(EASTERN).replace(tzinfo=None))
+            for symbol in self.symbols:
+                if symbol in quotes:
+                    price, volume = quotes[symbol]
+                    self.bars.put((PriceRecord(symbol, timestamp, price, volume), captured_at))
+
+            with self.lock:
+                self.stats['cycles'] += 1
+                self.stats['bars_queued'] += len(quotes)
+                self.stats['quotes_missing'] += len(self.symbols) - len(quotes)
+                self.stats['last_fetch_lag'] = captured_at - cycle_time
+                self.stats['max_fetch_lag'] = max(self.stats['max_fetch_lag'], captured_at - cycle_time)
+
+    def write(self):
+        pending = []  # (record, captured_at) not yet committed
+        deadline = None
+        while True:
+            try:
+                item = self.bars.get(timeout=max(deadline - time.time(), 0) if deadline else None)
+            except queue.Empty:
+                item = None
+            if item is _STOP:
+                self.flush(pending)
+                break
+            if item is not None:
+                pending.append(item)
+                if deadline is None:
+                    deadline = time.time() + self.flush_seconds
+            if len(pending) >= self.batch_size or (deadline is not None and time.time() >= deadline):
+                self.flush(pending)
+                pending = []
+                deadline = None
+
+        for writer in self.writers.values():
+            writer.close()
+        self.writers = {}
+
+    def flush(self, pending):
+        """
+        Commit the pending bars, one transaction per database.
+        """
+        if not pending:
+            return
+        by_database = {}
+        for record, captured_at in pending:
+            by_database.setdefault(self.db_path_for(record.symbol), []).append(record)
+
+        written = 0
+        for db_path, records in by_database.items():
+            writer = self.writers.get(db_path)
+            if writer is None:
+                writer = self.writers[db_path] = BulkPriceWriter(db_path, batch_size=self.batch_size)
+            inserted_before = writer.rows_inserted
+            try:
+                writer.add_many(records)
+                writer.flush()
+            except sqlite3.Error as e:
+                print(f"Failed to write {len(records)} bars to {os.path.basename(db_path)}: {e}")
+                with self.lock:
+                    self.stats['write_errors'] += 1
+                continue
+            written += writer.rows_inserted - inserted_before
+
+        write_lag = time.time() - min(captured_at for _, captured_at in pending)
+        with self.lock:
+            self.stats['bars_written'] += written
+            self.stats['last_write_lag'] = write_lag
+            self.stats['max_write_lag'] = max(self.stats['max_write_lag'], write_lag)
+
+    def metrics(self):
+        """
+        Counters and lags of the service: fetch lag is how long after its interval boundary a cycle's quotes
+        arrived, write lag how long the oldest bar of the last batch waited before it was committed.
+        :return: Dictionary of the statistics plus the queue depth and uptime.
+        """
+        with self.lock:
+            metrics = dict(self.stats)
+        metrics['queue_depth'] = self.bars.qsize()
+        metrics['uptime_seconds'] = time.time() - self.started_at if self.started_at else 0.0
+        return metrics
+
+    def status_line(self):
+        metrics = self.metrics()
+        fetch_lag = f"{metrics['last_fetch_lag']:.2f}s" if metrics['last_fetch_lag'] is not None else '-'
+        write_lag = f"{metrics['last_write_lag']:.2f}s" if metrics['last_write_lag'] is not None else '-'
+        return (f"{metrics['cycles']:,} cycles, {metrics['bars_written']:,}/{metrics['bars_queued']:,} bars written, "
+                f"queue {metrics['queue_depth']:,}, fetch lag {fetch_lag} (max {metrics['max_fetch_lag']:.2f}s), "
+                f"write lag {write_lag} (max {metrics['max_write_lag']:.2f}s), {metrics['missed_cycles']} missed cycles, "
+                f"{metrics['fetch_errors'] + metrics['write_errors']} errors")
+
+def watchlist_db_path(data_dir, interval):
+    """
+    Path function naming each symbol's database the way setupDatabase.py names a day of real-time data.
+    """
+    day = datetime.now(EASTERN).strftime('%Y-%m-%d')
+    return lambda symbol: os.path.join(data_dir, generate_db_filename(symbol, day, interval=interval))
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4):
+        print("Usage: python priceIngestion.py <symbols> <interval> [data_dir]")
+        print("Example: python priceIngestion.py AAPL,AMZN,NFLX,META 1m")
+        sys.exit(1)
+
+    symbols = [symbol for symbol in sys.argv[1].upper().split(",") if symbol]
+    interval = sys.argv[2].strip()
+    data_dir = sys.argv[3] if len(sys.argv) == 4 else os.path.abspath(os.path.join(os.path.dirname(__file__), '../data'))
+
+    service = PriceIngestionService(symbols, watchlist_db_path(data_dir, interval), interval, stop_at_close=True)
+    service.start()
+    print(f"Recording {len(service.symbols)} symbols every {interval} until the market closes (Ctrl+C to stop).")
+    try:
+        while not service.wait(service.interval_seconds):
+            print(service.status_line())
+    except KeyboardInterrupt:
+        print("\nStopping...")
+    finally:
+        service.stop()
+    print(service.status_line())
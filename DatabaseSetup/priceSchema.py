@@ -0,0 +1,207 @@
+import os
+import sqlite3
+import calendar
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+# stock_prices schema v2: one row per (symbol, minute), keyed on an integer timestamp.
+# price_timestamp counts seconds since 1970-01-01 00:00 in the market's wall-clock time, the same clock the
+# v1 price_date/price_time text columns used, so it sorts correctly and day boundaries fall on multiples of 86400.
+SCHEMA_VERSION = 2
+
+STOCK_PRICES_TABLE = '''CREATE TABLE IF NOT EXISTS stock_prices
+                 (stock_name TEXT NOT NULL, price_timestamp INTEGER NOT NULL, stock_price REAL, volume INTEGER,
+                  PRIMARY KEY (stock_name, price_timestamp)) WITHOUT ROWID'''
+
+# Rows already stored for a (symbol, timestamp) are kept; the primary key makes the duplicate check free
+INSERT_PRICE = "INSERT OR IGNORE INTO stock_prices (stock_name, price_timestamp, stock_price, volume) VALUES (?, ?, ?, ?)"
+
+# Trading days a historical build requested but could not fetch, so the data catalog does not count them as covered
+FAILED_DAYS_TABLE = "CREATE TABLE IF NOT EXISTS failed_days (day TEXT PRIMARY KEY)"
+
+SECONDS_PER_DAY = 86400
+EPOCH = datetime(1970, 1, 1)
+
+# Tag of the lines priceTracker prints for each record, so other output on stdout is never mistaken for data
+RECORD_PREFIX = 'PRICE'
+
+class PriceRecord(NamedTuple):
+    """
+    One stock_prices row, in column order so it can be passed straight to INSERT_PRICE.
+    """
+    symbol: str
+    timestamp: int
+    price: float
+    volume: int
+
+def format_record(record):
+    """
+    Serialize a PriceRecord as a tab-separated line; repr keeps the price exact.
+    Values are converted to built-in numbers first, as NumPy scalars (e.g. from yfinance) repr as np.float64(...).
+    """
+    return f"{RECORD_PREFIX}\t{record.symbol}\t{int(record.timestamp)}\t{float(record.price)!r}\t{int(record.volume)}"
+
+def parse_record(line):
+    """
+    Parse a line written by format_record.
+    :return: PriceRecord, or None if the line is not a record.
+    :raises ValueError: If the line is a malformed record.
+    """
+    fields = line.rstrip('\n').split('\t')
+    if fields[0] != RECORD_PREFIX:
+        return None
+    if len(fields) != 5:
+        raise ValueError(f"Expected 5 fields in price record, got {len(fields)}")
+    return PriceRecord(fields[1], int(fields[2]), float(fields[3]), int(float(fields[4])))
+
+def create_stock_prices_table(c):
+    """
+    Create the v2 stock_prices table and mark the database with the schema version.
+    """
+    c.execute(STOCK_PRICES_TABLE)
+    c.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+def get_schema_version(c):
+    c.execute("PRAGMA user_version")
+    return c.fetchone()[0]
+
+def to_timestamp(dt):
+    """
+    Convert a naive wall-clock datetime into a price_timestamp.
+    """
+    return calendar.timegm(dt.timetuple())
+
+def from_timestamp(timestamp):
+    """
+    Convert a price_timestamp back into a naive wall-clock datetime.
+    """
+    return EPOCH + timedelta(seconds=timestamp)
+
+def date_to_timestamp(date_str):
+    """
+    Timestamp of midnight at the start of a 'YYYY-MM-DD' date.
+    """
+    return to_timestamp(datetime.strptime(date_str, '%Y-%m-%d'))
+
+def date_range_bounds(start_date, end_date):
+    """
+    Half-open [start, end) timestamp range covering the dates from start_date to end_date inclusive.
+    """
+    return date_to_timestamp(start_date), date_to_timestamp(end_date) + SECONDS_PER_DAY
+
+def parse_v1_timestamp(price_date, price_time):
+    """
+    Convert v1 text columns into a price_timestamp.
+    Historical rows use 12-hour '09:31:00 AM' times, real-time rows 24-hour '09:31:00'.
+    """
+    time_format = '%I:%M:%S %p' if price_time[-2:] in ('AM', 'PM') else '%H:%M:%S'
+    return to_timestamp(datetime.strptime(f"{price_date} {price_time}", f"%Y-%m-%d {time_format}"))
+
+def get_symbols(c):
+    """
+    List the symbols stored in the table, seeking along the primary key instead of scanning every row.
+    """
+    symbols = []
+    c.execute("SELECT MIN(stock_name) FROM stock_prices")
+    symbol = c.fetchone()[0]
+    while symbol is not None:
+        symbols.append(symbol)
+        c.execute("SELECT MIN(stock_name) FROM stock_prices WHERE stock_name > ?", (symbol,))
+        symbol = c.fetchone()[0]
+    return symbols
+
+def get_trading_days(c, symbol):
+    """
+    List the distinct days with data for a symbol, seeking to the first row of each following day.
+    :return: Sorted list of datetime.date objects.
+    """
+    days = []
+    c.execute("SELECT MIN(price_timestamp) FROM stock_prices WHERE stock_name = ?", (symbol,))
+    timestamp = c.fetchone()[0]
+    while timestamp is not None:
+        day_start = timestamp - timestamp % SECONDS_PER_DAY
+        days.append(from_timestamp(day_start).date())
+        c.execute("SELECT MIN(price_timestamp) FROM stock_prices WHERE stock_name = ? AND price_timestamp >= ?",
+                  (symbol, day_start + SECONDS_PER_DAY))
+        timestamp = c.fetchone()[0]
+    return days
+
+def has_failed_days_table(c):
+    c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='failed_days'")
+    return c.fetchone() is not None
+
+def get_failed_days(c):
+    """
+    List the days recorded as failed by record_failed_days.
+    :return: Sorted list of 'YYYY-MM-DD' strings, empty for databases without failures.
+    """
+    if not has_failed_days_table(c):
+        return []
+    c.execute("SELECT day FROM failed_days ORDER BY day")
+    return [row[0] for row in c.fetchall()]
+
+def record_failed_days(db_path, fetched_days, failed_days):
+    """
+    Record the days of a build whose requests failed, and clear earlier failures of the days fetched this time.
+    Databases that never had a failure are left without the table.
+    :param fetched_days: 'YYYY-MM-DD' strings of the days fetched successfully.
+    :param failed_days: 'YYYY-MM-DD' strings of the days that failed.
+    """
+    conn = sqlite3.connect(db_path)
+    c = conn.cursor()
+    if failed_days or has_failed_days_table(c):
+        c.execute(FAILED_DAYS_TABLE)
+        c.executemany("DELETE FROM failed_days WHERE day = ?", [(day,) for day in fetched_days])
+        c.executemany("INSERT OR IGNORE INTO failed_days (day) VALUES (?)", [(day,) for day in failed_days])
+        conn.commit()
+    conn.close()
+
+def migrate_database(db_path):
+    """
+    Upgrade a database's stock_prices table to schema v2 in place, in a single transaction.
+    Rows that collide on (symbol, timestamp) keep the first one inserted.
+    :return: Tuple of (rows_before, rows_after), or None if there was nothing to migrate.
+    """
+    conn = sqlite3.connect(db_path)
+    conn.isolation_level = None  # Explicit transaction control so the table swap is atomic
+    c = conn.cursor()
+    try:
+        c.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='stock_prices'")
+        if c.fetchone() is None or get_schema_version(c) >= SCHEMA_VERSION:
+            return None
+
+        c.execute("BEGIN IMMEDIATE")
+        c.execute("ALTER TABLE stock_prices RENAME TO stock_prices_v1")
+        create_stock_prices_table(c)
+
+        c.execute("SELECT stock_name, stock_price, volume, price_time, price_date FROM stock_prices_v1 ORDER BY rowid")
+        rows = c.fetchall()
+        timestamps = {}  # Times and dates repeat heavily, so each distinct pair is parsed once
+        records = []
+        for stock_name, stock_price, volume, price_time, price_date in rows:
+            key = (price_date, price_time)
+            if key not in timestamps:
+                timestamps[key] = parse_v1_timestamp(price_date, price_time)
+            records.append((stock_name, timestamps[key], stock_price, volume))
+        c.executemany(INSERT_PRICE, records)
+
+        c.execute("DROP TABLE stock_prices_v1")
+        c.execute("COMMIT")
+        c.execute("SELECT COUNT(*) FROM stock_prices")
+        rows_after = c.fetchone()[0]
+        c.execute("VACUUM")  # Reclaim the pages of the old table
+        return len(rows), rows_after
+    except Exception:
+        if conn.in_transaction:
+            c.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+
+def ensure_current_schema(db_path):
+    """
+    Migrate a v1 database before it is read, so older files keep working with the v2 readers.
+    """
+    result = migrate_database(db_path)
+    if result is not None:
+        print(f"Upgraded {os.path.basename(db_path)} to stock_prices schema v{SCHEMA_VERSION} ({result[0]:,} rows, {result[1]:,} after dedupe).")
@@ -28,6 +28,20 @@ def is_market_open():
     market_close_time = now.replace(hour=16, minute=0, second=0, microsecond=0)
     return market_open_time <= now <= market_close_time
 
+def run_record_round_trip_test():
+    import numpy as np
+    from priceSchema import PriceRecord, format_record, parse_record
+
+    print("\nTesting the priceTracker record format round trip:")
+    records = [PriceRecord('AAPL', 1718000000, 187.23, 1200),
+               PriceRecord('AAPL', np.int64(1718000060), np.float64(187.23), np.int64(1200)),  # As yfinance returns them
+               PriceRecord('AAPL', 1718000120, np.float32(187.25), np.float64(1300.0))]
+    for record in records:
+        parsed = parse_record(format_record(record))
+        expected = PriceRecord(record.symbol, int(record.timestamp), float(record.price), int(record.volume))
+        status = "OK" if parsed == expected and type(parsed.price) is float else "FAILED"
+        print(f"{status}: {format_record(record)!r} -> {parsed}")
+
 def delete_existing_db_files():
     root_dir = get_root_dir()
     db_files = [
@@ -105,6 +119,7 @@ def run_real_time_test(symbol="AAPL", interval="1m", duration_minutes=3):
         print(f"\nErrors:\n{stderr}")
 
 if __name__ == "__main__":
+    run_record_round_trip_test()
     load_env()
     delete_existing_db_files()
     if len(sys.argv) > 1 and sys.argv[1].lower() == 'all':
@@ -3,6 +3,8 @@ import requests
 from datetime import datetime, timedelta
 import pytz
 from APIFetching import get_current_price_and_volume, is_market_open
+from priceSchema import PriceRecord, format_record, to_timestamp
+from tradingCalendar import is_session
 from dotenv import load_dotenv
 import os
 
@@ -31,7 +33,7 @@ def track_price(symbol, interval='1m'):
         current_time = datetime.now(eastern)
         current_price, current_volume = get_current_price_and_volume(symbol)
         if current_price is not None and current_volume is not None:
-            record = (symbol, current_price, current_volume, current_time.strftime('%H:%M:%S'), current_time.strftime('%Y-%m-%d'))
+            record = PriceRecord(symbol, to_timestamp(current_time), current_price, current_volume)
             data.append(record)
         time.sleep(sleep_time)  # Wait for the specified interval
     return data
@@ -50,7 +52,7 @@ def track_historical_prices(symbol, start_date, end_date=None, interval='1m'):
     key_index = 0  # Start with the first key
 
     while current_date <= end_date_dt:
-        if current_date.weekday() >= 5:  # Skip weekends (Saturday and Sunday)
+        if not is_session(current_date):  # Skip weekends and market holidays
             current_date += timedelta(days=1)
             continue
 
@@ -72,14 +74,12 @@ def track_historical_prices(symbol, start_date, end_date=None, interval='1m'):
             for entry in prices:
                 ts = entry['t'] // 1000
                 dt = datetime.fromtimestamp(ts)
-                price_time = dt.strftime('%H:%M:%S')
-                price_date = dt.strftime('%Y-%m-%d')
                 price = entry['c']
                 volume = entry['v']
 
                 if price != last_price:
                     last_price = price
-                    record = (symbol, price, volume, price_time, price_date)
+                    record = PriceRecord(symbol, to_timestamp(dt), price, volume)
                     data.append(record)
 
         current_date += timedelta(days=1)
@@ -123,4 +123,4 @@ if __name__ == "__main__":
             data = []
 
     for record in data:
-        print(record)
+        print(format_record(record))
@@ -0,0 +1,97 @@
+import sqlite3
+import time
+from priceSchema import INSERT_PRICE
+
+DEFAULT_BATCH_SIZE = 5000  # Rows per transaction, about two weeks of minute bars
+DEFAULT_CACHE_SIZE_MB = 64
+
+def configure_connection(conn, cache_size_mb=DEFAULT_CACHE_SIZE_MB):
+    """
+    Tune a connection for bulk writes: WAL journal, fsync only at checkpoints, and a larger page cache.
+    WAL also lets readers keep querying the database while it is being written.
+    """
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{cache_size_mb * 1024}")  # Negative values are in KiB
+    conn.execute("PRAGMA temp_store=MEMORY")
+
+class BulkPriceWriter:
+    """
+    Buffers stock_prices rows and writes them with executemany, one explicit transaction per batch.
+    Rows that already exist are ignored by the primary key, so re-running an import is safe.
+    Use as a context manager, or call close() to write the last partial batch.
+    """
+
+    def __init__(self, db_path, batch_size=DEFAULT_BATCH_SIZE, cache_size_mb=DEFAULT_CACHE_SIZE_MB):
+        self.conn = sqlite3.connect(db_path, isolation_level=None)  # Transactions are managed explicitly
+        configure_connection(self.conn, cache_size_mb)
+        self.batch_size = max(batch_size, 1)
+        self.pending = []
+        self.rows_received = 0
+        self.rows_inserted = 0
+        self.write_time = 0.0
+        self.start_time = time.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add(self, record):
+        """
+        Queue one row (a PriceRecord or a tuple in the same order), writing a batch once enough are queued.
+        """
+        self.pending.append(record)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def add_many(self, records):
+        """
+        Queue several rows, writing full batches as they fill up.
+        """
+        self.pending.extend(records)
+        while len(self.pending) >= self.batch_size:
+            self.flush(self.batch_size)
+
+    def flush(self, count=None):
+        """
+        Write queued rows (all of them, or the first `count`) in a single transaction.
+        A batch that fails is rolled back and dropped before the error is raised, so later batches can still be written.
+        """
+        batch = self.pending[:count] if count else self.pending
+        if not batch:
+            return
+        write_start = time.perf_counter()
+        changes_before = self.conn.total_changes
+        self.conn.execute("BEGIN")
+        try:
+            self.conn.executemany(INSERT_PRICE, batch)
+            self.conn.execute("COMMIT")
+        except sqlite3.Error:
+            self.conn.execute("ROLLBACK")
+            self.pending = self.pending[len(batch):]
+            raise
+        self.rows_received += len(batch)
+        self.rows_inserted += self.conn.total_changes - changes_before
+        self.write_time += time.perf_counter() - write_start
+        self.pending = self.pending[len(batch):]
+
+    def close(self):
+        if self.conn is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self.conn.close()
+            self.conn = None
+
+    def rows_per_second(self):
+        """
+        Rows written per second of time spent inside the database.
+        """
+        return self.rows_received / self.write_time if self.write_time > 0 else 0.0
+
+    def report(self):
+        return (f"Wrote {self.rows_inserted:,} rows ({self.rows_received - self.rows_inserted:,} already stored) "
+                f"at {self.rows_per_second():,.0f} rows/sec, {time.perf_counter() - self.start_time:.2f}s total")
@@ -7,19 +7,34 @@ from datetime import datetime, timedelta
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../DatabaseSetup')))
 from historicalDatabase import populate_database as historical_populate_database
+from priceSchema import create_stock_prices_table, ensure_current_schema, parse_record
+from priceWriter import BulkPriceWriter
 
 def create_database(db_path):
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    ensure_current_schema(db_path)
 
     conn = sqlite3.connect(db_path)
     c = conn.cursor()
 
-    c.execute('''CREATE TABLE IF NOT EXISTS stock_prices
-                 (stock_name TEXT, stock_price REAL, volume INTEGER, price_time TEXT, price_date TEXT)''')
+    create_stock_prices_table(c)
 
     conn.commit()
     conn.close()
 
+def read_records(lines):
+    """
+    Yield the price records in priceTracker output, skipping any other lines.
+    """
+    for line in lines:
+        try:
+            record = parse_record(line.strip())
+        except ValueError as e:
+            print(f"Error parsing record {line.strip()}: {e}")
+            continue
+        if record is not None:
+            yield record
+
 def populate_database(db_path, symbol, historical, start_date, end_date=None, interval='1h'):
     if historical:
         # Call the updated historicalDatabase.py's populate_database function with correct arguments
@@ -32,21 +47,10 @@ def populate_database(db_path, symbol, historical, start_date, end_date=None, in
         command.append(interval)
 
         result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        output_lines = result.stdout.strip().split('\n')
-
-        conn = sqlite3.connect(db_path)
-        c = conn.cursor()
-
-        for line in output_lines:
-            if line.startswith('(') and line.endswith(')'):
-                try:
-                    record = eval(line)
-                    c.execute("INSERT INTO stock_prices (stock_name, stock_price, volume, price_time, price_date) VALUES (?, ?, ?, ?, ?)", record)
-                    conn.commit()
-                except Exception as e:
-                    print(f"Error inserting record {line}: {e}")
 
-        conn.close()
+        with BulkPriceWriter(db_path) as writer:
+            writer.add_many(read_records(result.stdout.splitlines()))
+        print(writer.report())
 
 def generate_db_filename(symbol, start_date, end_date=None, interval='1h'):
     interval_str = interval.replace(' ', '').replace(':', '').replace('-', '')
@@ -56,23 +60,20 @@ def generate_db_filename(symbol, start_date, end_date=None, interval='1h'):
         return f"{symbol}_{start_date.replace('-', '.')}_{interval_str}.db"
 
 def populate_real_time_database(db_path, symbol, interval='1m'):
-    command = [sys.executable, os.path.abspath(os.path.join(os.path.dirname(__file__), "priceTracker.py")), symbol, "no", datetime.now().strftime('%Y-%m-%d'), interval]
-
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-
-    result = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, bufsize=1)
-    for line in iter(result.stdout.readline, ''):
-        line = line.strip()
-        if line.startswith('(') and line.endswith(')'):
-            try:
-                record = eval(line)
-                c.execute("INSERT INTO stock_prices (stock_name, stock_price, volume, price_time, price_date) VALUES (?, ?, ?, ?, ?)", record)
-                conn.commit()
-            except Exception as e:
-                print(f"Error inserting real-time record {line}: {e}")
-
-    conn.close()
+    """
+    Record live bars of a symbol into its database until the market closes (or Ctrl+C).
+    """
+    from priceIngestion import PriceIngestionService  # Imported here as priceIngestion builds on this module
+
+    service = PriceIngestionService([symbol], db_path, interval, stop_at_close=True)
+    service.start()
+    try:
+        service.wait()
+    except KeyboardInterrupt:
+        print("\nStopping...")
+    finally:
+        service.stop()
+    print(service.status_line())
 
 def is_market_open():
     now = datetime.now(pytz.timezone('US/Eastern'))
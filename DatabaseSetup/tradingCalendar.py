@@ -0,0 +1,172 @@
+import sys
+import threading
+from datetime import date, datetime, timedelta
+import numpy as np
+import holidays
+
+# NYSE sessions precomputed as sorted arrays of epoch days (days since 1970-01-01), the same day numbers the price cache uses
+EPOCH = date(1970, 1, 1)
+SESSION_OPEN_MINUTE = 9 * 60 + 30   # 9:30 AM Eastern, in minutes after midnight
+SESSION_CLOSE_MINUTE = 16 * 60      # 4:00 PM Eastern
+EARLY_CLOSE_MINUTE = 13 * 60        # 1:00 PM Eastern on early-close days
+DEFAULT_FIRST_YEAR = 2000
+DEFAULT_YEARS_AHEAD = 5
+
+def to_epoch_day(day):
+    """
+    Convert a date, datetime, 'YYYY-MM-DD' string or epoch day number into an epoch day.
+    """
+    if isinstance(day, str):
+        day = datetime.strptime(day, '%Y-%m-%d').date()
+    elif isinstance(day, datetime):
+        day = day.date()
+    elif not isinstance(day, date):
+        return int(day)
+    return (day - EPOCH).days
+
+def from_epoch_day(epoch_day):
+    return EPOCH + timedelta(days=int(epoch_day))
+
+def to_epoch_days(days):
+    """
+    Convert a scalar or a sequence of days into an int64 array of epoch days.
+    :return: Tuple of (array, whether a scalar was given).
+    """
+    if isinstance(days, np.ndarray) and days.dtype.kind in 'iu':
+        return days.astype(np.int64, copy=False), days.ndim == 0
+    scalar = np.ndim(days) == 0
+    return np.array([to_epoch_day(day) for day in np.atleast_1d(days).tolist()], dtype=np.int64), scalar
+
+def get_early_closes(year, exchange_holidays):
+    """
+    Early-close sessions of a year: the day before Independence Day, the day after Thanksgiving and Christmas Eve,
+    whenever each of them is a trading session.
+    """
+    thanksgiving = next(day for day, name in exchange_holidays.items() if day.year == year and name.startswith('Thanksgiving'))
+    candidates = [date(year, 7, 3), thanksgiving + timedelta(days=1), date(year, 12, 24)]
+    return [day for day in candidates if day.weekday() < 5 and day not in exchange_holidays]
+
+class TradingCalendar:
+    """
+    NYSE trading sessions between two years, with their close times.
+    Scalar lookups go through a set of epoch days; array queries use binary search on the sorted session array.
+    """
+
+    __slots__ = ('first_year', 'last_year', 'sessions', 'close_minutes', '_session_set', '_early_close_set')
+
+    def __init__(self, first_year, last_year):
+        self.first_year = first_year
+        self.last_year = last_year
+        exchange_holidays = holidays.NYSE(years=range(first_year, last_year + 1))
+        early_closes = set()
+        for year in range(first_year, last_year + 1):
+            early_closes.update(to_epoch_day(day) for day in get_early_closes(year, exchange_holidays))
+
+        days = np.arange(to_epoch_day(date(first_year, 1, 1)), to_epoch_day(date(last_year, 12, 31)) + 1, dtype=np.int64)
+        weekdays = (days + 3) % 7  # 1970-01-01 was a Thursday; 0 is Monday
+        closed = np.array([from_epoch_day(day) in exchange_holidays for day in days[weekdays < 5].tolist()], dtype=bool)
+        self.sessions = days[weekdays < 5][~closed]
+        self.close_minutes = np.where(np.isin(self.sessions, list(early_closes)), EARLY_CLOSE_MINUTE, SESSION_CLOSE_MINUTE)
+        self._session_set = frozenset(self.sessions.tolist())
+        self._early_close_set = frozenset(early_closes)
+
+    def covers(self, first_day, last_day):
+        return (to_epoch_day(date(self.first_year, 1, 1)) <= first_day
+                and last_day <= to_epoch_day(date(self.last_year, 12, 31)))
+
+    def is_session(self, day):
+        """
+        Whether the market trades on a day (date, datetime, 'YYYY-MM-DD' or epoch day).
+        """
+        return to_epoch_day(day) in self._session_set
+
+    def is_early_close(self, day):
+        return to_epoch_day(day) in self._early_close_set
+
+    def sessions_mask(self, epoch_days):
+        """
+        Vectorized is_session for an array of epoch days.
+        """
+        epoch_days = to_epoch_days(epoch_days)[0]
+        positions = np.minimum(np.searchsorted(self.sessions, epoch_days), len(self.sessions) - 1)
+        return self.sessions[positions] == epoch_days
+
+    def sessions_between(self, start, end):
+        """
+        Epoch days of the sessions from start to end inclusive, as a sorted array view.
+        """
+        first, last = np.searchsorted(self.sessions, (to_epoch_day(start), to_epoch_day(end) + 1))
+        return self.sessions[first:last]
+
+    def next_sessions(self, days, count=1, include_current=False):
+        """
+        The `count` sessions after each of the given days, for a scalar or an array of days.
+        :param include_current: Count a day that is itself a session as the first of its sessions.
+        :return: Array of epoch days shaped (count,) for a scalar day or (len(days), count) for an array.
+        """
+        epoch_days, scalar = to_epoch_days(days)
+        positions = np.searchsorted(self.sessions, epoch_days, side='left' if include_current else 'right')
+        indices = positions[:, None] + np.arange(count)
+        if indices.size and indices.max() >= len(self.sessions):
+            raise ValueError("Requested sessions run past the end of the trading calendar.")
+        return self.sessions[indices[0]] if scalar else self.sessions[indices]
+
+    def session_bounds(self, days):
+        """
+        Open and close minute (Eastern, after midnight) of each session, for a scalar or an array of session days.
+        :return: Tuple of (open_minutes, close_minutes), ints for a scalar day.
+        """
+        epoch_days, scalar = to_epoch_days(days)
+        positions = np.minimum(np.searchsorted(self.sessions, epoch_days), len(self.sessions) - 1)
+        if not np.array_equal(self.sessions[positions], epoch_days):
+            raise ValueError("Session bounds requested for a day the market is closed.")
+        close_minutes = self.close_minutes[positions]
+        if scalar:
+            return SESSION_OPEN_MINUTE, int(close_minutes[0])
+        return np.full_like(close_minutes, SESSION_OPEN_MINUTE), close_minutes
+
+_calendar = None
+_calendar_lock = threading.Lock()
+
+def get_calendar(start=None, end=None):
+    """
+    Return the shared calendar, rebuilding it once with more years if a query reaches outside it.
+    """
+    global _calendar
+    first_day = to_epoch_day(start) if start is not None else None
+    last_day = to_epoch_day(end) if end is not None else first_day
+    with _calendar_lock:
+        if _calendar is None or (first_day is not None and not _calendar.covers(first_day, last_day)):
+            first_year = DEFAULT_FIRST_YEAR
+            last_year = date.today().year + DEFAULT_YEARS_AHEAD
+            if _calendar is not None:
+                first_year, last_year = _calendar.first_year, _calendar.last_year
+            if first_day is not None:
+                first_year = min(first_year, from_epoch_day(first_day).year)
+                last_year = max(last_year, from_epoch_day(last_day).year + 1)  # next_sessions may look into the next year
+            _calendar = TradingCalendar(first_year, last_year)
+        return _calendar
+
+def is_session(day):
+    return get_calendar(day).is_session(day)
+
+def sessions_between(start, end):
+    return get_calendar(start, end).sessions_between(start, end)
+
+def session_dates_between(start, end):
+    """
+    Sessions from start to end inclusive as datetime.date objects.
+    """
+    return [from_epoch_day(day) for day in sessions_between(start, end).tolist()]
+
+if __name__ == "__main__":
+    # Print the sessions of a date range, marking early closes
+    if len(sys.argv) != 3:
+        print("Usage: python tradingCalendar.py <start_date> <end_date>")
+        sys.exit(1)
+
+    calendar = get_calendar(sys.argv[1], sys.argv[2])
+    sessions = calendar.sessions_between(sys.argv[1], sys.argv[2])
+    for day, close_minute in zip(sessions.tolist(), calendar.session_bounds(sessions)[1].tolist()):
+        print(f"{from_epoch_day(day)}  close {close_minute // 60:02d}:{close_minute % 60:02d}")
+    print(f"{len(sessions)} sessions")
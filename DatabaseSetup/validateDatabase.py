@@ -1,19 +1,17 @@
 import os
 import sys
 import sqlite3
-from datetime import datetime, timedelta
-import holidays
+from datetime import timedelta
 from dateutil.relativedelta import relativedelta
-
-# Set up US holidays
-us_holidays = holidays.US()
+from priceSchema import ensure_current_schema, get_symbols, get_trading_days
+from tradingCalendar import is_session, sessions_between, session_dates_between
 
 # Function to check if a given date is a trading day
 def is_trading_day(date):
     """
-    Returns True if the given date is a trading day (not a weekend or US holiday).
+    Returns True if the given date is an NYSE trading session (not a weekend or market holiday).
     """
-    return date.weekday() < 5 and date not in us_holidays
+    return is_session(date)
 
 # Function to get the list of distinct trading days from the database
 def get_dates_from_db(db_path):
@@ -23,29 +21,21 @@ def get_dates_from_db(db_path):
     conn = sqlite3.connect(db_path)
     c = conn.cursor()
 
-    # Query to get all distinct price_date entries from the stock_prices table
-    c.execute("SELECT DISTINCT price_date FROM stock_prices ORDER BY price_date ASC")
-    dates = c.fetchall()
+    # Seek from day to day along the (symbol, timestamp) key instead of scanning every minute
+    dates = set()
+    for symbol in get_symbols(c):
+        dates.update(get_trading_days(c, symbol))
 
     conn.close()
 
-    # Convert the tuples into a list of datetime.date objects
-    return [datetime.strptime(row[0], '%Y-%m-%d').date() for row in dates]
+    return sorted(dates)
 
 # Function to calculate the expected number of trading days between two dates
 def calculate_expected_trading_days(start_date, end_date):
     """
     Calculate the number of expected trading days (excluding weekends and holidays) between two dates.
     """
-    current_date = start_date
-    expected_trading_days = 0
-
-    while current_date <= end_date:
-        if is_trading_day(current_date):
-            expected_trading_days += 1
-        current_date += timedelta(days=1)
-
-    return expected_trading_days
+    return len(sessions_between(start_date, end_date))
 
 # Function to get the duration in months and days between two dates
 def get_duration(start, end):
@@ -57,31 +47,10 @@ def get_duration(start, end):
     days = delta.days
     return months, days
 
-# Function to check for exact duplicate entries in the database
-def find_exact_duplicates(db_path):
-    """
-    Check the database for any exact duplicate entries.
-    """
-    conn = sqlite3.connect(db_path)
-    c = conn.cursor()
-
-    # Query to find exact duplicate rows based on all fields except primary key
-    c.execute("""
-        SELECT stock_name, stock_price, volume, price_time, price_date, COUNT(*) as count 
-        FROM stock_prices 
-        GROUP BY stock_name, stock_price, volume, price_time, price_date 
-        HAVING count > 1
-    """)
-    duplicates = c.fetchall()
-
-    conn.close()
-
-    return duplicates
-
 # Function to validate the database for missing and duplicate data
 def validate_database(db_name):
     """
-    Validate the database for missing and exact duplicate trading days.
+    Validate the database for missing trading days.
     """
     # Construct the full path to the database file assuming it's in the data/ folder
     db_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', db_name))
@@ -90,6 +59,8 @@ def validate_database(db_name):
         print(f"Database file not found: {db_name}")
         return
 
+    ensure_current_schema(db_path)
+
     # Fetch distinct trading days from the database
     dates = get_dates_from_db(db_path)
 
@@ -114,11 +85,7 @@ def validate_database(db_name):
         # Check for gaps larger than 1 day
         if day_diff > 1:
             # Identify the missing trading days in the gap
-            missing_days = []
-            for j in range(1, day_diff):
-                potential_missing_date = current_date + timedelta(days=j)
-                if is_trading_day(potential_missing_date):
-                    missing_days.append(potential_missing_date)
+            missing_days = session_dates_between(current_date + timedelta(days=1), next_date - timedelta(days=1))
 
             # If we found any missing trading days, add them to the missing ranges
             if missing_days:
@@ -127,14 +94,8 @@ def validate_database(db_name):
 
         current_date = next_date
 
-    # Check for exact duplicate entries
-    duplicates = find_exact_duplicates(db_path)
-    if duplicates:
-        print("\nExact duplicate data found for the following entries:")
-        for stock_name, stock_price, volume, price_time, price_date, count in duplicates:
-            print(f" - {stock_name} on {price_date} at {price_time} with price {stock_price} and volume {volume}: {count} entries")
-    else:
-        print("\nNo exact duplicate data found.")
+    # The (symbol, timestamp) primary key rejects duplicates on insert, so there is nothing left to search for
+    print("\nNo exact duplicate data found (duplicates are prevented by the schema).")
 
     # Calculate expected vs. actual trading days
     expected_trading_days = calculate_expected_trading_days(start_date, end_date)
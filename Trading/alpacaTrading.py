@@ -1,22 +1,42 @@
 import os
 import json
-import boto3
-import yfinance as yf
 from datetime import datetime, timedelta
-import alpaca_trade_api as tradeapi  # Ensure you have the `alpaca-trade-api` library installed
+from concurrent.futures import ThreadPoolExecutor
+from rollingBands import RollingWeightedBollingerBands
+from portfolioLedger import Portfolio, Position
+from liveState import LiveTradingState, PRICE_WINDOW, build_history_item, empty_stock_data
 
 # Alpaca API keys and base URL
 APCA_API_KEY_ID = os.getenv("APCA_API_KEY_ID")
 APCA_API_SECRET_KEY = os.getenv("APCA_API_SECRET_KEY")
 APCA_API_BASE_URL = "https://paper-api.alpaca.markets/v2"  # Updated to the correct endpoint
 
-# Initialize the Alpaca API client with the new base URL
-alpaca_api = tradeapi.REST(APCA_API_KEY_ID, APCA_API_SECRET_KEY, base_url=APCA_API_BASE_URL)
-
 # DynamoDB setup
-dynamodb = boto3.resource('dynamodb')
 DYNAMODB_TABLE_NAME = 'StockDataTable'
-table = dynamodb.Table(DYNAMODB_TABLE_NAME)
+
+LAMBDA_SYMBOLS = ["AAPL", "AMZN", "NFLX", "GOOGL", "META"]
+FETCH_WORKERS = 8  # Concurrent per-symbol requests for symbols the batched download missed
+
+# Clients are created on first use and kept at module level, so warm invocations of the Lambda reuse them
+_clients = {}
+
+def get_alpaca_api():
+    """
+    Alpaca API client with the paper trading base URL.
+    """
+    if 'alpaca' not in _clients:
+        import alpaca_trade_api as tradeapi  # Ensure you have the `alpaca-trade-api` library installed
+        _clients['alpaca'] = tradeapi.REST(APCA_API_KEY_ID, APCA_API_SECRET_KEY, base_url=APCA_API_BASE_URL)
+    return _clients['alpaca']
+
+def get_dynamodb_table():
+    """
+    DynamoDB table holding each symbol's trading state.
+    """
+    if 'table' not in _clients:
+        import boto3
+        _clients['table'] = boto3.resource('dynamodb').Table(DYNAMODB_TABLE_NAME)
+    return _clients['table']
 
 # Function to get Alpaca cash balance
 def get_alpaca_cash_balance():
@@ -25,7 +45,7 @@ def get_alpaca_cash_balance():
     :return: Current cash balance as a float
     """
     try:
-        account = alpaca_api.get_account()
+        account = get_alpaca_api().get_account()
         return float(account.cash)
     except Exception as e:
         print(f"Error retrieving cash balance from Alpaca: {e}")
@@ -40,19 +60,7 @@ def save_data_to_dynamodb(symbol, timestamp, data):
     :param data: Dictionary to be saved as the item for the given symbol and timestamp
     """
     try:
-        table.put_item(
-            Item={
-                'symbol': symbol,
-                'timestamp': timestamp,
-                'price': data['prices'][-1],  # Latest price
-                'volume': data.get('volume', 0),  # Volume of the stock
-                'shares': data['shares'],
-                'purchase_history': json.dumps(data['purchase_history']),  # Serialize purchase history
-                'daily_profit': data['daily_profit'],
-                'winning_sells': data['winning_sells'],
-                'losing_sells': data['losing_sells']
-            }
-        )
+        get_dynamodb_table().put_item(Item=build_history_item(symbol, timestamp, data))
         print(f"Successfully saved data for {symbol} at {timestamp} to DynamoDB.")
     except Exception as e:
         print(f"Error saving data to DynamoDB for {symbol} at {timestamp}: {e}")
@@ -66,21 +74,88 @@ def load_data_from_dynamodb(symbol):
     :return: Loaded dictionary or an empty list if no data is found
     """
     try:
-        response = table.query(
-            KeyConditionExpression=boto3.dynamodb.conditions.Key('symbol').eq(symbol),
+        from boto3.dynamodb.conditions import Key
+        response = get_dynamodb_table().query(
+            KeyConditionExpression=Key('symbol').eq(symbol),
             ScanIndexForward=False,  # Get the latest item first
             Limit=1  # Get only the most recent data point
         )
         if response['Items']:
             item = response['Items'][0]
-            item['purchase_history'] = json.loads(item['purchase_history'])  # Deserialize purchase history
-            return item
+            # History items hold only the latest price, and DynamoDB returns numbers as Decimal
+            return {
+                "prices": [float(item['price'])] if item.get('price') is not None else [],
+                "shares": int(item['shares']),
+                "purchase_history": json.loads(item['purchase_history']),  # Deserialize purchase history
+                "daily_profit": float(item['daily_profit']),
+                "winning_sells": float(item['winning_sells']),
+                "losing_sells": float(item['losing_sells'])
+            }
         else:
             print(f"No data found for {symbol} in DynamoDB. Initializing new data store.")
-            return {"prices": [], "shares": 0, "purchase_history": [], "daily_profit": 0, "winning_sells": 0, "losing_sells": 0}
+            return empty_stock_data()
     except Exception as e:
         print(f"Error loading data from DynamoDB for {symbol}: {e}")
-        return {"prices": [], "shares": 0, "purchase_history": [], "daily_profit": 0, "winning_sells": 0, "losing_sells": 0}
+        return empty_stock_data()
+
+# State of the traded symbols, kept in memory across warm invocations and snapshotted to DynamoDB
+live_state = LiveTradingState(get_dynamodb_table, PRICE_WINDOW, load_fallback=load_data_from_dynamodb)
+
+def fetch_latest_price(symbol, interval='1m'):
+    """
+    Latest close of one symbol from yfinance.
+    :return: Tuple of (price, 'YYYY-MM-DD HH:MM:SS' time of the bar), or None if no bar was returned.
+    """
+    import yfinance as yf
+
+    new_data = yf.Ticker(symbol).history(period="1d", interval=interval)
+    if new_data.empty:
+        return None
+    return float(new_data['Close'].iloc[-1]), new_data.index[-1].strftime('%Y-%m-%d %H:%M:%S')
+
+def fetch_latest_prices(symbols, interval='1m', max_workers=FETCH_WORKERS):
+    """
+    Latest close of every symbol, downloaded from yfinance in one batched call. Symbols the download leaves out
+    are requested individually, concurrently.
+    :return: Dictionary of symbol -> (price, bar time) for the symbols that returned a bar.
+    """
+    import yfinance as yf
+
+    latest = {}
+    try:
+        data = yf.download(list(symbols), period="1d", interval=interval, group_by='ticker', threads=True, progress=False)
+        for symbol in symbols:
+            try:
+                closes = data[symbol]['Close'].dropna()
+            except KeyError:
+                continue
+            if not closes.empty:
+                latest[symbol] = (float(closes.iloc[-1]), closes.index[-1].strftime('%Y-%m-%d %H:%M:%S'))
+    except Exception as e:
+        print(f"Error downloading the latest prices from yfinance: {e}")
+
+    missing = [symbol for symbol in symbols if symbol not in latest]
+    if missing:
+        def fetch(symbol):
+            try:
+                return fetch_latest_price(symbol, interval)
+            except Exception as e:
+                print(f"Error fetching the latest price of {symbol} from yfinance: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as executor:
+            for symbol, result in zip(missing, executor.map(fetch, missing)):
+                if result is not None:
+                    latest[symbol] = result
+    return latest
+
+def apply_latest_price(symbol, stock_data, latest_price, latest_minute):
+    """
+    Append the latest price to the stock data dictionary, keeping the last 14 days of minute-by-minute data.
+    """
+    stock_data['prices'].append(latest_price)
+    stock_data['prices'] = stock_data['prices'][-1440 * 14:]  # Keep last 14 days of minute data
+    print(f"Updated {symbol} data with yfinance. Latest price: {latest_price} at {latest_minute}")
 
 # Function to update data with yfinance
 def update_data_with_yfinance(symbol, stock_data, interval='1m'):
@@ -90,58 +165,45 @@ def update_data_with_yfinance(symbol, stock_data, interval='1m'):
     :param stock_data: Dictionary storing historical and real-time data
     :param interval: Time interval for yfinance data (default is '1m' for minute-by-minute)
     """
-    # Fetch the most recent minute-by-minute data
-    ticker = yf.Ticker(symbol)
-    new_data = ticker.history(period="1d", interval=interval)
-    if not new_data.empty:
-        latest_minute = new_data.index[-1].strftime('%Y-%m-%d %H:%M:%S')
-        latest_price = new_data['Close'].iloc[-1]
-
-        # Append the new data and maintain only the last 14 days of minute-by-minute data
-        stock_data['prices'].append(latest_price)
-        stock_data['prices'] = stock_data['prices'][-1440 * 14:]  # Keep last 14 days of minute data
-        print(f"Updated {symbol} data with yfinance. Latest price: {latest_price} at {latest_minute}")
-
-# Calculate Bollinger Bands function (Add this function as a placeholder if it's missing)
-def calculate_weighted_bollinger_bands(prices, window=14):
-    if len(prices) < window:
-        return None, None, None
-    weights = [i + 1 for i in range(window)]
-    weighted_moving_average = sum([p * w for p, w in zip(prices[-window:], weights)]) / sum(weights)
-    weighted_std_dev = (sum(w * (p - weighted_moving_average) ** 2 for p, w in zip(prices[-window:], weights)) / sum(weights)) ** 0.5
-    upper_band = weighted_moving_average + (weighted_std_dev * 2)
-    lower_band = weighted_moving_average - (weighted_std_dev * 2)
-    return lower_band, weighted_moving_average, upper_band
+    latest = fetch_latest_price(symbol, interval)
+    if latest is not None:
+        apply_latest_price(symbol, stock_data, *latest)
 
 # Function to handle trading with Alpaca
 def trade_with_alpaca(symbols, threshold=0.1):
     """
     Executes trading strategy using Alpaca API for real-time trading, similar to the simulate_trading method.
     """
-    # Load initial stock data from DynamoDB
-    stock_data = {symbol: load_data_from_dynamodb(symbol) for symbol in symbols}
-
-    # Retrieve the current cash balance from Alpaca
-    total_cash = get_alpaca_cash_balance()
-    print(f"Current cash balance from Alpaca: ${total_cash:.2f}")
+    # Stock data from memory when the process is warm; a cold start reads the DynamoDB snapshot once
+    stock_data = live_state.load(symbols)
 
-    combined_equity = total_cash
+    # Retrieve the current cash balance from Alpaca and rebuild each symbol's position from its saved state
+    portfolio = Portfolio(symbols, get_alpaca_cash_balance(),
+                          {symbol: Position.from_state(symbol, stock_data[symbol]) for symbol in symbols})
+    print(f"Current cash balance from Alpaca: ${portfolio.cash:.2f}")
 
-    # Update the stock data with the latest prices using yfinance
+    # Update the stock data with the latest prices of all symbols, fetched from yfinance in one batch
+    latest_prices = fetch_latest_prices(symbols)
     for symbol in symbols:
-        update_data_with_yfinance(symbol, stock_data[symbol])
+        if symbol in latest_prices:
+            apply_latest_price(symbol, stock_data[symbol], *latest_prices[symbol])
 
-    # Calculate Bollinger Bands for each symbol
+    # Calculate Bollinger Bands for each symbol from its rolling 14-price window, with the simulator's calculator
+    # (bandsTester.py checks it against the pure-Python band function this trader used before)
     initial_bands = {}
     for symbol in symbols:
-        lower_band, weighted_moving_average, upper_band = calculate_weighted_bollinger_bands(stock_data[symbol]['prices'])
-        initial_bands[symbol] = (lower_band, weighted_moving_average, upper_band)
+        band_calculator = RollingWeightedBollingerBands(window=PRICE_WINDOW)
+        initial_bands[symbol] = band_calculator.extend(stock_data[symbol]['prices'][-PRICE_WINDOW:])
 
     # Evaluate buy and sell opportunities
+    timestamp = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
     for symbol in symbols:
-        current_price = stock_data[symbol]['prices'][-1]
+        position = portfolio.positions[symbol]
         lower_band, _, upper_band = initial_bands[symbol]
-        timestamp = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        if lower_band is None:
+            print(f"Not enough price history to calculate bands for {symbol}. Skipping.")
+            continue
+        current_price = stock_data[symbol]['prices'][-1]
 
         # Adjust the threshold dynamically based on suggestions
         hour_of_day = datetime.utcnow().hour
@@ -158,40 +220,30 @@ def trade_with_alpaca(symbols, threshold=0.1):
 
         # Calculate dynamic buy size based on distance from lower band
         distance_from_band = abs(current_price - lower_band) / (upper_band - lower_band)
-        dynamic_buy_size = max(1, int((1 - distance_from_band) * (total_cash // current_price)))
-
-        # Sell Logic
-        if current_price >= (upper_band * (1 - dynamic_threshold / 100)) and stock_data[symbol]['shares'] > 0:
-            shares_to_sell = stock_data[symbol]['shares']
-            if shares_to_sell > 0:
-                cash_gained = round(shares_to_sell * current_price, 2)
-                stock_data[symbol]['shares'] = 0
-                total_cash += cash_gained
-
-                # Track performance and update state
-                stock_data[symbol]['daily_profit'] += cash_gained
-                stock_data[symbol]['purchase_history'] = []  # Reset purchase history
+        dynamic_buy_size = max(1, int((1 - distance_from_band) * (portfolio.cash // current_price)))
 
-                print(f"Sold {shares_to_sell} shares of {symbol} at {current_price}. Total Cash: {total_cash}")
+        # Sell Logic: the whole position is sold, whatever the profit; the ledger records the realized profit or loss
+        if current_price >= (upper_band * (1 - dynamic_threshold / 100)) and position.shares > 0:
+            cash_gained, shares_sold = portfolio.sell(position, current_price, min_profit_margin=None)
+            print(f"Sold {shares_sold} shares of {symbol} at {current_price}. Total Cash: {portfolio.cash}")
 
         # Buy Logic
-        if current_price <= (lower_band * (1 + dynamic_threshold / 100)) and total_cash >= current_price:
-            shares_to_buy = min(dynamic_buy_size, int(total_cash // current_price))
+        if current_price <= (lower_band * (1 + dynamic_threshold / 100)) and portfolio.cash >= current_price:
+            shares_to_buy = min(dynamic_buy_size, int(portfolio.cash // current_price))
             if shares_to_buy > 0:
-                stock_data[symbol]['shares'] += shares_to_buy
-                cash_spent = round(shares_to_buy * current_price, 2)
-                total_cash -= cash_spent
-                stock_data[symbol]['purchase_history'].append((current_price, shares_to_buy))
+                portfolio.buy(position, current_price, shares_to_buy)
+                print(f"Bought {shares_to_buy} shares of {symbol} at {current_price}. Cash Remaining: {portfolio.cash}")
 
-                print(f"Bought {shares_to_buy} shares of {symbol} at {current_price}. Cash Remaining: {total_cash}")
+        # Keep the updated position in the in-memory state
+        stock_data[symbol].update(position.to_state())
 
-        # Save updated stock data to DynamoDB with timestamp
-        save_data_to_dynamodb(symbol, timestamp, stock_data[symbol])
+    # Persist every symbol's state to DynamoDB in one batched write
+    live_state.save(timestamp, symbols)
 
 # Add the temporary test function here
 def test_alpaca_connection():
     try:
-        account = alpaca_api.get_account()
+        account = get_alpaca_api().get_account()
         print(f"Connected to Alpaca! Account cash balance: {account.cash}")
     except Exception as e:
         print(f"Failed to connect to Alpaca: {e}")
@@ -201,7 +253,7 @@ def lambda_handler(event, context):
     # Run the Alpaca connection test before the main trading logic
     test_alpaca_connection()
 
-    symbols = ["AAPL", "AMZN", "NFLX", "GOOGL", "META"]
+    symbols = (event or {}).get('symbols') or LAMBDA_SYMBOLS
     trade_with_alpaca(symbols)
     return {"statusCode": 200, "body": json.dumps("Trading completed successfully.")}
 
@@ -0,0 +1,127 @@
+import sys
+import time
+import numpy as np
+
+from rollingBands import RollingWeightedBollingerBands, rolling_weighted_bollinger_band_series
+
+# The band functions the rolling calculator replaced, kept as the reference for the parity checks
+
+def reference_weighted_bollinger_bands(prices, window=14):
+    """
+    The NumPy version tradeSimulator.py used.
+    """
+    if len(prices) < window:
+        return None, None, None
+
+    weights = np.arange(1, window + 1)
+    weighted_moving_average = np.dot(prices[-window:], weights) / sum(weights)
+    weighted_std_dev = np.sqrt(np.dot(weights, (prices[-window:] - weighted_moving_average) ** 2) / sum(weights))
+    return weighted_moving_average - (weighted_std_dev * 2), weighted_moving_average, weighted_moving_average + (weighted_std_dev * 2)
+
+def reference_python_bollinger_bands(prices, window=14):
+    """
+    The pure-Python version alpacaTrading.py used.
+    """
+    if len(prices) < window:
+        return None, None, None
+    weights = [i + 1 for i in range(window)]
+    weighted_moving_average = sum([p * w for p, w in zip(prices[-window:], weights)]) / sum(weights)
+    weighted_std_dev = (sum(w * (p - weighted_moving_average) ** 2 for p, w in zip(prices[-window:], weights)) / sum(weights)) ** 0.5
+    return weighted_moving_average - (weighted_std_dev * 2), weighted_moving_average, weighted_moving_average + (weighted_std_dev * 2)
+
+def random_walk(rng, length, start=100.0, scale=0.05):
+    # Rounded to cents like the stored prices, so flat stretches and repeated prices occur
+    return np.round(start + np.cumsum(rng.normal(0, scale, length)), 2).clip(0.01)
+
+def matches(expected, actual, rtol=1e-12, atol=1e-9):
+    if expected[0] is None or actual[0] is None:
+        return expected[0] is None and actual[0] is None
+    return bool(np.allclose(expected, actual, rtol=rtol, atol=atol))
+
+def run_parity_checks(seed=3):
+    """
+    Feed price series to a calculator one price at a time and compare its bands after every update with the
+    reference functions on the same window and with the vectorized series.
+    The NumPy reference and the vectorized series must match exactly, since the buy and sell decisions compare
+    cent-rounded prices with the bands and a difference in the last bit can flip a trade. The pure-Python
+    reference adds its terms in another order, so it only has to agree to rounding; it is checked the way the
+    live trader uses the calculator, a fresh one extended with the stored price list.
+    :return: Number of mismatches.
+    """
+    rng = np.random.default_rng(seed)
+    series = [random_walk(rng, length) for length in (5, 13, 14, 15, 1_000, 50_000)]
+    series += [random_walk(rng, 50_000, start=3000.0, scale=0.5), random_walk(rng, 50_000, start=1.5, scale=0.002)]
+    series += [np.full(40, 42.0), np.linspace(10, 20, 40), np.array([5.0, 5.5] * 20)]
+
+    failures = 0
+    for prices in series:
+        calculator = RollingWeightedBollingerBands(window=14)
+        band_series = rolling_weighted_bollinger_band_series(prices, window=14)
+        mismatches = {'NumPy reference': 0, 'pure-Python reference': 0, 'vectorized series': 0, 'rolling calculator': 0}
+        for i, price in enumerate(prices):
+            actual = calculator.update(price)
+            window = prices[max(i - 13, 0):i + 1]
+            mismatches['NumPy reference'] += reference_weighted_bollinger_bands(window) != actual
+            if i % 7 == 0 or i < 20:
+                live_bands = RollingWeightedBollingerBands(window=14).extend(window.tolist())
+                mismatches['pure-Python reference'] += not matches(reference_python_bollinger_bands(window.tolist()), live_bands)
+                mismatches['rolling calculator'] += live_bands != actual
+            vectorized = tuple(band[i] for band in band_series)
+            if actual[0] is None:
+                mismatches['vectorized series'] += not np.isnan(vectorized).all()
+            else:
+                mismatches['vectorized series'] += vectorized != actual
+
+        for name, count in mismatches.items():
+            if count:
+                failures += 1
+                print(f"Bands differ from the {name} on {count:,} of {len(prices):,} prices")
+
+    return failures
+
+def run_window_checks(seed=5):
+    """
+    The vectorized series for other windows and band widths must equal the calculator's output exactly.
+    :return: Number of mismatches.
+    """
+    rng = np.random.default_rng(seed)
+    prices = random_walk(rng, 2_000)
+    failures = 0
+    for window, num_std_dev in ((1, 2), (5, 1.5), (20, 2), (60, 3)):
+        calculator = RollingWeightedBollingerBands(window=window, num_std_dev=num_std_dev)
+        expected = np.array([[np.nan if band is None else band for band in calculator.update(price)] for price in prices])
+        actual = np.column_stack(rolling_weighted_bollinger_band_series(prices, window, num_std_dev))
+        if not np.array_equal(expected, actual, equal_nan=True):
+            failures += 1
+            print(f"Vectorized series differs from the calculator for window {window}, {num_std_dev} standard deviations")
+    return failures
+
+def time_bands(length=500_000, seed=7):
+    rng = np.random.default_rng(seed)
+    prices = random_walk(rng, length)
+
+    start = time.perf_counter()
+    for i in range(13, length):
+        reference_weighted_bollinger_bands(prices[i - 13:i + 1])
+    reference_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    calculator = RollingWeightedBollingerBands(window=14)
+    for price in prices.tolist():
+        calculator.update(price)
+    rolling_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rolling_weighted_bollinger_band_series(prices)
+    vectorized_seconds = time.perf_counter() - start
+
+    print(f"{length:,} prices: reference bands {reference_seconds:.3f}s, rolling calculator {rolling_seconds:.3f}s, "
+          f"vectorized series {vectorized_seconds:.3f}s")
+
+if __name__ == "__main__":
+    failures = run_parity_checks() + run_window_checks()
+    if failures:
+        print(f"{failures} band checks did not match the reference implementations")
+        sys.exit(1)
+    print("Rolling bands match the reference implementations")
+    time_bands()
@@ -0,0 +1,96 @@
+import json
+from decimal import Decimal
+
+# The snapshot is one item of the stock data table, under a key no symbol uses
+SNAPSHOT_KEY = {'symbol': '__STATE__', 'timestamp': 'snapshot'}
+PRICE_WINDOW = 14  # Prices the bands are computed from, the part of each symbol's history the snapshot keeps
+
+def empty_stock_data():
+    return {"prices": [], "shares": 0, "purchase_history": [], "daily_profit": 0, "winning_sells": 0, "losing_sells": 0}
+
+def to_dynamodb_number(value):
+    # DynamoDB accepts Decimal but not float
+    return Decimal(str(value))
+
+def build_history_item(symbol, timestamp, data):
+    """
+    The item recording a symbol's state at one invocation, in the stock data table's history format.
+    """
+    return {
+        'symbol': symbol,
+        'timestamp': timestamp,
+        'price': to_dynamodb_number(data['prices'][-1]) if data['prices'] else None,  # Latest price
+        'volume': to_dynamodb_number(data.get('volume', 0)),  # Volume of the stock
+        'shares': to_dynamodb_number(data['shares']),
+        'purchase_history': json.dumps(data['purchase_history']),  # Serialize purchase history
+        'daily_profit': to_dynamodb_number(data['daily_profit']),
+        'winning_sells': to_dynamodb_number(data['winning_sells']),
+        'losing_sells': to_dynamodb_number(data['losing_sells'])
+    }
+
+class LiveTradingState:
+    """
+    Each symbol's rolling price window and ledger fields, kept in process memory so warm invocations of the live
+    trader start from where the previous one stopped without reading DynamoDB.
+    A cold start reads the snapshot item once; symbols missing from it come from `load_fallback`. save() writes the
+    invocation's history items and the new snapshot with one batched write. The memory is authoritative while the
+    process lives, so only one trader should run against a table at a time.
+    """
+
+    def __init__(self, get_table, window=PRICE_WINDOW, load_fallback=None):
+        """
+        :param get_table: Callable returning the DynamoDB table, called only when the table is read or written.
+        :param load_fallback: Optional callable taking a symbol and returning its stock data, for symbols the
+                              snapshot does not have; they start empty otherwise.
+        """
+        self.get_table = get_table
+        self.window = window
+        self.load_fallback = load_fallback
+        self.stock_data = {}
+        self.snapshot_loaded = False
+
+    def load(self, symbols):
+        """
+        Stock data of the symbols, from memory when the process is warm.
+        :return: Dictionary of symbol -> stock data; the dictionaries are the state itself, so updates to them are kept.
+        """
+        missing = [symbol for symbol in symbols if symbol not in self.stock_data]
+        if missing and not self.snapshot_loaded:
+            self.load_snapshot()
+        for symbol in missing:
+            if symbol not in self.stock_data:
+                self.stock_data[symbol] = self.load_fallback(symbol) if self.load_fallback else empty_stock_data()
+        return {symbol: self.stock_data[symbol] for symbol in symbols}
+
+    def load_snapshot(self):
+        self.snapshot_loaded = True
+        try:
+            item = self.get_table().get_item(Key=SNAPSHOT_KEY).get('Item')
+        except Exception as e:
+            print(f"Error loading the state snapshot from DynamoDB: {e}")
+            return
+        if item is None:
+            print("No state snapshot in DynamoDB. Loading each symbol's latest item.")
+            return
+        for symbol, data in json.loads(item['state']).items():
+            self.stock_data.setdefault(symbol, data)
+
+    def snapshot(self):
+        """
+        The state of every symbol in memory, with each price history cut to the window, as a JSON string.
+        """
+        return json.dumps({symbol: dict(data, prices=data['prices'][-self.window:]) for symbol, data in self.stock_data.items()})
+
+    def save(self, timestamp, symbols):
+        """
+        Persist the invocation in one batched write: a history item per symbol traded and the new snapshot.
+        """
+        try:
+            with self.get_table().batch_writer() as batch:
+                for symbol in symbols:
+                    batch.put_item(Item=build_history_item(symbol, timestamp, self.stock_data[symbol]))
+                batch.put_item(Item=dict(SNAPSHOT_KEY, state=self.snapshot(), saved_at=timestamp))
+            print(f"Saved the state of {len(symbols)} symbols at {timestamp} to DynamoDB.")
+        except Exception as e:
+            # The state stays in memory, so the next warm invocation still trades from it and saves it again
+            print(f"Error saving the state to DynamoDB at {timestamp}: {e}")
@@ -0,0 +1,198 @@
+import os
+import io
+import sys
+import sqlite3
+import itertools
+import contextlib
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+import numpy as np
+
+# Import necessary functions and modules from other scripts
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../DataAnalysis')))
+from tradeSimulator import simulate_trading, load_simulation_series, get_historical_prices
+from databaseProvisioner import provision_and_wait
+from dataCatalog import load_price_range
+
+SWEEP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/tradeData/sweeps'))
+
+def share_simulation_series(series):
+    """
+    Copy a symbol's price and minute-of-day arrays into one shared memory block that every worker can map without copying.
+    :param series: Dictionary returned by load_simulation_series, plus the 'history' prices.
+    :return: Tuple of (shared memory block, descriptor to pass to the workers).
+    """
+    count = len(series['prices'])
+    block = shared_memory.SharedMemory(create=True, size=max(count * 16, 1))
+    np.ndarray(count, dtype=np.float64, buffer=block.buf)[:] = series['prices']
+    np.ndarray(count, dtype=np.int64, buffer=block.buf, offset=count * 8)[:] = series['minutes']
+    descriptor = {
+        'name': block.name,
+        'count': count,
+        'day_ranges': series['day_ranges'],
+        'history': series['history']
+    }
+    return block, descriptor
+
+def attach_simulation_series(descriptor):
+    """
+    Map a shared price series back into NumPy arrays.
+    :return: Tuple of (shared memory block, series dictionary as accepted by simulate_trading's price_series).
+    """
+    block = shared_memory.SharedMemory(name=descriptor['name'])
+    count = descriptor['count']
+    series = {
+        'prices': np.ndarray(count, dtype=np.float64, buffer=block.buf),
+        'minutes': np.ndarray(count, dtype=np.int64, buffer=block.buf, offset=count * 8),
+        'day_ranges': descriptor['day_ranges'],
+        'history': descriptor['history']
+    }
+    return block, series
+
+def run_sweep_case(case, shared_series):
+    """
+    Run one simulation of the sweep in a worker process against the shared price arrays.
+    :return: Tuple of (case, summary metrics returned by simulate_trading).
+    """
+    blocks = []
+    price_series = {}
+    try:
+        for symbol in case['symbols']:
+            block, price_series[symbol] = attach_simulation_series(shared_series[symbol])
+            blocks.append(block)
+
+        os.makedirs(case['output_dir'], exist_ok=True)
+        with contextlib.redirect_stdout(io.StringIO()):  # Keep the per-run report out of the sweep output
+            summary = simulate_trading(case['symbols'], case['start_date'], case['end_date'], case['interval'],
+                                       case['simulate_start_date'], case['simulate_end_date'], case['threshold'],
+                                       case['initial_cash'], engine='vectorized', price_series=price_series,
+                                       trades_file=case['trades_file'], equity_file=case['equity_file'])
+    finally:
+        # The array views must be released before the shared memory can be closed
+        price_series.clear()
+        for block in blocks:
+            block.close()
+    return case, summary
+
+def write_sweep_results(results_file, results):
+    """
+    Write the summary metrics of every run into a single results table.
+    """
+    conn = sqlite3.connect(results_file)
+    c = conn.cursor()
+    c.execute('''
+        CREATE TABLE IF NOT EXISTS sweep_results (
+            run_id INTEGER,
+            symbols TEXT,
+            threshold REAL,
+            initial_cash REAL,
+            total_trades INTEGER,
+            average_success_percent REAL,
+            final_equity REAL,
+            percentage_returns REAL,
+            total_profit REAL,
+            trades_file TEXT,
+            equity_file TEXT
+        )
+    ''')
+    c.executemany("INSERT INTO sweep_results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", [
+        (row['run_id'], ",".join(row['symbols']), row['threshold'], row['initial_cash'], row['total_trades'],
+         row['average_success_percent'], row['final_equity'], row['percentage_returns'], row['total_profit'],
+         row['trades_file'], row['equity_file'])
+        for row in results
+    ])
+    conn.commit()
+    conn.close()
+
+def run_parameter_sweep(symbol_sets, start_date, end_date, interval, simulate_start_date, simulate_end_date, thresholds, initial_cash_values,
+                        max_workers=None, sweep_dir=None):
+    """
+    Run simulate_trading for every combination of symbol set, threshold and initial cash across a process pool.
+    Each symbol's minute series is read from its database once and shared with the workers through shared memory.
+    Every run writes its own trades.db/equity.db under `sweep_dir`, and the summaries go into sweep_dir/results.db.
+    :return: List of per-run summary dictionaries sorted by percentage returns, or None if a database could not be built.
+    """
+    sweep_dir = sweep_dir or os.path.join(SWEEP_DIR, datetime.now().strftime('%Y%m%d_%H%M%S'))
+    os.makedirs(sweep_dir, exist_ok=True)
+
+    # Load each symbol once, no matter how many symbol sets it appears in
+    unique_symbols = sorted(set(itertools.chain.from_iterable(symbol_sets)))
+    if len(provision_and_wait(unique_symbols, start_date, simulate_end_date, interval)) < len(unique_symbols):
+        return None
+
+    blocks = []
+    shared_series = {}
+    try:
+        for symbol in unique_symbols:
+            price_columns = load_price_range(symbol, start_date, simulate_end_date, interval)
+            series = load_simulation_series(price_columns, simulate_start_date, simulate_end_date)
+            series['history'] = get_historical_prices(price_columns, start_date, simulate_start_date)[-14:].tolist()
+            block, shared_series[symbol] = share_simulation_series(series)
+            blocks.append(block)
+            print(f"Loaded {len(series['prices']):,} bars for {symbol}.")
+
+        cases = []
+        for run_id, (symbols, threshold, initial_cash) in enumerate(itertools.product(symbol_sets, thresholds, initial_cash_values), start=1):
+            output_dir = os.path.join(sweep_dir, f"run_{run_id:04d}")
+            cases.append({
+                'run_id': run_id,
+                'symbols': list(symbols),
+                'start_date': start_date,
+                'end_date': end_date,
+                'interval': interval,
+                'simulate_start_date': simulate_start_date,
+                'simulate_end_date': simulate_end_date,
+                'threshold': threshold,
+                'initial_cash': initial_cash,
+                'output_dir': output_dir,
+                'trades_file': os.path.join(output_dir, 'trades.db'),
+                'equity_file': os.path.join(output_dir, 'equity.db')
+            })
+
+        results = []
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(run_sweep_case, case, {symbol: shared_series[symbol] for symbol in case['symbols']}) for case in cases]
+            for completed, future in enumerate(as_completed(futures), start=1):
+                case, summary = future.result()
+                sys.stdout.write(f"\rCompleted {completed}/{len(cases)} runs")
+                sys.stdout.flush()
+                if summary is None:
+                    print(f"\nRun {case['run_id']} ({','.join(case['symbols'])}) did not produce results.")
+                    continue
+                results.append({**{key: case[key] for key in ('run_id', 'symbols', 'threshold', 'initial_cash', 'trades_file', 'equity_file')}, **summary})
+        print()
+    finally:
+        for block in blocks:
+            block.close()
+            block.unlink()
+
+    results.sort(key=lambda row: row['percentage_returns'], reverse=True)
+    results_file = os.path.join(sweep_dir, 'results.db')
+    write_sweep_results(results_file, results)
+
+    print(f"{'Run':>5}  {'Symbols':<30} {'Threshold':>10} {'Initial Cash':>14} {'Trades':>8} {'Final Equity':>14} {'Returns':>9}")
+    for row in results:
+        print(f"{row['run_id']:>5}  {','.join(row['symbols']):<30} {row['threshold']:>10.3f} {row['initial_cash']:>14,.2f} "
+              f"{row['total_trades']:>8,} {row['final_equity']:>14,.2f} {row['percentage_returns']:>8.2f}%")
+    print(f"Results saved at: {results_file}")
+    return results
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (9, 10):
+        print("Usage: python parameterSweep.py <symbol_sets> <start_date> <end_date> <interval> <simulate_start_date> <simulate_end_date> <thresholds> <initial_cash_values> [max_workers]")
+        print('Example: python parameterSweep.py "AAPL,AMZN;NFLX,META" 2022-10-30 2023-01-01 1m 2023-01-02 2024-10-01 0.1,0.2,0.5 500,5000')
+        sys.exit(1)
+
+    # Symbol sets are separated by semicolons, symbols within a set and grid values by commas
+    symbol_sets = [symbol_set.upper().split(",") for symbol_set in sys.argv[1].split(";") if symbol_set.strip()]
+    start_date = sys.argv[2].strip()
+    end_date = sys.argv[3].strip()
+    interval = sys.argv[4].strip()
+    simulate_start_date = sys.argv[5].strip()
+    simulate_end_date = sys.argv[6].strip()
+    thresholds = [float(value) for value in sys.argv[7].split(",")]
+    initial_cash_values = [float(value) for value in sys.argv[8].split(",")]
+    max_workers = int(sys.argv[9]) if len(sys.argv) == 10 else None
+
+    run_parameter_sweep(symbol_sets, start_date, end_date, interval, simulate_start_date, simulate_end_date, thresholds, initial_cash_values, max_workers)
@@ -0,0 +1,162 @@
+class Position:
+    """
+    One symbol's holdings and trading counters.
+    The cost of the open shares is kept as a running sum, added in purchase order like summing the purchase
+    history, so checking a sell costs the same however many buys built the position.
+    """
+
+    __slots__ = ('symbol', 'shares', 'cost_basis', 'purchase_history', 'realized_profit', 'daily_profit',
+                 'winning_sells', 'losing_sells', 'daily_buys', 'daily_sells', 'total_trades')
+
+    def __init__(self, symbol, shares=0, purchase_history=None):
+        self.symbol = symbol
+        self.shares = shares
+        self.purchase_history = [tuple(purchase) for purchase in purchase_history or []]
+        self.cost_basis = 0
+        for price, quantity in self.purchase_history:
+            self.cost_basis += price * quantity
+        self.realized_profit = 0
+        self.total_trades = 0
+        self.reset_day()
+
+    def reset_day(self):
+        """
+        Zero the daily profit and trade counters at the start of a trading day.
+        """
+        self.daily_profit = 0
+        self.winning_sells = 0
+        self.losing_sells = 0
+        self.daily_buys = 0
+        self.daily_sells = 0
+
+    def buy(self, price, shares_to_buy):
+        """
+        Add shares bought at the given price.
+        :return: Cash spent on the purchase.
+        """
+        self.shares += shares_to_buy
+        self.cost_basis += price * shares_to_buy
+        self.purchase_history.append((price, shares_to_buy))
+        self.daily_buys += shares_to_buy
+        self.total_trades += 1
+        return round(shares_to_buy * price, 2)
+
+    def sell(self, price, min_profit_margin=0.05 / 100, min_loss_tolerance=-3 / 100):
+        """
+        Sell the whole position when the realized profit clears the minimum margin or the loss stays within tolerance.
+        :param min_profit_margin: Minimum profit as a fraction of the cost basis; None sells unconditionally.
+        :param min_loss_tolerance: Largest accepted loss as a (negative) fraction of the cost basis.
+        :return: Tuple of (cash_gained, shares_sold); (0, 0) if the sell was not taken.
+        """
+        shares_to_sell = self.shares
+        cash_gained = round(shares_to_sell * price, 2)
+        total_buy_cost = round(self.cost_basis, 2)
+
+        # Calculate the realized profit or loss based on the cost of the shares held
+        profit_or_loss = round(cash_gained - total_buy_cost, 2)
+
+        # Check if the sell is either profitable or meets the loss tolerance requirement
+        if min_profit_margin is not None and not (profit_or_loss >= total_buy_cost * min_profit_margin
+                                                  or profit_or_loss >= total_buy_cost * min_loss_tolerance):
+            return 0, 0
+
+        self.shares = 0
+        self.cost_basis = 0
+        self.purchase_history = []  # Reset purchase history after selling
+        self.realized_profit += profit_or_loss
+        self.daily_profit += profit_or_loss
+        self.daily_sells += shares_to_sell
+        self.total_trades += 1
+
+        # Track cash gained or lost for winning or losing sells
+        if profit_or_loss > 0:
+            self.winning_sells += profit_or_loss
+        else:
+            self.losing_sells += abs(profit_or_loss)
+
+        return cash_gained, shares_to_sell
+
+    def to_state(self):
+        """
+        The fields a live trading store persists, as a dictionary.
+        """
+        return {
+            'shares': self.shares,
+            'purchase_history': self.purchase_history,
+            'daily_profit': self.daily_profit,
+            'winning_sells': self.winning_sells,
+            'losing_sells': self.losing_sells
+        }
+
+    @classmethod
+    def from_state(cls, symbol, state):
+        """
+        Rebuild a position from a dictionary saved with to_state (extra keys are ignored).
+        """
+        position = cls(symbol, state.get('shares', 0), state.get('purchase_history'))
+        position.daily_profit = state.get('daily_profit', 0)
+        position.winning_sells = state.get('winning_sells', 0)
+        position.losing_sells = state.get('losing_sells', 0)
+        return position
+
+class Portfolio:
+    """
+    Shared cash and the positions of several symbols.
+    Buys and sells go through the portfolio so cash and the day's totals move together with the position.
+    """
+
+    __slots__ = ('cash', 'positions', 'daily_buys', 'daily_sells')
+
+    def __init__(self, symbols, cash, positions=None):
+        """
+        :param positions: Optional existing Position objects by symbol; the other symbols start flat.
+        """
+        self.cash = cash
+        self.positions = {symbol: (positions or {}).get(symbol) or Position(symbol) for symbol in symbols}
+        self.daily_buys = 0
+        self.daily_sells = 0
+
+    def reset_day(self):
+        self.daily_buys = 0
+        self.daily_sells = 0
+        for position in self.positions.values():
+            position.reset_day()
+
+    def buy(self, position, price, shares_to_buy):
+        """
+        Buy shares for one of the portfolio's positions and pay for them from the cash.
+        :return: Cash spent.
+        """
+        cash_spent = position.buy(price, shares_to_buy)
+        self.cash -= cash_spent
+        self.daily_buys += shares_to_buy
+        return cash_spent
+
+    def sell(self, position, price, min_profit_margin=0.05 / 100, min_loss_tolerance=-3 / 100):
+        """
+        Sell one of the portfolio's positions if Position.sell accepts it, adding the proceeds to the cash.
+        :return: Tuple of (cash_gained, shares_sold); (0, 0) if the sell was not taken.
+        """
+        cash_gained, shares_sold = position.sell(price, min_profit_margin, min_loss_tolerance)
+        if shares_sold > 0:
+            self.cash += cash_gained
+            self.daily_sells += shares_sold
+        return cash_gained, shares_sold
+
+    def total_trades(self):
+        return sum(position.total_trades for position in self.positions.values())
+
+    def equity(self, closing_prices):
+        """
+        Cash plus the value of the open positions at their closing prices; positions without a price are left out.
+        :return: Tuple of (equity, total_shares valued).
+        """
+        combined_equity = round(self.cash, 2)  # Round to avoid floating-point issues
+        total_shares = 0
+        for symbol, position in self.positions.items():
+            if position.shares > 0:
+                closing_price = closing_prices.get(symbol)
+                if closing_price:
+                    combined_equity += round(position.shares * closing_price, 2)
+                    total_shares += position.shares
+        return combined_equity, total_shares
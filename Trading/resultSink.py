@@ -0,0 +1,128 @@
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_FLUSH_DAYS = 20  # Simulated days buffered per transaction, about a trading month
+
+SUMMARY_COLUMNS = ('date', 'daily_profit', 'winning_sells', 'losing_sells', 'daily_success_percent', 'buys', 'sells', 'shares')
+EQUITY_COLUMNS = ('date', 'cash', 'equity', 'buys', 'sells', 'shares')
+
+def insert_statement(table, columns):
+    return f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})"
+
+class SimulationResultSink:
+    """
+    Collects the rows a simulation writes to trades.db and equity.db and writes them in batched transactions,
+    holding one connection per database for the whole run instead of connecting and committing per row.
+    Rows are flushed every `flush_days` simulated days and when the sink is closed; use as a context manager
+    or call close() before reading the databases back.
+    """
+
+    def __init__(self, trades_file, equity_file, symbols, flush_days=DEFAULT_FLUSH_DAYS, background=False):
+        """
+        Create the result tables and open the connections.
+        :param symbols: Symbols that get a daily summary table in the trades database.
+        :param flush_days: Days buffered between flushes; 0 or None writes everything at close.
+        :param background: Write the batches on a writer thread so the simulation keeps computing meanwhile.
+        """
+        os.makedirs(os.path.dirname(equity_file), exist_ok=True)
+        self.flush_days = flush_days
+        self.days_buffered = 0
+        self.pending = {}  # (database, statement) -> rows, in the order they were added
+        self.writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='result-sink') if background else None
+        self.last_write = None
+        self.connections = {
+            'trades': sqlite3.connect(trades_file, check_same_thread=not background),
+            'equity': sqlite3.connect(equity_file, check_same_thread=not background)
+        }
+
+        c = self.connections['trades'].cursor()
+        for symbol in dict.fromkeys(symbols):
+            c.execute(f'''
+                CREATE TABLE IF NOT EXISTS {symbol}_trades (
+                    date TEXT,
+                    daily_profit REAL,
+                    winning_sells REAL,
+                    losing_sells REAL,
+                    daily_success_percent REAL,
+                    buys INTEGER,
+                    sells INTEGER,
+                    shares INTEGER  -- Shares held at the end of the day
+                )
+            ''')
+        self.connections['trades'].commit()
+
+        self.connections['equity'].execute('''
+            CREATE TABLE IF NOT EXISTS equity (
+                date TEXT,
+                cash REAL,
+                equity REAL,
+                buys INTEGER,
+                sells INTEGER,
+                shares INTEGER  -- Cumulative shares held at the end of the day
+            )
+        ''')
+        self.connections['equity'].commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def add_row(self, database, statement, row):
+        self.pending.setdefault((database, statement), []).append(row)
+
+    def add_daily_summary(self, symbol, date, daily_profit, winning_sells, losing_sells, daily_success_percent, daily_buys, daily_sells, shares):
+        self.add_row('trades', insert_statement(f"{symbol}_trades", SUMMARY_COLUMNS),
+                     (date, daily_profit, winning_sells, losing_sells, daily_success_percent, daily_buys, daily_sells, shares))
+
+    def add_equity(self, date, cash, equity, daily_buys, daily_sells, total_shares):
+        """
+        Queue the end-of-day equity row. It closes the simulated day, so a batch is flushed once enough days are buffered.
+        """
+        self.add_row('equity', insert_statement('equity', EQUITY_COLUMNS), (date, cash, equity, daily_buys, daily_sells, total_shares))
+        self.days_buffered += 1
+        if self.flush_days and self.days_buffered >= self.flush_days:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the buffered rows, one transaction per database. With a writer thread the batch is handed over and
+        this returns at once; an error in a previous batch is raised here.
+        """
+        batch = self.pending
+        self.pending = {}
+        self.days_buffered = 0
+        if self.writer is None:
+            self.write_batch(batch)
+            return
+        if self.last_write is not None:
+            self.last_write.result()  # Batches are written in order; surface a failed one before queueing more
+        self.last_write = self.writer.submit(self.write_batch, batch)
+
+    def write_batch(self, pending):
+        for database, conn in self.connections.items():
+            statements = [(statement, rows) for (target, statement), rows in pending.items() if target == database]
+            if not statements:
+                continue
+            try:
+                with conn:  # One transaction, rolled back if any row fails
+                    for statement, rows in statements:
+                        conn.executemany(statement, rows)
+            except sqlite3.Error as e:
+                print(f"Failed to write simulation results to the {database} database: {e}")
+                raise
+
+    def close(self):
+        if self.connections is None:
+            return
+        try:
+            self.flush()
+            if self.writer is not None:
+                self.writer.shutdown(wait=True)
+                self.last_write.result()
+        finally:
+            for conn in self.connections.values():
+                conn.close()
+            self.connections = None
@@ -0,0 +1,101 @@
+import math
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+class RollingWeightedBollingerBands:
+    """
+    Weighted Bollinger Bands over the last `window` prices, updated in constant time per price.
+
+    The window lives in a fixed-size ring buffer, so memory stays flat however many prices are added. Each update
+    takes the weighted moving average (weights 1..window, most recent price heaviest) and then the weighted
+    deviation around it in a second pass over the window, with the dot products of the original NumPy band
+    function (kept in bandsTester.py as the reference), so the bands equal its output exactly.
+    """
+
+    __slots__ = ('window', 'num_std_dev', '_buffer', '_head', '_count', '_weights', '_weight_total', '_bands')
+
+    def __init__(self, window=14, num_std_dev=2):
+        self.window = window
+        self.num_std_dev = num_std_dev
+        # Every price is written twice, `window` slots apart, so the window is always one contiguous slice
+        self._buffer = np.zeros(2 * window)
+        self._head = 0  # Index of the oldest price
+        self._count = 0
+        self._weights = np.arange(1, window + 1)
+        self._weight_total = window * (window + 1) // 2
+        self._bands = (None, None, None)
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def is_ready(self):
+        return self._count == self.window
+
+    def prices(self):
+        """
+        Return the prices in the window, oldest first.
+        """
+        return self._buffer[self._head:self._head + self._count].tolist()
+
+    def bands(self):
+        """
+        Return the current (lower_band, weighted_moving_average, upper_band), or (None, None, None) until the window is full.
+        """
+        return self._bands
+
+    def extend(self, prices):
+        """
+        Add several prices in order and return the bands after the last one.
+        """
+        for price in prices:
+            self.update(price)
+        return self._bands
+
+    def update(self, price):
+        """
+        Add a new price to the window and return the updated (lower_band, weighted_moving_average, upper_band).
+        """
+        if self._count < self.window:
+            slot = self._count
+            self._count += 1
+        else:
+            slot = self._head  # The oldest price drops out
+            self._head = (self._head + 1) % self.window
+        self._buffer[slot] = self._buffer[slot + self.window] = price
+        if self._count == self.window:
+            self._set_bands()
+        return self._bands
+
+    def _set_bands(self):
+        prices = self._buffer[self._head:self._head + self.window]
+        weighted_moving_average = float(np.dot(prices, self._weights) / self._weight_total)
+        weighted_std_dev = math.sqrt(np.dot(self._weights, (prices - weighted_moving_average) ** 2) / self._weight_total)
+        self._bands = (weighted_moving_average - weighted_std_dev * self.num_std_dev,
+                       weighted_moving_average,
+                       weighted_moving_average + weighted_std_dev * self.num_std_dev)
+
+def rolling_weighted_bollinger_band_series(prices, window=14, num_std_dev=2):
+    """
+    Vectorized twin of RollingWeightedBollingerBands for a whole price series.
+    Entry i holds the bands a fresh calculator returns after update(prices[i]) (NaN until the window is full).
+    np.vecdot takes the same dot product as np.dot on every row of the sliding windows, so every entry is
+    bit-for-bit equal to the calculator's output.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    lower_band = np.full(len(prices), np.nan)
+    weighted_moving_average = np.full(len(prices), np.nan)
+    upper_band = np.full(len(prices), np.nan)
+    if len(prices) < window:
+        return lower_band, weighted_moving_average, upper_band
+
+    windows = sliding_window_view(prices, window)  # Row i is the window ending at prices[window - 1 + i]
+    weights = np.arange(1, window + 1, dtype=np.float64)
+    weight_total = window * (window + 1) // 2
+    average = np.vecdot(windows, weights) / weight_total
+    std_dev = np.sqrt(np.vecdot((windows - average[:, None]) ** 2, weights) / weight_total)
+
+    lower_band[window - 1:] = average - std_dev * num_std_dev
+    weighted_moving_average[window - 1:] = average
+    upper_band[window - 1:] = average + std_dev * num_std_dev
+    return lower_band, weighted_moving_average, upper_band
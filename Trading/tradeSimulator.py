@@ -1,26 +1,33 @@
 import os
 import sys
-import sqlite3
+import json
 import time
-import subprocess
-from datetime import datetime, timedelta
-import holidays
+import sqlite3
+import heapq
+import itertools
+from operator import itemgetter
 import numpy as np
 
 # Import necessary functions and modules from other scripts
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../DataAnalysis')))
-from stockAnalysis import calculate_buy_index, get_db_path, database_exists, create_database, check_db_populated, calculate_stock_analysis
+from stockAnalysis import calculate_buy_index, calculate_stock_analysis
 from stockMetrics import calculate_bollinger_bands, calculate_volatility_index, calculate_stock_metrics
-
-def create_simulation_database(symbol, start_date, end_date, interval):
-    script_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../DatabaseSetup/setupDatabase.py'))
-    command = [sys.executable, script_path, symbol, "yes", start_date, interval, end_date]
-    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-
-def create_database(symbol, start_date, end_date, interval):
-    script_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '../DatabaseSetup/setupDatabase.py'))
-    command = [sys.executable, script_path, symbol, "yes", start_date, interval, end_date]
-    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+from vectorizedEngine import compute_trade_signals, build_threshold_table, MINUTES_PER_DAY
+from rollingBands import RollingWeightedBollingerBands
+from resultSink import SimulationResultSink, DEFAULT_FLUSH_DAYS
+from portfolioLedger import Portfolio
+from simulationProfiler import SimulationProfiler
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../DatabaseSetup')))
+from priceCache import slice_price_cache, epoch_day_to_date
+from dataCatalog import load_price_range
+from tradingCalendar import get_calendar, is_session, session_dates_between, to_epoch_day
+from databaseProvisioner import provision_and_wait
+
+SIMULATION_ENGINES = ('loop', 'vectorized', 'streaming')
+STREAM_CHUNK_SIZE = 4096  # Bars of one symbol turned into Python values at a time by the streaming engine
+
+TRADES_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/tradeData/trades.db'))
+EQUITY_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/tradeData/equity.db'))
 
 def check_table_exists(db_path):
     conn = sqlite3.connect(db_path)
@@ -35,14 +42,8 @@ def clear_trade_data_file(trade_data_file):
         os.remove(trade_data_file)
 
 def is_market_closed(date):
-    if date.weekday() >= 5:  # 5 = Saturday, 6 = Sunday
-        return True
-
-    us_holidays = holidays.US()
-    if date in us_holidays:
-        return True
-
-    return False
+    # Weekends and NYSE holidays, from the precomputed trading calendar
+    return not is_session(date)
 
 
 def write_trade_to_db(trades_file, symbol, date, action, shares, price, profit):
@@ -91,335 +92,370 @@ def get_last_trade_data(equity_file):
     else:
         return None  # If no data is present
 
-
-# Function to calculate weighted average for given prices and weights
-def calculate_weighted_average(prices, weights):
+def get_historical_prices(columns, start_date, simulate_start_date):
     """
-    Calculate the weighted average of the given prices using the provided weights.
+    Retrieves historical prices between the start_date and simulate_start_date.
+    :param columns: A symbol's price columns, as returned by load_price_range.
+    :return: Array of the prices, in time order (a read-only view when they come from a single database).
     """
-    return np.dot(prices, weights) / sum(weights)
+    return slice_price_cache(columns, start_date, simulate_start_date)['price']
 
-# Function to calculate weighted Bollinger Bands
-def calculate_weighted_bollinger_bands(prices, window=14):
+def load_simulation_series(columns, simulate_start_date, simulate_end_date):
     """
-    Calculate the weighted Bollinger Bands using the last `window` days of prices.
-    More weight is given to the most recent days.
+    Loads a symbol's whole simulation range from its price columns (as returned by load_price_range).
+    Days the market is closed are dropped, so every bar in the series is one the simulator trades.
+    :return: Dictionary with the traded prices, their minute timestamps and minute of day, and the (start, end) bar range of each day.
     """
-    if len(prices) < window:
-        return None, None, None  # Not enough data points
-
-    # Create weights such that recent days have higher weights
-    weights = np.arange(1, window + 1)  # [1, 2, 3, ..., window]
-
-    # Calculate the weighted moving average
-    weighted_moving_average = calculate_weighted_average(prices[-window:], weights)
-
-    # Calculate the standard deviation
-    weighted_std_dev = np.sqrt(np.dot(weights, (prices[-window:] - weighted_moving_average) ** 2) / sum(weights))
-
-    # Calculate the upper and lower bands
-    upper_band = weighted_moving_average + (weighted_std_dev * 2)
-    lower_band = weighted_moving_average - (weighted_std_dev * 2)
-
-    return lower_band, weighted_moving_average, upper_band
-
-def get_historical_prices(db_path, start_date, simulate_start_date):
+    columns = slice_price_cache(columns, simulate_start_date, simulate_end_date)
+    timestamps = columns['timestamp']
+    prices = columns['price']
+
+    epoch_days, day_starts, day_counts = np.unique(timestamps // 1440, return_index=True, return_counts=True)
+    open_days = get_calendar(simulate_start_date, simulate_end_date).sessions_mask(epoch_days)
+
+    # Bars of closed days are only copied out when there are any; otherwise the series stays a view of the cache
+    if not open_days.all():
+        keep = np.repeat(open_days, day_counts)
+        timestamps = timestamps[keep]
+        prices = prices[keep]
+        epoch_days = epoch_days[open_days]
+        day_counts = day_counts[open_days]
+        day_starts = np.concatenate(([0], np.cumsum(day_counts)[:-1])).astype(np.int64)
+
+    day_ranges = {epoch_day_to_date(day): (start, start + count) for day, start, count in zip(epoch_days.tolist(), day_starts.tolist(), day_counts.tolist())}
+    return {
+        'prices': prices,
+        'timestamps': timestamps,
+        'minutes': timestamps % MINUTES_PER_DAY,
+        'day_ranges': day_ranges
+    }
+
+def prepare_vectorized_symbol(series, history, threshold):
     """
-    Retrieves historical prices from the database between the start_date and simulate_start_date.
+    Precomputes a symbol's trade signals for the vectorized engine.
+    Only the trigger bars are kept as Python values, since no other bar can change the simulation state.
+    :param series: Dictionary returned by load_simulation_series (or the same arrays from shared memory).
+    :param history: Prices preceding the series, used to seed the bands.
+    :return: Dictionary with the day ranges, the prices and the signals at each trigger bar.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    cursor.execute(
-        "SELECT stock_price FROM stock_prices WHERE price_date BETWEEN ? AND ? ORDER BY price_date, price_time",
-        (start_date, simulate_start_date),
-    )
-    historical_prices = [row[0] for row in cursor.fetchall()]
-    conn.close()
-    return historical_prices
-
-def initialize_trade_summary_file(trades_file, symbol):
+    signals = compute_trade_signals(series['prices'], series['minutes'], history, threshold, window=14)
+    trigger_bars = np.flatnonzero(signals['sell_trigger'] | signals['buy_trigger'])
+    return {
+        'prices': series['prices'],
+        'day_ranges': series['day_ranges'],
+        'trigger_bars': trigger_bars,
+        'trigger_prices': series['prices'][trigger_bars].tolist(),
+        'distance_from_band': signals['distance_from_band'][trigger_bars].tolist(),
+        'sell_trigger': signals['sell_trigger'][trigger_bars].tolist(),
+        'buy_trigger': signals['buy_trigger'][trigger_bars].tolist()
+    }
+
+def stream_symbol_bars(symbol, timestamps, prices, chunk_size=STREAM_CHUNK_SIZE):
     """
-    Initialize a trade summary table for each stock symbol in the trades file.
-    Adds the new column 'shares' to track the number of shares held at the end of each day.
+    Yields a symbol's bars as (minute, symbol, price) in time order, converting its arrays one chunk at a time.
+    :param timestamps: Epoch minutes of the bars, e.g. a memory-mapped view of the price cache.
+    :param prices: Prices of the bars.
     """
-    conn = sqlite3.connect(trades_file)
-    c = conn.cursor()
+    for chunk_start in range(0, len(timestamps), chunk_size):
+        chunk_end = chunk_start + chunk_size
+        for minute, price in zip(timestamps[chunk_start:chunk_end].tolist(), prices[chunk_start:chunk_end].tolist()):
+            yield minute, symbol, price
 
-    # Create a table for the specific stock symbol with new 'shares' column
-    c.execute(f'''
-        CREATE TABLE IF NOT EXISTS {symbol}_trades (
-            date TEXT,
-            daily_profit REAL,
-            winning_sells REAL,
-            losing_sells REAL,
-            daily_success_percent REAL,
-            buys INTEGER,
-            sells INTEGER,
-            shares INTEGER  -- New column for shares held at the end of the day
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
-def write_daily_summary_to_db(trades_file, symbol, date, daily_profit, winning_sells, losing_sells, daily_success_percent, daily_buys, daily_sells, shares):
+def merge_minute_events(streams):
     """
-    Write daily summary data into the trades file for each stock symbol, including buys, sells, and shares held.
+    K-way merges per-symbol bar streams into one event per minute across all symbols.
+    Only the current chunk of each stream is held in memory, however many symbols are merged.
+    :param streams: Iterators of (minute, symbol, price), each in time order.
+    :return: Generator of (minute, [(symbol, price), ...]), the symbols of a minute in the order of the streams.
     """
-    conn = sqlite3.connect(trades_file)
-    c = conn.cursor()
+    merged = heapq.merge(*streams, key=itemgetter(0))  # Stable: equal minutes keep the order of the streams
+    for minute, bars in itertools.groupby(merged, key=itemgetter(0)):
+        yield minute, [(symbol, price) for _, symbol, price in bars]
 
-    # Insert daily summary for the stock, including the new 'shares' column
-    c.execute(f'''
-        INSERT INTO {symbol}_trades (date, daily_profit, winning_sells, losing_sells, daily_success_percent, buys, sells, shares)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (date, daily_profit, winning_sells, losing_sells, daily_success_percent, daily_buys, daily_sells, shares))
-
-    conn.commit()
-    conn.close()
-
-def initialize_equity_file(equity_file):
+def get_bar_signals(price, minute_of_day, bands, thresholds):
     """
-    Initializes the equity file with columns: date, cash, equity, and shares.
+    Evaluates the band strategy on one bar.
+    :param minute_of_day: Minute of day (0-1439) of the bar.
+    :param bands: Tuple of (lower_band, weighted_moving_average, upper_band) before this bar.
+    :param thresholds: build_threshold_table(threshold) as nested lists: [inside the bands, outside the bands][minute of day].
+    :return: Tuple of (sell_signal, buy_signal, distance_from_band).
     """
-    os.makedirs(os.path.dirname(equity_file), exist_ok=True)
+    lower_band, weighted_moving_average, upper_band = bands
 
-    conn = sqlite3.connect(equity_file)
-    c = conn.cursor()
+    # Time-based threshold (Suggestion 4), widened when the price is outside the bands (Suggestion 5)
+    if price < lower_band or price > upper_band:
+        dynamic_threshold = thresholds[1][minute_of_day]
+    else:
+        dynamic_threshold = thresholds[0][minute_of_day]
 
-    # Create the equity table with an additional 'shares' column
-    c.execute('''
-        CREATE TABLE IF NOT EXISTS equity (
-            date TEXT,
-            cash REAL,
-            equity REAL,
-            buys INTEGER,
-            sells INTEGER,
-            shares INTEGER  -- New column for cumulative shares held at the end of the day
-        )
-    ''')
+    # Calculate dynamic sizing based on distance from bands (Suggestion 6)
+    # More shares are bought when closer to the lower band, and fewer shares are bought when farther away.
+    distance_from_band = abs(price - lower_band) / (upper_band - lower_band)
 
-    conn.commit()
-    conn.close()
+    # Sell when the price is above or near the upper band, buy when it is below or near the lower band
+    sell_signal = price >= (upper_band * (1 - dynamic_threshold / 100))
+    buy_signal = price <= (lower_band * (1 + dynamic_threshold / 100))
+    return sell_signal, buy_signal, distance_from_band
 
-def write_equity_to_db(equity_file, current_date, cash, equity, daily_buys, daily_sells, total_shares):
+def simulate_trading(symbols, start_date, end_date, interval, simulate_start_date, simulate_end_date, threshold, initial_cash, engine='loop',
+                     price_series=None, trades_file=TRADES_FILE, equity_file=EQUITY_FILE, flush_days=DEFAULT_FLUSH_DAYS, background_writer=False,
+                     profile=False, progress=None):
     """
-    Writes the equity data for each day into the equity database, including total buys, sells, and cumulative shares.
+    Simulates the weighted Bollinger Band strategy over minute data and writes the results to trades.db and equity.db.
+    :param engine: 'loop' evaluates every bar in Python; 'vectorized' precomputes the bands and trigger masks with
+                   NumPy and only steps through the bars where a trigger fired. Both write identical results, trading
+                   each symbol's whole day before the next symbol's.
+                   'streaming' merges the symbols' bars by timestamp and trades them minute by minute in true time
+                   order, so a sell only funds buys from the next minute on; memory stays bounded by a chunk per symbol.
+    :param price_series: Optional preloaded data per symbol: the arrays returned by load_simulation_series plus a
+                         'history' array of the prices before the simulation. The symbol databases are not read
+                         when it is given.
+    :param trades_file: Path of the trades database to write.
+    :param equity_file: Path of the equity database to write.
+    :param flush_days: Simulated days of results buffered per write transaction; 0 writes them all at the end.
+    :param background_writer: Write the result batches on a separate thread while the simulation continues.
+    :param profile: Time the data load, band update, decision, ledger update and DB write phases and count the bars
+                    of each symbol; the report is added to the summary under 'profile'.
+    :param progress: Optional callable receiving (days_simulated, total_days, bars_simulated, elapsed_seconds) after
+                     each simulated day.
+    :return: Dictionary of summary metrics for the run, or None if the simulation could not start.
     """
-    conn = sqlite3.connect(equity_file)
-    c = conn.cursor()
-
-    # Insert equity data for the day, including cumulative 'shares'
-    c.execute("INSERT INTO equity (date, cash, equity, buys, sells, shares) VALUES (?, ?, ?, ?, ?, ?)",
-              (current_date, cash, equity, daily_buys, daily_sells, total_shares))
-
-    conn.commit()
-    conn.close()
-
-def simulate_trading(symbols, start_date, end_date, interval, simulate_start_date, simulate_end_date, threshold, initial_cash):
-    # Initialize shared cash pool and starting equity
-    total_cash = round(initial_cash, 2)  # Round to avoid floating-point issues
+    if engine not in SIMULATION_ENGINES:
+        print(f"Unknown engine '{engine}'. Choose one of: {', '.join(SIMULATION_ENGINES)}")
+        return None
+    # Shared cash pool and one position per stock, with running cost basis and daily counters
+    portfolio = Portfolio(symbols, round(initial_cash, 2))  # Round to avoid floating-point issues
+    positions = portfolio.positions
     starting_equity = initial_cash
     combined_equity = initial_cash
 
-    # Initialize tracking variables for each stock
-    stock_data = {symbol: {'shares': 0, 'purchase_history': [], 'daily_profit': 0, 'winning_sells': 0, 'losing_sells': 0} for symbol in symbols}
-    trade_data = {symbol: {'total_trades': 0} for symbol in symbols}
-
     # Create tables for each stock in trades.db and initialize the equity file
-    trades_file = os.path.join(os.path.dirname(__file__), '../data/tradeData/trades.db')
-    equity_file = os.path.join(os.path.dirname(__file__), '../data/tradeData/equity.db')
     clear_trade_data_file(trades_file)
     clear_trade_data_file(equity_file)
 
-    # Initialize trade summary tables for each stock and the equity file
-    for symbol in symbols:
-        initialize_trade_summary_file(trades_file, symbol)
-    initialize_equity_file(equity_file)
+    # Initialize trade summary tables for each stock and the equity file; rows are buffered and written in batches
+    profiler = SimulationProfiler() if profile else None
+    load_start = time.perf_counter()
+    results = SimulationResultSink(trades_file, equity_file, symbols, flush_days, background_writer)
+    if profiler is not None:
+        results.add_daily_summary = profiler.wrap('db_write', results.add_daily_summary)
+        results.add_equity = profiler.wrap('db_write', results.add_equity)
+        results.close = profiler.wrap('db_write', results.close)
 
     # Create a single database for each stock and calculate initial bands
     initial_bands = {}
-    historical_prices = {symbol: [] for symbol in symbols}  # Separate historical prices for each stock
+    band_calculators = {symbol: RollingWeightedBollingerBands(window=14) for symbol in symbols}  # Fixed-size price window for each stock
+    simulation_series = {}
+    if price_series is None:
+        # Days no database in data/ covers yet are fetched in parallel, in this process, before any symbol is loaded
+        if len(provision_and_wait(symbols, start_date, simulate_end_date, interval)) < len(set(symbols)):
+            results.close()
+            return None
+
     for symbol in symbols:
-        full_db_path = get_db_path(symbol, start_date, simulate_end_date, interval)
-        if not database_exists(full_db_path):
-            print(f"Database for {symbol} does not exist. Creating database from {start_date} to {simulate_end_date}...")
-            create_database(symbol, start_date, simulate_end_date, interval)
-
-            # Wait for database to populate
-            indicator_states = ['   ', '.  ', '.. ', '...']
-            indicator_index = 0
-            while not (database_exists(full_db_path) and check_db_populated(full_db_path)):
-                sys.stdout.write(f"\rWaiting for {symbol} database to be populated{indicator_states[indicator_index]}")
-                sys.stdout.flush()
-                time.sleep(1)
-                indicator_index = (indicator_index + 1) % len(indicator_states)
-
-            sys.stdout.write(f"\rDatabase for {symbol} populated.                              \n")
+        if price_series is not None:
+            historical_prices = price_series[symbol]['history']
+            if len(historical_prices) < 14:
+                print(f"Not enough historical data to calculate initial bands for {symbol}.")
+                results.close()
+                return None
+            initial_bands[symbol] = band_calculators[symbol].extend(np.asarray(historical_prices[-14:]).tolist())
+            simulation_series[symbol] = price_series[symbol]
+            continue
+
+        # The symbol's whole range, from whichever databases cover it
+        price_columns = load_price_range(symbol, start_date, simulate_end_date, interval)
 
         # Calculate initial bands using historical data up to the simulation start date for each symbol
-        historical_prices[symbol] = get_historical_prices(full_db_path, start_date, simulate_start_date)
-        if len(historical_prices[symbol]) < 14:  # Ensure we have at least 14 days of data for Bollinger Bands
+        historical_prices = get_historical_prices(price_columns, start_date, simulate_start_date)
+        if len(historical_prices) < 14:  # Ensure we have at least 14 days of data for Bollinger Bands
             print(f"Not enough historical data to calculate initial bands for {symbol}.")
-            return
-        lower_band, weighted_moving_average, upper_band = calculate_weighted_bollinger_bands(historical_prices[symbol], window=14)
-        initial_bands[symbol] = (lower_band, weighted_moving_average, upper_band)
-
-    # Simulate trading for each minute using minute-by-minute data from the current day onwards for all symbols
-    simulate_db_conn = {symbol: sqlite3.connect(get_db_path(symbol, start_date, simulate_end_date, interval)) for symbol in symbols}
-    simulate_cursor = {symbol: simulate_db_conn[symbol].cursor() for symbol in symbols}
-
-    current_date = simulate_start_date
-    while current_date <= simulate_end_date:
-        current_date_dt = datetime.strptime(current_date, '%Y-%m-%d')
+            results.close()
+            return None
+        initial_bands[symbol] = band_calculators[symbol].extend(historical_prices[-14:].tolist())
+
+        # Each symbol's whole simulation range is mapped from its price cache once
+        if engine == 'streaming':
+            # Streamed straight from the cache views; closed days are skipped as their bars come up
+            window = slice_price_cache(price_columns, simulate_start_date, simulate_end_date)
+            simulation_series[symbol] = {'timestamps': window['timestamp'], 'prices': window['price']}
+        else:
+            simulation_series[symbol] = load_simulation_series(price_columns, simulate_start_date, simulate_end_date)
+
+    # Per-bar steps; profiling swaps them for timed versions, so an unprofiled run calls the plain functions
+    bar_signals = get_bar_signals
+    prepare_signals = prepare_vectorized_symbol
+    sell_position = portfolio.sell
+    buy_position = portfolio.buy
+    update_bands = {symbol: band_calculators[symbol].update for symbol in symbols}
+    if profiler is not None:
+        profiler.add('data_load', time.perf_counter() - load_start, len(symbols))
+        bar_signals = profiler.wrap('decision', bar_signals)
+        prepare_signals = profiler.wrap('decision', prepare_signals)  # The vectorized engine decides every bar up front
+        sell_position = profiler.wrap('ledger_update', sell_position)
+        buy_position = profiler.wrap('ledger_update', buy_position)
+        update_bands = {symbol: profiler.wrap('band_update', update) for symbol, update in update_bands.items()}
+
+    # The vectorized engine precomputes the signals of each symbol's whole series
+    vectorized_data = {}
+    if engine == 'vectorized':
+        for symbol in symbols:
+            vectorized_data[symbol] = prepare_signals(simulation_series[symbol], band_calculators[symbol].prices(), threshold)
 
-        if is_market_closed(current_date_dt):
-            current_date = (current_date_dt + timedelta(days=1)).strftime('%Y-%m-%d')
-            continue
+    # Dynamic threshold of each minute of the day, looked up per bar by the loop and streaming engines
+    thresholds = build_threshold_table(threshold).tolist()
 
-        # Reset daily profit and performance for each symbol at the start of the day
-        for symbol in symbols:
-            stock_data[symbol]['daily_profit'] = 0
-            stock_data[symbol]['winning_sells'] = 0  # Reset winning sells count for the day
-            stock_data[symbol]['losing_sells'] = 0  # Reset losing sells count for the day
+    # The streaming engine consumes one time-ordered event per minute for all symbols together
+    if engine == 'streaming':
+        streams = [stream_symbol_bars(symbol, simulation_series[symbol]['timestamps'], simulation_series[symbol]['prices'])
+                   for symbol in dict.fromkeys(symbols)]
+        minute_events = merge_minute_events(streams)
+        next_event = next(minute_events, None)
 
-        # Track total buys and sells across all symbols for the day
-        daily_buys = 0
-        daily_sells = 0
+    # Only NYSE sessions are simulated
+    sessions = session_dates_between(simulate_start_date, simulate_end_date)
+    simulation_start = time.perf_counter()
+    bars_simulated = 0
+    for days_simulated, session in enumerate(sessions, start=1):
+        current_date = session.isoformat()  # YYYY-MM-DD
 
-        # Track buys and sells for each individual stock
-        stock_daily_buys = {symbol: 0 for symbol in symbols}
-        stock_daily_sells = {symbol: 0 for symbol in symbols}
+        # Reset daily profit, performance and buy/sell counts of the portfolio and each symbol at the start of the day
+        portfolio.reset_day()
 
         # Fetch data for each symbol
-        stock_prices_per_minute = {}
-        for symbol in symbols:
-            simulate_cursor[symbol].execute(
-                "SELECT stock_price, volume, price_date, price_time FROM stock_prices WHERE price_date = ? ORDER BY price_time",
-                (current_date,))
-            stock_data_for_symbol = simulate_cursor[symbol].fetchall()
-            if not stock_data_for_symbol:
-                continue
-            stock_prices_per_minute[symbol] = stock_data_for_symbol
-
-        # Store available cash at the beginning of the minute to avoid using cash from current-minute sells
-        cash_at_minute_start = round(total_cash, 2)  # Round to avoid floating-point issues
-
-        # Evaluate buy and sell opportunities for each stock in the same loop
-        for symbol, stock_info in stock_prices_per_minute.items():
-            for price, volume, date, time_ in stock_info:
-                lower_band, weighted_moving_average, upper_band = initial_bands[symbol]
-
-                # Calculate dynamic profit/loss tolerance based on cash levels
-                min_loss_tolerance = -3 / 100  # 3% loss tolerance
-                min_profit_margin = 0.05 / 100  # 0.05% minimum profit margin
-
-                # Calculate time-based threshold adjustments (Suggestion 4)
-                hour_of_day = datetime.strptime(time_, '%I:%M:%S %p').hour
-                if hour_of_day < 11 or hour_of_day >= 15:  # Early morning or late afternoon
-                    dynamic_threshold = threshold * 1.5  # Increase threshold to allow wider bands
-                else:
-                    dynamic_threshold = threshold  # Use default threshold during midday
-
-                # Calculate relative position-based threshold adjustments (Suggestion 5)
-                if price < lower_band:
-                    dynamic_threshold *= 1.1  # If price is below the lower band, increase the threshold for buys
-                elif price > upper_band:
-                    dynamic_threshold *= 1.1  # If price is above the upper band, increase the threshold for sells
-
-                # Calculate dynamic sizing based on distance from bands (Suggestion 6)
-                # More shares are bought when closer to the lower band, and fewer shares are bought when farther away.
-                distance_from_band = abs(price - lower_band) / (upper_band - lower_band)
-                dynamic_buy_size = max(1, int((1 - distance_from_band) * (total_cash // price)))  # Adjust share size based on proximity to band
-
-                # --- SELL LOGIC ---
-                # Sell decision: when the price is above or near the upper band based on the adjusted dynamic threshold
-                if price >= (upper_band * (1 - dynamic_threshold / 100)) and stock_data[symbol]['shares'] > 0:
-                    shares_to_sell = stock_data[symbol]['shares']
-                    if shares_to_sell > 0:
-                        cash_gained = round(shares_to_sell * price, 2)
-                        total_buy_cost = round(sum([p * q for p, q in stock_data[symbol]['purchase_history']]), 2)
-
-                        # Calculate the realized profit or loss based on the initial purchase history
-                        profit_or_loss = round(cash_gained - total_buy_cost, 2)
-
-                        # Check if the sell is either profitable or meets the loss tolerance requirement
-                        if profit_or_loss >= total_buy_cost * min_profit_margin or profit_or_loss >= total_buy_cost * min_loss_tolerance:
-                            # Update cash and profit/loss accurately
-                            total_cash += cash_gained  # Add back cash from sell
-                            stock_data[symbol]['shares'] = 0
-                            stock_data[symbol]['purchase_history'] = []  # Reset purchase history after selling
-                            stock_data[symbol]['daily_profit'] += profit_or_loss
-
-                            # Track cash gained or lost for winning or losing sells
-                            if profit_or_loss > 0:
-                                stock_data[symbol]['winning_sells'] += profit_or_loss
-                            else:
-                                stock_data[symbol]['losing_sells'] += abs(profit_or_loss)
-
-                            # Increment daily sells for both the total and individual stock
-                            daily_sells += shares_to_sell
-                            stock_daily_sells[symbol] += shares_to_sell
-
-                            # Record the total trades executed for the stock
-                            trade_data[symbol]['total_trades'] += 1
-
-                # --- BUY LOGIC ---
-                # Buy decision: when the price is below or near the lower band based on the adjusted dynamic threshold
-                if price <= (lower_band * (1 + dynamic_threshold / 100)) and total_cash >= price:
-                    shares_to_buy = min(dynamic_buy_size, int(total_cash // price))  # Use dynamic buy size
-                    if shares_to_buy > 0:
-                        stock_data[symbol]['shares'] += shares_to_buy
-                        cash_spent = round(shares_to_buy * price, 2)
-                        total_cash -= cash_spent  # Deduct the spent cash from total_cash
-                        stock_data[symbol]['purchase_history'].append((price, shares_to_buy))
-
-                        # Increment daily buys for both the total and individual stock
-                        daily_buys += shares_to_buy
-                        stock_daily_buys[symbol] += shares_to_buy
-
-                        # Record the total trades executed for the stock
-                        trade_data[symbol]['total_trades'] += 1
-
-                # Update bands for the next minute using the new price
-                historical_prices[symbol].append(price)  # Maintain independent historical prices for each stock
-                lower_band, _, upper_band = calculate_weighted_bollinger_bands(historical_prices[symbol][-14:], window=14)
-                initial_bands[symbol] = (lower_band, _, upper_band)
-
-        # Calculate combined end-of-day equity for all stocks
-        combined_equity = round(total_cash, 2)  # Round to avoid floating-point issues
-        total_shares = 0  # Cumulative shares across all stocks
-        for symbol in symbols:
-            if stock_data[symbol]['shares'] > 0:
-                closing_price = stock_prices_per_minute.get(symbol, [(None, None, None, None)])[-1][0]
-                if closing_price:
-                    combined_equity += round(stock_data[symbol]['shares'] * closing_price, 2)
-                    total_shares += stock_data[symbol]['shares']  # Count shares of this stock
+        day_bar_ranges = {}
+        closing_prices = {}
+        if engine != 'streaming':
+            for symbol in symbols:
+                day_range = simulation_series[symbol]['day_ranges'].get(current_date)
+                if day_range is None:
+                    continue
+                day_bar_ranges[symbol] = day_range
+                closing_prices[symbol] = float(simulation_series[symbol]['prices'][day_range[1] - 1])
+
+        # Calculate dynamic profit/loss tolerance based on cash levels
+        min_loss_tolerance = -3 / 100  # 3% loss tolerance
+        min_profit_margin = 0.05 / 100  # 0.05% minimum profit margin
+
+        if engine == 'streaming':
+            session_start = to_epoch_day(session) * MINUTES_PER_DAY
+            while next_event is not None and next_event[0] < session_start + MINUTES_PER_DAY:
+                minute, bars = next_event
+                next_event = next(minute_events, None)
+                if minute < session_start:  # Bars of a day the market was closed
+                    continue
+                bars_simulated += len(bars)
+
+                # Store available cash at the beginning of the minute to avoid using cash from current-minute sells
+                cash_at_minute_start = round(portfolio.cash, 2)  # Round to avoid floating-point issues
+                spendable_cash = cash_at_minute_start
+                minute_of_day = minute % MINUTES_PER_DAY
+                for symbol, price in bars:
+                    position = positions[symbol]
+                    sell_signal, buy_signal, distance_from_band = bar_signals(price, minute_of_day, initial_bands[symbol], thresholds)
+                    dynamic_buy_size = max(1, int((1 - distance_from_band) * (spendable_cash // price)))
+
+                    # Proceeds of a sell are spendable from the next minute on
+                    if sell_signal and position.shares > 0:
+                        sell_position(position, price, min_profit_margin, min_loss_tolerance)
+
+                    if buy_signal and spendable_cash >= price:
+                        shares_to_buy = min(dynamic_buy_size, int(spendable_cash // price))
+                        if shares_to_buy > 0:
+                            spendable_cash -= buy_position(position, price, shares_to_buy)
+
+                    initial_bands[symbol] = update_bands[symbol](price)
+                    closing_prices[symbol] = price
+        elif engine == 'vectorized':
+            # Bars without a trigger cannot change any state, so only the trigger bars are stepped through
+            for symbol, (day_start, day_end) in day_bar_ranges.items():
+                symbol_data = vectorized_data[symbol]
+                position = positions[symbol]
+                trigger_bars = symbol_data['trigger_bars']
+                first_trigger, last_trigger = np.searchsorted(trigger_bars, (day_start, day_end)).tolist()
+                for i in range(first_trigger, last_trigger):
+                    price = symbol_data['trigger_prices'][i]
+
+                    # Buy size uses the cash available before any sell on this bar, as in the minute loop
+                    if symbol_data['buy_trigger'][i]:
+                        dynamic_buy_size = max(1, int((1 - symbol_data['distance_from_band'][i]) * (portfolio.cash // price)))
+
+                    if symbol_data['sell_trigger'][i] and position.shares > 0:
+                        sell_position(position, price, min_profit_margin, min_loss_tolerance)
+
+                    if symbol_data['buy_trigger'][i] and portfolio.cash >= price:
+                        shares_to_buy = min(dynamic_buy_size, int(portfolio.cash // price))
+                        if shares_to_buy > 0:
+                            buy_position(position, price, shares_to_buy)
+        else:
+            # Evaluate buy and sell opportunities for each stock in the same loop
+            for symbol, (day_start, day_end) in day_bar_ranges.items():
+                position = positions[symbol]
+                day_prices = simulation_series[symbol]['prices'][day_start:day_end].tolist()
+                day_minutes = simulation_series[symbol]['minutes'][day_start:day_end].tolist()
+                for price, minute_of_day in zip(day_prices, day_minutes):
+                    sell_signal, buy_signal, distance_from_band = bar_signals(price, minute_of_day, initial_bands[symbol], thresholds)
+                    dynamic_buy_size = max(1, int((1 - distance_from_band) * (portfolio.cash // price)))  # Adjust share size based on proximity to band
+
+                    # --- SELL LOGIC ---
+                    # Sell decision: when the price is above or near the upper band based on the adjusted dynamic threshold
+                    # The portfolio adds the proceeds to the cash and counts the sell for the stock and the day
+                    if sell_signal and position.shares > 0:
+                        sell_position(position, price, min_profit_margin, min_loss_tolerance)
+
+                    # --- BUY LOGIC ---
+                    # Buy decision: when the price is below or near the lower band based on the adjusted dynamic threshold
+                    if buy_signal and portfolio.cash >= price:
+                        shares_to_buy = min(dynamic_buy_size, int(portfolio.cash // price))  # Use dynamic buy size
+                        if shares_to_buy > 0:
+                            buy_position(position, price, shares_to_buy)  # Deducts the spent cash and counts the buy
+
+                    # Update bands for the next minute using the new price
+                    initial_bands[symbol] = update_bands[symbol](price)  # Constant-time update of each stock's own window
+
+        # Calculate combined end-of-day equity and cumulative shares for all stocks
+        combined_equity, total_shares = portfolio.equity(closing_prices)
 
         # Write daily summary for each stock into `trades.db`
         for symbol in symbols:
-            daily_profit = stock_data[symbol]['daily_profit']
-            winning_sells = stock_data[symbol]['winning_sells']  # Winning sells for this stock on this day
-            losing_sells = stock_data[symbol]['losing_sells']    # Losing sells for this stock on this day
+            position = positions[symbol]
+            daily_profit = position.daily_profit
+            winning_sells = position.winning_sells  # Winning sells for this stock on this day
+            losing_sells = position.losing_sells    # Losing sells for this stock on this day
 
             # Calculate the daily success percentage using only today's data
             total_sells_value = winning_sells + losing_sells
             daily_success_percent = (winning_sells - losing_sells) / total_sells_value * 100 if total_sells_value > 0 else 0
 
             # Write the daily summary into the trades database for this specific stock, including buys, sells, and shares
-            write_daily_summary_to_db(trades_file, symbol, current_date, daily_profit, winning_sells, losing_sells, daily_success_percent, stock_daily_buys[symbol], stock_daily_sells[symbol], stock_data[symbol]['shares'])
+            results.add_daily_summary(symbol, current_date, daily_profit, winning_sells, losing_sells, daily_success_percent, position.daily_buys, position.daily_sells, position.shares)
 
         # Write combined equity into `equity.db` at the end of the day, including daily buys, sells, and cumulative shares
-        write_equity_to_db(equity_file, current_date, total_cash, combined_equity, daily_buys, daily_sells, total_shares)
+        results.add_equity(current_date, portfolio.cash, combined_equity, portfolio.daily_buys, portfolio.daily_sells, total_shares)
 
         # Validate cash to ensure it never goes negative
-        if total_cash < 0:
-            print(f"Warning: Negative cash balance detected on {current_date}. Cash: {total_cash}")
-
-        # Move to the next day
-        current_date = (current_date_dt + timedelta(days=1)).strftime('%Y-%m-%d')
+        if portfolio.cash < 0:
+            print(f"Warning: Negative cash balance detected on {current_date}. Cash: {portfolio.cash}")
+
+        if progress is not None:
+            bars_simulated += sum(day_end - day_start for day_start, day_end in day_bar_ranges.values())
+            progress(days_simulated, len(sessions), bars_simulated, time.perf_counter() - simulation_start)
+
+    # Write whatever is still buffered before the results are read back
+    results.close()
+
+    if profiler is not None:
+        profiler.stop()
+        for symbol in dict.fromkeys(symbols):
+            series = simulation_series[symbol]
+            if engine == 'streaming':
+                days = series['timestamps'] // MINUTES_PER_DAY
+                profiler.count_bars(symbol, int(get_calendar(simulate_start_date, simulate_end_date).sessions_mask(days).sum()))
+            else:
+                profiler.count_bars(symbol, sum(day_end - day_start for day_start, day_end in series['day_ranges'].values()))
 
     # Final report
-    total_trades_executed = sum(trade_data[symbol]['total_trades'] for symbol in symbols)
+    total_trades_executed = portfolio.total_trades()
     print(f"Total Trades Executed: {total_trades_executed:,}")
 
     # Display average daily success percentage and total profit for each symbol
@@ -448,20 +484,39 @@ def simulate_trading(symbols, start_date, end_date, interval, simulate_start_dat
     print(f"Overall Total Profit: {combined_equity - starting_equity:,.2f}")
     conn.close()
 
-# Parsing and handling multiple symbols correctly
-if len(sys.argv) != 10:
-    print("Usage: python tradeSimulator.py <symbols> <start_date> <end_date> <interval> <simulate_start_date> <simulate_end_date> <threshold> <initial_cash> <initial_period_length>")
-    sys.exit(1)
-
-# Parse symbols as a list
-symbols = sys.argv[1].upper().split(",")  # Split the symbols string into a list
-start_date = sys.argv[2].strip()
-end_date = sys.argv[3].strip()
-interval = sys.argv[4].strip()
-simulate_start_date = sys.argv[5].strip()
-simulate_end_date = sys.argv[6].strip()
-threshold = float(sys.argv[7].strip())
-initial_cash = float(sys.argv[8].strip())
-initial_period_length = int(sys.argv[9].strip())
-
-simulate_trading(symbols, start_date, end_date, interval, simulate_start_date, simulate_end_date, threshold, initial_cash)
\ No newline at end of file
+    summary = {
+        'total_trades': total_trades_executed,
+        'average_success_percent': overall_avg_success_percentage,
+        'starting_equity': starting_equity,
+        'final_equity': combined_equity,
+        'percentage_returns': overall_percentage_returns,
+        'total_profit': combined_equity - starting_equity
+    }
+    if profiler is not None:
+        summary['profile'] = profiler.report()
+        print(profiler.summary_line())
+    return summary
+
+if __name__ == "__main__":
+    # Parsing and handling multiple symbols correctly; --profile may appear anywhere
+    profile = '--profile' in sys.argv
+    sys.argv = [arg for arg in sys.argv if arg != '--profile']
+    if len(sys.argv) not in (10, 11):
+        print("Usage: python tradeSimulator.py <symbols> <start_date> <end_date> <interval> <simulate_start_date> <simulate_end_date> <threshold> <initial_cash> <initial_period_length> [loop|vectorized|streaming] [--profile]")
+        sys.exit(1)
+
+    # Parse symbols as a list
+    symbols = sys.argv[1].upper().split(",")  # Split the symbols string into a list
+    start_date = sys.argv[2].strip()
+    end_date = sys.argv[3].strip()
+    interval = sys.argv[4].strip()
+    simulate_start_date = sys.argv[5].strip()
+    simulate_end_date = sys.argv[6].strip()
+    threshold = float(sys.argv[7].strip())
+    initial_cash = float(sys.argv[8].strip())
+    initial_period_length = int(sys.argv[9].strip())
+    engine = sys.argv[10].strip().lower() if len(sys.argv) == 11 else 'loop'
+
+    summary = simulate_trading(symbols, start_date, end_date, interval, simulate_start_date, simulate_end_date, threshold, initial_cash, engine, profile=profile)
+    if profile and summary is not None:
+        print(json.dumps(summary['profile'], indent=2))
@@ -0,0 +1,57 @@
+import numpy as np
+from rollingBands import rolling_weighted_bollinger_band_series
+
+MINUTES_PER_DAY = 1440
+
+def build_threshold_table(threshold):
+    """
+    Dynamic threshold of every minute of the day, so bars look it up instead of working out their hour.
+    Row 0 holds the threshold for prices inside the bands and row 1 for prices outside them.
+    :param threshold: Base threshold percentage within the Bollinger Bands.
+    :return: Array of shape (2, MINUTES_PER_DAY).
+    """
+    hours = np.arange(MINUTES_PER_DAY) // 60
+
+    # Time-based threshold: wider bands in the early morning and late afternoon
+    time_threshold = np.where((hours < 11) | (hours >= 15), threshold * 1.5, threshold)
+
+    # Position-based threshold: wider again when the price is outside the bands
+    return np.stack((time_threshold, time_threshold * 1.1))
+
+def compute_trade_signals(prices, minutes, history, threshold, window=14):
+    """
+    Compute the bands, dynamic thresholds and buy/sell trigger masks for a symbol's whole minute series.
+    :param prices: Minute prices in the order the simulator trades them.
+    :param minutes: Minute of day (0-1439) of each price.
+    :param history: Prices preceding the series, used to seed the bands of the first bars.
+    :param threshold: Base threshold percentage within the Bollinger Bands.
+    :return: Dictionary of arrays aligned with `prices`.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    minutes = np.asarray(minutes)
+
+    # Each bar is judged against the bands of the `window` prices before it, exactly as a
+    # RollingWeightedBollingerBands seeded with the history and fed every earlier bar reports them
+    series = np.concatenate((np.asarray(history[-window:], dtype=np.float64), prices))
+    lower_band, weighted_moving_average, upper_band = (band[window - 1:] for band in rolling_weighted_bollinger_band_series(series[:-1], window))
+
+    # Time- and position-based threshold of each bar, from its minute of day and whether it is outside the bands
+    outside_bands = (prices < lower_band) | (prices > upper_band)
+    dynamic_threshold = build_threshold_table(threshold)[outside_bands.astype(np.intp), minutes]
+
+    # Distance from the lower band drives the buy size; flat bands give inf/nan like the scalar version
+    with np.errstate(divide='ignore', invalid='ignore'):
+        distance_from_band = np.abs(prices - lower_band) / (upper_band - lower_band)
+
+    sell_trigger = prices >= (upper_band * (1 - dynamic_threshold / 100))
+    buy_trigger = prices <= (lower_band * (1 + dynamic_threshold / 100))
+
+    return {
+        'lower_band': lower_band,
+        'moving_average': weighted_moving_average,
+        'upper_band': upper_band,
+        'dynamic_threshold': dynamic_threshold,
+        'distance_from_band': distance_from_band,
+        'sell_trigger': sell_trigger,
+        'buy_trigger': buy_trigger
+    }
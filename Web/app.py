@@ -1,45 +1,140 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, Response, render_template, request, jsonify
 import json
-import datetime
+import sqlite3
+from datetime import datetime
+import numpy as np
+from equityData import (EQUITY_FILE, DEFAULT_POINTS, MAX_POINTS, DOWNSAMPLING_METHODS, ReadOnlyDatabasePool,
+                        get_equity_points, get_price_points, downsample, date_positions)
+from backtestJobs import BacktestJobQueue
 
-app = Flask(__name__)
+app = Flask(__name__, template_folder='Templates')
 
-# Sample balance data (replace this with your actual trading data)
-sample_data = [
-    {"date": "2024-11-01", "balance": 100},
-    {"date": "2024-11-02", "balance": 110},
-    {"date": "2024-11-03", "balance": 90},
-    {"date": "2024-11-04", "balance": 120},
-    {"date": "2024-11-05", "balance": 140},
-    {"date": "2024-11-06", "balance": 130},
-    {"date": "2024-11-07", "balance": 150}
-]
+# Read-only connections to the equity database simulate_trading writes, shared by every request
+equity_pool = ReadOnlyDatabasePool(EQUITY_FILE)
+
+# Backtests requested from the dashboard run on worker processes; requests only enqueue them and read their state
+backtest_jobs = BacktestJobQueue()
+
+def parse_chart_arguments(values):
+    """
+    Read the date range, point count and downsampling method shared by the chart endpoints.
+    :return: Tuple of (start_date, end_date, points, method).
+    :raises ValueError: If a date, the point count or the method is invalid.
+    """
+    start_date = values.get('start_date') or None
+    end_date = values.get('end_date') or None
+    for value in (start_date, end_date):
+        if value:
+            datetime.strptime(value, '%Y-%m-%d')
+    points = min(max(int(values.get('points') or DEFAULT_POINTS), 3), MAX_POINTS)
+    method = values.get('method') or 'lttb'
+    if method not in DOWNSAMPLING_METHODS:
+        raise ValueError(f"Unknown downsampling method '{method}', expected one of {', '.join(DOWNSAMPLING_METHODS)}")
+    return start_date, end_date, points, method
+
+def load_equity_points(start_date=None, end_date=None, points=DEFAULT_POINTS, method='lttb', starting_balance=None):
+    try:
+        return get_equity_points(equity_pool, start_date, end_date, points, method, starting_balance)
+    except (OSError, sqlite3.Error) as e:
+        # No simulation has written the equity database yet, or it is being recreated
+        print(f"Failed to load the equity series: {e}")
+        return []
 
 @app.route('/')
 def index():
-    # Load the initial data
-    return render_template('index.html', initial_data=json.dumps(sample_data))
+    # Load the whole equity curve, downsampled for the initial chart
+    data = load_equity_points()
+    start_date = data[0]['date'][:10] if data else ''
+    end_date = data[-1]['date'][:10] if data else ''
+    return render_template('index.html', initial_data=json.dumps(data), start_date=start_date, end_date=end_date)
 
 @app.route('/update_data', methods=['POST'])
 def update_data():
     # Extract new parameters from the frontend form submission
-    start_date = request.form.get('start_date')
-    end_date = request.form.get('end_date')
-    starting_balance = float(request.form.get('starting_balance'))
-
-    # Generate or filter your trading data based on the provided dates and starting balance
-    # For now, this example will return the same sample data
-    filtered_data = [
-        {"date": "2024-11-01", "balance": starting_balance},
-        {"date": "2024-11-02", "balance": starting_balance * 1.05},
-        {"date": "2024-11-03", "balance": starting_balance * 0.95},
-        {"date": "2024-11-04", "balance": starting_balance * 1.2},
-        {"date": "2024-11-05", "balance": starting_balance * 1.4},
-        {"date": "2024-11-06", "balance": starting_balance * 1.3},
-        {"date": "2024-11-07", "balance": starting_balance * 1.5}
-    ]
-
-    return jsonify(filtered_data)
+    try:
+        start_date, end_date, points, method = parse_chart_arguments(request.form)
+        starting_balance = float(request.form['starting_balance']) if request.form.get('starting_balance') else None
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # The equity curve of the range, rescaled to start at the requested balance
+    return jsonify(load_equity_points(start_date, end_date, points, method, starting_balance))
+
+@app.route('/equity')
+def equity():
+    try:
+        start_date, end_date, points, method = parse_chart_arguments(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(load_equity_points(start_date, end_date, points, method))
+
+@app.route('/prices/<symbol>')
+def prices(symbol):
+    # Intraday prices from the price databases, e.g. /prices/AAPL?start_date=2024-01-02&end_date=2024-06-28&interval=1m
+    try:
+        start_date, end_date, points, method = parse_chart_arguments(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not start_date or not end_date:
+        return jsonify({'error': 'start_date and end_date are required'}), 400
+    return jsonify(get_price_points(symbol.upper(), start_date, end_date, request.args.get('interval', '1m'), points, method))
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    # Parameters as form fields or JSON: symbols, simulate_start_date, simulate_end_date, initial_cash, [threshold, engine, ...]
+    try:
+        job = backtest_jobs.submit(request.get_json(silent=True) or request.form)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(job), 200 if job['status'] == 'finished' else 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    job = backtest_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f"No job {job_id}"}), 404
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>/events')
+def job_events(job_id):
+    # Server-Sent Events: one message per change of the job's state, until it finishes or fails
+    if backtest_jobs.get(job_id) is None:
+        return jsonify({'error': f"No job {job_id}"}), 404
+
+    def stream():
+        version = -1
+        while True:
+            job = backtest_jobs.wait_for_update(job_id, version)
+            if job is None:
+                return  # The job was forgotten
+            if job['version'] > version:
+                version = job['version']
+                yield f"data: {json.dumps(job)}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+            if job['status'] in ('finished', 'failed'):
+                return
+
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+@app.route('/jobs/<job_id>/equity')
+def job_equity(job_id):
+    job = backtest_jobs.get(job_id, include_equity=True)
+    if job is None:
+        return jsonify({'error': f"No job {job_id}"}), 404
+    if job['status'] != 'finished':
+        return jsonify({'error': f"Job {job_id} is {job['status']}"}), 409
+    if job['equity'] is None:
+        return jsonify({'error': f"The result of job {job_id} is no longer cached; submit it again"}), 410
+    try:
+        _, _, points, method = parse_chart_arguments(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    dates = [row[0] for row in job['equity']]
+    equity = np.array([row[1] for row in job['equity']], dtype=np.float64)
+    kept = downsample(date_positions(dates), equity, points, method).tolist() if dates else []
+    return jsonify([{"date": dates[i], "balance": round(float(equity[i]), 2)} for i in kept])
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,281 @@
+import os
+import io
+import sys
+import json
+import uuid
+import time
+import sqlite3
+import hashlib
+import threading
+import contextlib
+import multiprocessing
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../Trading')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../DataAnalysis')))
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../DatabaseSetup')))
+from analysisCache import AnalysisCache
+from dataCatalog import plan_range
+from priceCache import CACHE_DIR, get_source_fingerprint
+
+# Simulations started from the web app run here, each writing its own trades.db/equity.db
+JOBS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/tradeData/jobs'))
+BACKTEST_CACHE_FILE = os.path.join(CACHE_DIR, 'backtests.db')
+DEFAULT_HISTORY_DAYS = 30  # Calendar days before the simulation start that seed the bands
+FINISHED_JOB_TTL = 3600  # Seconds a finished or failed job stays queryable
+MAX_FINISHED_JOBS = 200  # Finished or failed jobs kept at most; the oldest go first
+JOB_STATUSES = ('queued', 'running', 'finished', 'failed')
+
+def normalize_backtest_parameters(values):
+    """
+    Validate the parameters of a backtest request and fill in the defaults.
+    :param values: Mapping with symbols (comma-separated or a list), simulate_start_date, simulate_end_date,
+                   initial_cash and optionally history_start_date, interval, threshold and engine.
+    :return: Dictionary of simulate_trading's arguments.
+    :raises ValueError: If a parameter is missing or invalid.
+    """
+    symbols = values.get('symbols') or ''
+    if isinstance(symbols, str):
+        symbols = symbols.split(',')
+    symbols = [symbol.strip().upper() for symbol in symbols if symbol.strip()]
+    if not symbols:
+        raise ValueError("At least one symbol is required")
+
+    simulate_start_date = values.get('simulate_start_date') or ''
+    simulate_end_date = values.get('simulate_end_date') or ''
+    simulate_start = datetime.strptime(simulate_start_date, '%Y-%m-%d')
+    if datetime.strptime(simulate_end_date, '%Y-%m-%d') < simulate_start:
+        raise ValueError("simulate_end_date is before simulate_start_date")
+    history_start_date = values.get('history_start_date') or (simulate_start - timedelta(days=DEFAULT_HISTORY_DAYS)).strftime('%Y-%m-%d')
+    datetime.strptime(history_start_date, '%Y-%m-%d')
+
+    engine = values.get('engine') or 'vectorized'
+    if engine not in ('loop', 'vectorized', 'streaming'):
+        raise ValueError(f"Unknown engine '{engine}'")
+    initial_cash = float(values.get('initial_cash') or 0)
+    if initial_cash <= 0:
+        raise ValueError("initial_cash must be positive")
+
+    return {
+        'symbols': symbols,
+        'start_date': history_start_date,
+        'end_date': (simulate_start - timedelta(days=1)).strftime('%Y-%m-%d'),
+        'interval': values.get('interval') or '1m',
+        'simulate_start_date': simulate_start_date,
+        'simulate_end_date': simulate_end_date,
+        'threshold': float(values.get('threshold') or 0.5),
+        'initial_cash': initial_cash,
+        'engine': engine
+    }
+
+def backtest_key(parameters):
+    """
+    Hash of a backtest's parameters and of the state of the databases it reads, so a result is reused only while
+    neither changed.
+    """
+    sources = {}
+    for symbol in parameters['symbols']:
+        pieces, _ = plan_range(symbol, parameters['start_date'], parameters['simulate_end_date'], parameters['interval'])
+        sources[symbol] = [[os.path.basename(db_path), days[0], days[-1], get_source_fingerprint(db_path)] for db_path, days in pieces]
+    return hashlib.sha256(json.dumps({'parameters': parameters, 'sources': sources}, sort_keys=True).encode()).hexdigest()
+
+def run_backtest_job(job_id, parameters, output_dir, events):
+    """
+    Run one simulation in a worker process, reporting its progress on the events queue.
+    :return: Dictionary with the summary metrics, the equity curve as (date, equity) rows and the result files.
+    """
+    from tradeSimulator import simulate_trading
+
+    def report_progress(days_simulated, total_days, bars_simulated, elapsed_seconds):
+        events.put((job_id, {
+            'days_simulated': days_simulated,
+            'total_days': total_days,
+            'bars_simulated': bars_simulated,
+            'bars_per_sec': bars_simulated / elapsed_seconds if elapsed_seconds > 0 else 0.0
+        }))
+
+    os.makedirs(output_dir, exist_ok=True)
+    trades_file = os.path.join(output_dir, 'trades.db')
+    equity_file = os.path.join(output_dir, 'equity.db')
+    events.put((job_id, {'status': 'running'}))
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):  # The per-run report goes into the job instead of the server's output
+        summary = simulate_trading(parameters['symbols'], parameters['start_date'], parameters['end_date'], parameters['interval'],
+                                   parameters['simulate_start_date'], parameters['simulate_end_date'], parameters['threshold'],
+                                   parameters['initial_cash'], engine=parameters['engine'], trades_file=trades_file,
+                                   equity_file=equity_file, progress=report_progress)
+    if summary is None:
+        raise RuntimeError(log.getvalue().strip() or "The simulation could not start")
+
+    conn = sqlite3.connect(equity_file)
+    equity = conn.execute("SELECT date, equity FROM equity ORDER BY date").fetchall()
+    conn.close()
+    return {'summary': summary, 'equity': equity, 'trades_file': trades_file, 'equity_file': equity_file}
+
+class BacktestJobQueue:
+    """
+    Runs simulate_trading jobs on a pool of worker processes, so web requests only enqueue work and read its state.
+    Workers report progress through a manager queue that a listener thread folds into the jobs; every change bumps
+    the job's version and wakes whoever waits for it (the Server-Sent Events stream). Finished results are cached
+    by backtest_key, so the same request on unchanged data is answered without running again, and a request equal
+    to a job still queued or running joins that job.
+    Jobs keep only their summary: the equity curve is read back from the cache, and finished jobs are forgotten
+    after `finished_ttl` seconds or once more than `max_finished` of them are kept.
+    """
+
+    def __init__(self, max_workers=2, cache=None, jobs_dir=None, finished_ttl=FINISHED_JOB_TTL, max_finished=MAX_FINISHED_JOBS):
+        self.max_workers = max_workers
+        self.finished_ttl = finished_ttl
+        self.max_finished = max_finished
+        self.cache = cache or AnalysisCache(BACKTEST_CACHE_FILE)
+        self.jobs_dir = jobs_dir or JOBS_DIR
+        self.jobs = {}
+        self.active_keys = {}  # Parameter hash -> id of the job computing it
+        self.condition = threading.Condition()
+        self.executor = None
+        self.manager = None
+        self.events = None
+
+    def start(self):
+        # Workers are spawned, not forked, so they do not inherit the web server's threads
+        context = multiprocessing.get_context('spawn')
+        self.manager = context.Manager()
+        self.events = self.manager.Queue()
+        self.executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+        threading.Thread(target=self.listen, name='backtest-events', daemon=True).start()
+
+    def new_job(self, parameters, key, status):
+        job = {
+            'id': uuid.uuid4().hex,
+            'key': key,
+            'parameters': parameters,
+            'status': status,
+            'cached': False,
+            'progress': {'days_simulated': 0, 'total_days': None, 'bars_simulated': 0, 'bars_per_sec': 0.0},
+            'result': None,
+            'error': None,
+            'submitted_at': time.time(),
+            'finished_at': None,
+            'version': 0
+        }
+        self.jobs[job['id']] = job
+        return job
+
+    def submit(self, values):
+        """
+        Enqueue a backtest, or answer it from the cache.
+        :param values: Request parameters, as accepted by normalize_backtest_parameters.
+        :return: Snapshot of the job.
+        :raises ValueError: If the parameters are invalid.
+        """
+        parameters = normalize_backtest_parameters(values)
+        key = backtest_key(parameters)
+        found, result = self.cache.get(key)
+        with self.condition:
+            self.prune()
+            if found:
+                job = self.new_job(parameters, key, 'finished')
+                job.update(cached=True, result={'summary': result['summary']}, finished_at=time.time())
+                job['progress'].update(days_simulated=len(result['equity']), total_days=len(result['equity']))
+                return self.snapshot(job)
+            if key in self.active_keys:
+                return self.snapshot(self.jobs[self.active_keys[key]])
+
+            if self.executor is None:
+                self.start()
+            job = self.new_job(parameters, key, 'queued')
+            self.active_keys[key] = job['id']
+            future = self.executor.submit(run_backtest_job, job['id'], parameters, os.path.join(self.jobs_dir, key[:16]), self.events)
+            future.add_done_callback(lambda future, job_id=job['id']: self.complete(job_id, future))
+            return self.snapshot(job)
+
+    def listen(self):
+        while True:
+            try:
+                job_id, update = self.events.get()
+            except (EOFError, OSError):
+                return  # The manager shut down
+            with self.condition:
+                job = self.jobs.get(job_id)
+                if job is None or job['status'] in ('finished', 'failed'):
+                    continue
+                if 'status' in update:
+                    job['status'] = update['status']
+                else:
+                    job['progress'].update(update)
+                job['version'] += 1
+                self.condition.notify_all()
+
+    def complete(self, job_id, future):
+        error = future.exception()
+        result = None if error is not None else future.result()
+        if result is not None:
+            self.cache.put(self.jobs[job_id]['key'], result)
+        with self.condition:
+            job = self.jobs[job_id]
+            self.active_keys.pop(job['key'], None)
+            if error is not None:
+                job.update(status='failed', error=str(error))
+            else:
+                job.update(status='finished', result={'summary': result['summary']})
+                job['progress']['days_simulated'] = job['progress']['total_days'] or len(result['equity'])
+            job['finished_at'] = time.time()
+            job['version'] += 1
+            self.condition.notify_all()
+            self.prune()
+
+    def prune(self):
+        """
+        Forget finished and failed jobs past the TTL, and the oldest ones beyond the count limit.
+        Called with the condition held.
+        """
+        finished = sorted((job['finished_at'], job_id) for job_id, job in self.jobs.items() if job['status'] in ('finished', 'failed'))
+        expired = time.time() - self.finished_ttl
+        excess = len(finished) - self.max_finished
+        for index, (finished_at, job_id) in enumerate(finished):
+            if finished_at < expired or index < excess:
+                del self.jobs[job_id]
+        self.condition.notify_all()  # Event streams of forgotten jobs stop
+
+    def snapshot(self, job):
+        """
+        Copy of a job's public state.
+        """
+        state = {name: job[name] for name in ('id', 'parameters', 'status', 'cached', 'error', 'submitted_at', 'finished_at', 'version')}
+        state['progress'] = dict(job['progress'])
+        if job['result'] is not None:
+            state['summary'] = job['result']['summary']
+        return state
+
+    def get(self, job_id, include_equity=False):
+        """
+        :param include_equity: Add the equity curve of a finished job, read from the cache ('equity' is None if the
+                               cache no longer has it).
+        :return: Snapshot of the job, or None if there is no such job.
+        """
+        with self.condition:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            state = self.snapshot(job)
+            key = job['key']
+        if include_equity and state['status'] == 'finished':
+            found, result = self.cache.get(key)
+            state['equity'] = result['equity'] if found else None
+        return state
+
+    def wait_for_update(self, job_id, version, timeout=15):
+        """
+        Block until the job's version passes `version` or the timeout expires.
+        :return: Snapshot of the job, or None if there is no such job.
+        """
+        with self.condition:
+            self.condition.wait_for(lambda: job_id not in self.jobs or self.jobs[job_id]['version'] > version, timeout)
+            job = self.jobs.get(job_id)
+            return self.snapshot(job) if job is not None else None
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.manager.shutdown()
+            self.executor = None
@@ -0,0 +1,201 @@
+import os
+import sys
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../DatabaseSetup')))
+from dataCatalog import load_price_range
+
+# Series the dashboard charts, read from the databases the simulator and the price pipeline write
+EQUITY_FILE = os.path.abspath(os.path.join(os.path.dirname(__file__), '../data/tradeData/equity.db'))
+DEFAULT_POINTS = 2000
+MAX_POINTS = 10000
+DOWNSAMPLING_METHODS = ('lttb', 'minmax')
+
+class ReadOnlyDatabasePool:
+    """
+    Read-only SQLite connections to one database file, reused across requests instead of opened per request.
+    The simulator deletes and recreates its result databases on every run, so the pool remembers which file its
+    connections were opened on and drops them once the path points at a new file.
+    """
+
+    def __init__(self, db_path, max_connections=4):
+        self.db_path = db_path
+        self.max_connections = max_connections
+        self.idle = queue.LifoQueue(maxsize=max_connections)
+        self.file_id = None
+        self.lock = threading.Lock()
+
+    def current_file_id(self):
+        stat = os.stat(self.db_path)  # Raises FileNotFoundError until the database has been written
+        return stat.st_dev, stat.st_ino
+
+    def open_connection(self):
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def close_idle(self):
+        while True:
+            try:
+                self.idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for the duration of a with block; it goes back to the pool afterwards.
+        """
+        file_id = self.current_file_id()
+        with self.lock:
+            if file_id != self.file_id:
+                self.close_idle()
+                self.file_id = file_id
+        try:
+            conn = self.idle.get_nowait()
+        except queue.Empty:
+            conn = self.open_connection()
+
+        try:
+            yield conn
+        finally:
+            # A connection to a file that has been replaced meanwhile is not worth keeping
+            if file_id != self.file_id:
+                conn.close()
+            else:
+                try:
+                    self.idle.put_nowait(conn)
+                except queue.Full:
+                    conn.close()
+
+    def close(self):
+        with self.lock:
+            self.close_idle()
+            self.file_id = None
+
+def downsample_lttb(x, y, points):
+    """
+    Largest-Triangle-Three-Buckets: keep the first and last point and, from each of the points - 2 buckets in between,
+    the point forming the largest triangle with the point kept before it and the average of the next bucket.
+    :return: Sorted indices of the points kept.
+    """
+    count = len(x)
+    if points >= count:
+        return np.arange(count)
+    if points < 3:
+        return np.array([0, count - 1], dtype=np.int64)
+
+    # Bucket k covers [edges[k], edges[k + 1]); the last edge starts the bucket holding only the final point
+    every = (count - 2) / (points - 2)
+    edges = (np.arange(points - 1) * every).astype(np.int64) + 1
+    edges[-1] = count - 1
+    bucket_sizes = np.diff(np.append(edges, count))
+    average_x = np.add.reduceat(x, edges) / bucket_sizes
+    average_y = np.add.reduceat(y, edges) / bucket_sizes
+
+    selected = np.empty(points, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = count - 1
+    previous = 0
+    for bucket in range(points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        areas = np.abs((x[previous] - average_x[bucket + 1]) * (y[start:end] - y[previous])
+                       - (x[previous] - x[start:end]) * (average_y[bucket + 1] - y[previous]))
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+def downsample_min_max(y, points):
+    """
+    Keep the lowest and highest point of each of points // 2 equal buckets, plus the first and last point,
+    so every peak and trough of the series survives.
+    :return: Sorted indices of the points kept.
+    """
+    count = len(y)
+    buckets = max(points // 2, 1)
+    if points >= count:
+        return np.arange(count)
+
+    bucket_size = -(-count // buckets)
+    padded = np.full(buckets * bucket_size, np.nan)
+    padded[:count] = y
+    padded = padded.reshape(buckets, bucket_size)
+    valid = ~np.isnan(padded).all(axis=1)  # The last buckets can be all padding
+    offsets = np.arange(buckets)[valid] * bucket_size
+    lows = offsets + np.nanargmin(padded[valid], axis=1)
+    highs = offsets + np.nanargmax(padded[valid], axis=1)
+    return np.unique(np.concatenate(([0, count - 1], lows, highs)))
+
+def downsample(x, y, points=DEFAULT_POINTS, method='lttb'):
+    """
+    Reduce a series to about `points` points for charting.
+    :param x: Increasing numeric x values (e.g. epoch seconds).
+    :param method: 'lttb' to keep the visual shape, 'minmax' to keep every bucket's extremes.
+    :return: Sorted indices of the points kept.
+    """
+    if method == 'minmax':
+        return downsample_min_max(y, points)
+    return downsample_lttb(x, y, points)
+
+def load_equity_series(pool, start_date=None, end_date=None):
+    """
+    Read the equity table the simulator writes, optionally limited to a date range (both ends inclusive).
+    :return: Tuple of (list of date strings, numpy array of equity).
+    """
+    query = "SELECT date, equity FROM equity"
+    conditions = []
+    parameters = []
+    if start_date:
+        conditions.append("date >= ?")
+        parameters.append(start_date)
+    if end_date:
+        # The end day is included whether the dates carry a time of day or not
+        conditions.append("date < ?")
+        parameters.append((datetime.strptime(end_date, '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d'))
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY date"
+
+    with pool.connection() as conn:
+        rows = conn.execute(query, parameters).fetchall()
+    dates = [row[0] for row in rows]
+    return dates, np.array([row[1] for row in rows], dtype=np.float64)
+
+def date_positions(dates):
+    """
+    Seconds since 1970-01-01 of 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM[:SS]' strings, as downsampling x values.
+    """
+    return np.array([date.replace(' ', 'T') for date in dates], dtype='datetime64[s]').astype(np.float64)
+
+def get_equity_points(pool, start_date=None, end_date=None, points=DEFAULT_POINTS, method='lttb', starting_balance=None):
+    """
+    Equity curve for the chart, downsampled to at most about `points` points.
+    :param starting_balance: Rescale the curve so it starts at this balance; None keeps the simulated equity.
+    :return: List of {"date", "balance"} dictionaries.
+    """
+    dates, equity = load_equity_series(pool, start_date, end_date)
+    if len(dates) == 0:
+        return []
+    if starting_balance is not None and equity[0] != 0:
+        equity = equity * (starting_balance / equity[0])
+
+    kept = downsample(date_positions(dates), equity, points, method)
+    return [{"date": dates[i], "balance": round(float(equity[i]), 2)} for i in kept.tolist()]
+
+def get_price_points(symbol, start_date, end_date, interval, points=DEFAULT_POINTS, method='lttb'):
+    """
+    Intraday prices of a symbol from the price databases' caches, downsampled like the equity curve.
+    :return: List of {"date", "balance"} dictionaries, dates as 'YYYY-MM-DD HH:MM'.
+    """
+    columns = load_price_range(symbol, start_date, end_date, interval)
+    if len(columns['price']) == 0:
+        return []
+
+    timestamps = columns['timestamp']  # Epoch minutes
+    kept = downsample(timestamps.astype(np.float64), np.asarray(columns['price'], dtype=np.float64), points, method)
+    dates = np.datetime_as_string(timestamps[kept].astype('datetime64[m]'), unit='m')
+    return [{"date": date.replace('T', ' '), "balance": float(price)} for date, price in zip(dates.tolist(), columns['price'][kept].tolist())]